@@ -0,0 +1,203 @@
+# pizza_monitoring/detection_service/backends.py
+
+import os
+import threading
+import time
+
+import numpy as np
+
+from shared.config import (MODEL_PATH, INFERENCE_BACKEND, INFERENCE_THREADS, INFERENCE_INT8,
+                           INFERENCE_IMGSZ, INFERENCE_INT8_DATA)
+
+BACKENDS = ("cuda", "cpu", "onnx", "openvino")
+
+
+# ────────────────────────────────────────────────
+# Export cache
+# ────────────────────────────────────────────────
+def _is_fresh(path, source):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source)
+
+def export_model(model_path, fmt, int8=False, imgsz=INFERENCE_IMGSZ):
+    """
+    Export `model_path` (.pt) to `fmt` next to it and return the exported path.
+    The export is reused as long as it is newer than the .pt file.
+    """
+    stem = os.path.splitext(model_path)[0]
+    if fmt == "onnx":
+        target = f"{stem}.onnx"
+    else:
+        target = f"{stem}{'_int8' if int8 else ''}_openvino_model"
+
+    if not _is_fresh(target, model_path):
+        from ultralytics import YOLO
+        print(f"[Backend] 📦 Exporting {os.path.basename(model_path)} to {fmt} (one-time)...")
+        start = time.time()
+        export_args = {"format": fmt, "imgsz": imgsz, "dynamic": True}
+        if fmt == "openvino" and int8:
+            export_args.update(int8=True, data=INFERENCE_INT8_DATA)
+        target = YOLO(model_path).export(**export_args)
+        print(f"[Backend] ✅ Exported to {target} in {time.time() - start:.1f}s")
+
+    if fmt == "onnx" and int8:
+        target = quantize_onnx(target)
+    return target
+
+def quantize_onnx(onnx_path):
+    """Dynamic INT8 weight quantization with ONNX Runtime (cached as *_int8.onnx)"""
+    int8_path = onnx_path.replace(".onnx", "_int8.onnx")
+    if not _is_fresh(int8_path, onnx_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        print(f"[Backend] 📦 Quantizing {os.path.basename(onnx_path)} to INT8 (one-time)...")
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+    return int8_path
+
+
+# ────────────────────────────────────────────────
+# Backend selection
+# ────────────────────────────────────────────────
+def _configure_onnx_threads(model, onnx_path, threads):
+    """
+    ultralytics creates its ONNX Runtime session without session options, so
+    after the predictor exists the session is swapped for one with the
+    requested intra-op thread count.
+    """
+    import onnxruntime as ort
+    backend = getattr(getattr(model, "predictor", None), "model", None)
+    if backend is None or not hasattr(backend, "session"):
+        return
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    backend.session = ort.InferenceSession(onnx_path, sess_options=options,
+                                           providers=backend.session.get_providers())
+
+def _configure_openvino_threads(model, threads):
+    """
+    Same for OpenVINO: the compiled model is rebuilt from the IR ultralytics
+    already read, with INFERENCE_NUM_THREADS set next to its performance hint.
+    """
+    import openvino as ov
+    backend = getattr(getattr(model, "predictor", None), "model", None)
+    if backend is None or not hasattr(backend, "ov_model"):
+        print("[Backend] ⚠️ OpenVINO model not found, INFERENCE_THREADS not applied")
+        return
+    config = {"INFERENCE_NUM_THREADS": threads}
+    if getattr(backend, "inference_mode", None):
+        config["PERFORMANCE_HINT"] = backend.inference_mode
+    device = getattr(backend, "device_name", "CPU")
+    backend.ov_compiled_model = ov.Core().compile_model(backend.ov_model, device_name=device, config=config)
+
+def load_model(backend=INFERENCE_BACKEND, model_path=MODEL_PATH, threads=INFERENCE_THREADS, int8=INFERENCE_INT8):
+    """
+    Load the detector for the chosen backend:
+        cuda      PyTorch on the GPU in FP16 (falls back to cpu without CUDA)
+        cpu       PyTorch on the CPU, `threads` intra-op threads
+        onnx      exported ONNX model on ONNX Runtime (optional INT8), `threads` intra-op threads
+        openvino  exported OpenVINO IR (optional INT8, needs INFERENCE_INT8_DATA), `threads` inference threads
+    The returned object is a regular ultralytics YOLO model, so predict()/track()
+    and the violation logic work the same on every backend.
+    """
+    # Heavy imports stay here so importing the detection code is cheap
+    import torch
+    from ultralytics import YOLO
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == "cuda" and not torch.cuda.is_available():
+        print("[Backend] ⚠️ CUDA not available, falling back to the cpu backend")
+        backend = "cpu"
+    if threads:
+        torch.set_num_threads(threads)
+
+    start = time.time()
+    if backend in ("cuda", "cpu"):
+        model = YOLO(model_path)
+        if backend == "cuda":
+            model.to('cuda')
+            model.model.half()  # Use FP16 for faster inference
+    else:
+        exported = export_model(model_path, backend, int8)
+        model = YOLO(exported, task="detect")
+        if threads:
+            # Build the predictor with one tiny inference, then apply the thread count
+            model.predict(np.zeros((INFERENCE_IMGSZ, INFERENCE_IMGSZ, 3), dtype=np.uint8), verbose=False)
+            if backend == "onnx":
+                _configure_onnx_threads(model, exported, threads)
+            else:
+                _configure_openvino_threads(model, threads)
+
+    model.backend_name = backend
+    print(f"[Backend] 🧠 Loaded {backend} backend{' (INT8)' if int8 and backend in ('onnx', 'openvino') else ''} "
+          f"in {time.time() - start:.2f}s, classes: {model.names}")
+    return model
+
+
+# ────────────────────────────────────────────────
+# Lazily loaded detector
+#
+# Importing the detection code must not load weights or touch the GPU, so
+# the model lives behind this object and is loaded on first use, or
+# up front with load() + warmup() before the detector starts consuming.
+# ────────────────────────────────────────────────
+class DetectorEngine:
+    def __init__(self, backend=INFERENCE_BACKEND, model_path=MODEL_PATH, threads=INFERENCE_THREADS,
+                 int8=INFERENCE_INT8, imgsz=INFERENCE_IMGSZ):
+        self.backend = backend
+        self.model_path = model_path
+        self.threads = threads
+        self.int8 = int8
+        self.imgsz = imgsz
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_time = None
+        self.warmup_time = None
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    @property
+    def ready(self):
+        return self.loaded and self.warmup_time is not None
+
+    def load(self):
+        with self._lock:
+            if self._model is None:
+                start = time.perf_counter()
+                self._model = load_model(self.backend, self.model_path, self.threads, self.int8)
+                self.load_time = time.perf_counter() - start
+        return self._model
+
+    @property
+    def model(self):
+        return self._model if self._model is not None else self.load()
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def predict(self, *args, **kwargs):
+        return self.model.predict(*args, **kwargs)
+
+    def track(self, *args, **kwargs):
+        return self.model.track(*args, **kwargs)
+
+    def warmup(self, runs=1, batch=1):
+        """
+        Run `runs` dummy forward passes of `batch` frames so CUDA kernels,
+        cuDNN autotuning and the predictor setup happen before real frames
+        arrive. Returns the warm-up time in seconds.
+        """
+        model = self.model
+        dummy = [np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)] * max(1, batch)
+        start = time.perf_counter()
+        for _ in range(max(1, runs)):
+            model.predict(dummy, verbose=False)
+        if self.backend == "cuda":
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
+        self.warmup_time = time.perf_counter() - start
+        return self.warmup_time
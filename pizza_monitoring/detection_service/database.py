@@ -1,63 +1,174 @@
+import queue
 import sqlite3
-from datetime import datetime
+import threading
+import time
+
+from shared.config import DB_WRITER_QUEUE, DB_WRITER_BATCH_ROWS, DB_WRITER_FLUSH_MS
+from shared.db_schema import SCHEMA_VERSION, INSERT_VIOLATION, apply_pragmas, ensure_schema, violation_row
 
 # ────────────────────────────────────────────────
-# Initialize Database: DROP + Create + PRAGMAs
+# Initialize Database: PRAGMAs + create or migrate the schema (shared/db_schema.py)
 # ────────────────────────────────────────────────
 def init_db(path):
-    print("Initializing database (testing mode with DROP)...")
     conn = sqlite3.connect(path, check_same_thread=False)
-    cursor = conn.cursor()
+    apply_pragmas(conn)
+    outcome = ensure_schema(conn)
+    print(f"Database {outcome} (schema version {SCHEMA_VERSION}): {path}")
+    return conn, conn.cursor()  # Return for reuse
 
-    # Apply performance PRAGMA settings
-    cursor.execute("PRAGMA journal_mode=WAL")
-    cursor.execute("PRAGMA synchronous=NORMAL")
-    cursor.execute("PRAGMA temp_store=MEMORY")
-    cursor.execute("PRAGMA cache_size = 10000")
 
-    # Drop existing table (for testing only)
-    cursor.execute("DROP TABLE IF EXISTS violations")
+# ────────────────────────────────────────────────
+# Asynchronous batched writer
+#
+# process_frame only puts a row on a bounded queue; one writer thread owns a
+# long-lived connection and inserts whatever accumulated with executemany in
+# a single transaction, every `batch_rows` rows or `flush_ms` after the first
+# queued row, whichever comes first. The detection threads never wait on the
+# disk. If the queue is full (disk stalled for a long time) rows are dropped
+# and counted rather than blocking inference.
+# ────────────────────────────────────────────────
+_STOP = object()
 
-    # Recreate table
-    cursor.execute('''CREATE TABLE IF NOT EXISTS violations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        timestamp TEXT,
-        frame_path TEXT,
-        labels TEXT,
-        boxes TEXT,
-        is_violation INTEGER DEFAULT 0,
-        is_safe_pickup INTEGER DEFAULT 0
-    )''')
 
-    # Optional: create indexes for summary queries
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_violation ON violations(is_violation)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_safe_pickup ON violations(is_safe_pickup)")
+class ViolationWriter:
+    def __init__(self, db_path, max_queue=DB_WRITER_QUEUE, batch_rows=DB_WRITER_BATCH_ROWS,
+                 flush_ms=DB_WRITER_FLUSH_MS, report_every=60.0):
+        self.db_path = db_path
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_ms / 1000.0
+        self.report_every = report_every
+        self.queue = queue.Queue(max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
 
-    conn.commit()
-    return conn, cursor  # Return for reuse
+        # Counters (flush stats are reset every report)
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.flush_time = 0.0
+        self.max_flush_time = 0.0
+        self.max_depth = 0
 
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="violation-writer", daemon=True)
+                self._thread.start()
+        return self
 
-# ────────────────────────────────────────────────
-# Save Violation Record (No commit inside)
-# ────────────────────────────────────────────────
-def save_violation(timestamp, path, labels, boxes, is_violation, is_safe_pickup, db_path):
-    import sqlite3
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO violations (timestamp, frame_path, labels, boxes, is_violation, is_safe_pickup)
-        VALUES (?, ?, ?, ?, ?, ?)''',
-        (timestamp, path, str(labels), str(boxes), int(is_violation), int(is_safe_pickup))
-    )
+    def save(self, timestamp, camera_id, worker_id, frame_id, roi_id, path, labels, boxes,
+             is_violation, is_safe_pickup, crop_path=""):
+        """Queue one record; returns False if it was dropped"""
+        if self._thread is None:
+            self.start()
+        row = violation_row(timestamp, camera_id, worker_id, frame_id, roi_id, path,
+                            labels, boxes, is_violation, is_safe_pickup, crop_path)
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            print(f"[DB Writer] ⚠️ Write queue full, record dropped ({self.dropped} total)")
+            return False
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
 
-    conn.commit()
-    conn.close()
+    def close(self, timeout=10.0):
+        """Write everything queued so far, then stop the thread and close the connection"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self.queue.put(_STOP)
+        thread.join(timeout)
 
+    def stats(self):
+        return {
+            "depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "avg_flush_ms": 1e3 * self.flush_time / self.flushes if self.flushes else 0.0,
+            "max_flush_ms": 1e3 * self.max_flush_time,
+        }
 
+    # ─────────────────────────────
+    # Writer thread
+    # ─────────────────────────────
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        apply_pragmas(conn)
+        ensure_schema(conn)
+        return conn
 
-# ────────────────────────────────────────────────
-# Commit Wrapper (Use in your main loop every N writes)
-# ────────────────────────────────────────────────
-def commit_changes(conn):
-    conn.commit()
+    def _next_batch(self):
+        """Rows to write next, and whether the writer was asked to stop"""
+        try:
+            first = self.queue.get(timeout=1.0)
+        except queue.Empty:
+            return [], False
+        if first is _STOP:
+            return [], True
+        rows = [first]
+        deadline = time.perf_counter() + self.flush_interval
+        while len(rows) < self.batch_rows:
+            remaining = deadline - time.perf_counter()
+            try:
+                row = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is _STOP:
+                return rows, True
+            rows.append(row)
+        return rows, False
+
+    def _flush(self, conn, rows):
+        start = time.perf_counter()
+        try:
+            with conn:  # one transaction per batch
+                conn.executemany(INSERT_VIOLATION, rows)
+        except sqlite3.Error as e:
+            self.failed += len(rows)
+            print(f"[DB Writer] ❌ Failed to write {len(rows)} record(s): {e}")
+            return
+        elapsed = time.perf_counter() - start
+        self.written += len(rows)
+        self.flushes += 1
+        self.flush_time += elapsed
+        self.max_flush_time = max(self.max_flush_time, elapsed)
+
+    def _report(self):
+        s = self.stats()
+        if s["flushes"]:
+            print(f"[DB Writer] 💾 {s['written']} record(s) written, {s['flushes']} flush(es) "
+                  f"avg {s['avg_flush_ms']:.1f} ms / max {s['max_flush_ms']:.1f} ms, "
+                  f"queue {s['depth']} (max {s['max_depth']}), {s['dropped']} dropped, {s['failed']} failed")
+        self.flushes = 0
+        self.flush_time = self.max_flush_time = 0.0
+        self.max_depth = self.queue.qsize()
+
+    def _run(self):
+        conn = self._connect()
+        last_report = time.time()
+        stopping = False
+        while not stopping:
+            rows, stopping = self._next_batch()
+            if rows:
+                self._flush(conn, rows)
+            if self.report_every and time.time() - last_report >= self.report_every:
+                self._report()
+                last_report = time.time()
+        # Rows queued after the stop marker (a late save()) still go in
+        leftover = []
+        while True:
+            try:
+                row = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                leftover.append(row)
+        if leftover:
+            self._flush(conn, leftover)
+        conn.close()
+        print(f"[DB Writer] ✅ Flushed and closed ({self.written} record(s) written, {self.dropped} dropped)")
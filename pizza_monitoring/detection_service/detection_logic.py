@@ -2,407 +2,222 @@ import sys
 import os
 # Add root directory to sys.path (pizza_monitoring)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-import cv2
-from ultralytics import YOLO
+import atexit
 import numpy as np
 import time
-from database import save_violation
-from datetime import datetime
-from shared.config import DB_PATH, MODEL_PATH, VIDEO_SOURCE
-# Load model with tracking enabled
-model = YOLO(MODEL_PATH)
-print(model.names)
-model.to('cuda')
-model.model.half()  # Use FP16 for faster inference
-
-# Video capture setup to get FPS
-cap = cv2.VideoCapture(VIDEO_SOURCE)
-fps = cap.get(cv2.CAP_PROP_FPS)
-cap.release()
-print(f"Video FPS: {fps}")
-# ROI (over all containers)
-SCOOPER_CONTAINERS = [
-    (0, (470, 270, 525, 310)),
-    (1, (460, 310, 520, 350)),
-    (2, (450, 355, 500, 390)),
-]
-
-# Tracking state - kept outside process_frame but passed in/out as needed
-person_events = {}  # person_id -> list of events
-fps_grace = int(fps * 0) # Allow 2 seconds grace period for safe pickups
-last_safe_frame = {}  # person_id -> last safe frame
-worker_stats = {}  # Track statistics per worker
-worker_in_roi = {}  # Track which workers are currently in ROI
-
-# Track worker positions to maintain consistent IDs
-worker_positions = {}  # track_id -> last position (x, y)
-worker_id_map = {}     # track_id -> consistent worker ID
-next_worker_id = 1     # Counter for assigning consistent worker IDs
-
-
-def is_inside(box, roi):
-    x1, y1, x2, y2 = box
-    rx1, ry1, rx2, ry2 = roi
-    cx = (x1 + x2) / 2
-    cy = (y1 + y2) / 2
-    return rx1 <= cx <= rx2 and ry1 <= cy <= ry2
-
-def boxes_overlap(box1, box2, iou_thresh=0.1):
-    x1, y1, x2, y2 = box1
-    x1_p, y1_p, x2_p, y2_p = box2
-    xi1 = max(x1, x1_p)
-    yi1 = max(y1, y1_p)
-    xi2 = min(x2, x2_p)
-    yi2 = min(y2, y2_p)
-    inter_area = max(0, xi2 - xi1) * max(0, yi2 - yi1)
-    box1_area = (x2 - x1) * (y2 - y1)
-    box2_area = (x2_p - x1_p) * (y2_p - y1_p)
-    union_area = box1_area + box2_area - inter_area
-    iou = inter_area / union_area if union_area > 0 else 0
-    return iou > iou_thresh
-
-def get_consistent_worker_id(track_id, position, worker_id_map, worker_positions, next_worker_id):
-    """Map tracking IDs to consistent worker IDs based on position"""
-    # If we've seen this track_id before, return its mapped worker_id
-    if track_id in worker_id_map:
-        # Update position
-        worker_positions[track_id] = position
-        return worker_id_map[track_id], worker_id_map, worker_positions, next_worker_id
-    
-    # New track_id, assign a new consistent worker ID
-    worker_id_map[track_id] = next_worker_id
-    worker_positions[track_id] = position
-    next_worker_id += 1
-    return worker_id_map[track_id], worker_id_map, worker_positions, next_worker_id
+from database import ViolationWriter
+from snapshots import SnapshotStore
+from shared.config import DB_PATH, SCOOPER_CONTAINERS, DEFAULT_FPS
+from shared.frame_transform import rois_to_frame, boxes_to_original
+from shared.overlay import make_overlay, draw_overlay
+from backends import DetectorEngine
+from geometry import FrameDetections, centers, center_distances, inside_mask, nearest, overlap_matrix
+from state import CameraState, RoiVisit
+# Model for the configured backend (INFERENCE_BACKEND in shared/config.py).
+# Nothing is loaded at import time: the engine loads on first use or on detector.load()
+detector = DetectorEngine()
+
+# Tracking state lives in a CameraState per camera (see state.py), passed in by the caller
+
+# Violation records go through one background writer thread (started on the first record),
+# after the snapshot thread stored their evidence images (see snapshots.py)
+violation_writer = ViolationWriter(DB_PATH)
+snapshot_store = SnapshotStore(sink=lambda record: violation_writer.save(**record))
+
+def close_recorders():
+    """Store the queued snapshots, then flush their records to the database"""
+    snapshot_store.close()
+    violation_writer.close()
+
+atexit.register(close_recorders)
+
+
+def assign_hands_to_persons(hand_boxes, person_boxes, person_ids, worker_id_map, max_dist=300, xform=None):
+    """
+    Assign every hand to the closest tracked person (center distance below
+    max_dist). Returns one worker ID per hand, None where no person is close enough.
+    Persons must already be registered in worker_id_map.
 
-def assign_hand_to_person(hand_box, person_boxes, worker_id_map, worker_positions, next_worker_id):
-    """Assign a hand to the closest person"""
-    hx1, hy1, hx2, hy2 = hand_box
-    hcx = (hx1 + hx2) / 2
-    hcy = (hy1 + hy2) / 2
-    min_dist = float('inf')
-    assigned_id = None
-    
-    # Maximum distance threshold for hand-person assignment
-    max_dist_threshold = 300
-    
-    for person in person_boxes:
-        if hasattr(person, 'id') and person.id is not None:
-            px1, py1, px2, py2 = person.xyxy[0].cpu().numpy()
-            pcx = (px1 + px2) / 2
-            pcy = (py1 + py2) / 2
-            
-            # Calculate Euclidean distance between hand and person centers
-            dist = np.sqrt((hcx - pcx)**2 + (hcy - pcy)**2)
-            
-            # Check if hand is within reasonable distance of the person
-            if dist < min_dist and dist < max_dist_threshold:
-                min_dist = dist
-                track_id = int(person.id.item())
-                # Get consistent worker ID for this track_id
-                assigned_id, worker_id_map, worker_positions, next_worker_id = get_consistent_worker_id(
-                    track_id, (pcx, pcy), worker_id_map, worker_positions, next_worker_id)
-    
-    return assigned_id, worker_id_map, worker_positions, next_worker_id
+    max_dist is in original frame pixels: boxes of a cropped/resized frame are
+    mapped back through `xform` first, so the assignment does not depend on the
+    reader's resize setting.
+    """
+    hand_boxes = boxes_to_original(np.asarray(hand_boxes, dtype=np.float32).reshape(-1, 4), xform)
+    person_boxes = boxes_to_original(np.asarray(person_boxes, dtype=np.float32).reshape(-1, 4), xform)
+    closest = nearest(center_distances(hand_boxes, person_boxes), max_dist)
+    return [worker_id_map[int(person_ids[i])] if i >= 0 else None for i in closest.tolist()]
 
-def process_frame(frame, frame_id, state=None):
+def process_frame(frame, frame_id, state=None, xform=None, results=None, fps=None, annotate=True, overlay=True):
     """
     Process a single frame with stateless logic
     
     Args:
         frame: The video frame to process
         frame_id: Current frame ID
-        state: Dictionary containing persistent state (tracking info, etc.)
+        state: CameraState of the frame's camera (a new one is created if None)
+        xform: Reader crop/resize transform from the frame metadata (None = original frame)
+        results: Tracked detections for this frame (e.g. from BatchInferenceEngine);
+                 if None the frame is run through model.track here
+        fps: Source fps from the frame metadata (DEFAULT_FPS when unknown)
+        annotate: Draw the overlay onto `frame` here; with False only the compact
+                  result["overlay"] is built (see shared/overlay.py) and whoever shows
+                  the frame draws it with draw_overlay()
+        overlay: Build result["overlay"] at all; False (nobody watching) leaves it None
+                 and skips drawing, the violation logic and database records are unchanged
     
     Returns:
         result: Dictionary with detection results
-        state: Updated state dictionary
+        state: The same CameraState, updated in place
     """
     start_time = time.time()
-    global fps, fps_grace
+    fps = fps or DEFAULT_FPS
+    grace_frames = int(3 * fps)  # frames after leaving the ROI during which a scooper still counts
     
-    # Initialize state if not provided
     if state is None:
-        state = {
-            'worker_id_map': {},
-            'worker_positions': {},
-            'next_worker_id': 1,
-            'person_events': {},
-            'last_safe_frame': {},
-            'worker_stats': {},
-            'processed_violations': set(),
-            'violation_count': 0,
-            'messages': [],
-            'worker_in_roi': {}
-        }
-    
-    # Extract state variables
-    worker_id_map = state['worker_id_map']
-    worker_positions = state['worker_positions']
-    next_worker_id = state['next_worker_id']
-    person_events = state['person_events']
-    last_safe_frame = state['last_safe_frame']
-    worker_stats = state['worker_stats']
-    processed_violations = state['processed_violations']
-    violation_count = state['violation_count']
-    messages = state['messages']
-    worker_in_roi = state['worker_in_roi']
+        state = CameraState()
+    if state.note_frame(frame_id):
+        msg = f"Camera {state.camera_id}: source restarted at frame {frame_id}, open pickup events discarded"
+        print(msg)
+        state.messages.append(msg)
+    worker_in_roi = state.worker_in_roi
     
     # Initialize frame-specific variables
     is_violation = False
     is_safe_pickup = False
+    violation_marks = []  # (worker_id, hand box) to highlight on this frame
+    decided = []  # (PickupEvent, is violation) of the events decided on this frame, one record each
+    
+    # ROIs are configured in original frame pixels; map them onto the (possibly cropped/resized) frame
+    rois = rois_to_frame(SCOOPER_CONTAINERS, xform)
     
-    # Run object detection
-    results = model.track(frame, persist=True, tracker="bytetrack.yaml", conf=0.0001, iou=0.3, verbose=False)[0]
+    # Run object detection (single-stream fallback when no batched results are given)
+    if results is None:
+        results = detector.track(frame, persist=True, tracker="bytetrack.yaml", conf=0.0001, iou=0.3, verbose=False)[0]
 
-    hands, scoopers, pizzas, persons = [], [], [], []
+    # One device-to-host copy of boxes / classes / track ids, then split by label
+    detections = FrameDetections.from_results(results)
+    hands = detections.boxes('hand')
+    scoopers = detections.boxes('scooper')
+    pizzas = detections.boxes('pizza')
+    persons, person_ids = detections.tracked('person')
+    person_centers = centers(persons)
 
-    for box in results.boxes:
-        cls_id = int(box.cls.cpu().numpy().squeeze())
-        label = model.names[cls_id]
-        coords = box.xyxy.cpu().numpy().squeeze()
-        if label == 'hand':
-            hands.append(coords)
-        elif label == 'scooper':
-            scoopers.append(coords)
-        elif label == 'pizza':
-            pizzas.append(coords)
-        elif label == 'person':
-            persons.append(box)
+    # Frame-wide geometry, computed once for every worker and pending event below
+    hand_in_roi = inside_mask(hands, [roi for _, roi in rois])
+    hand_on_pizza = overlap_matrix(hands, pizzas, iou_thresh=0.1).any(axis=1)
+    scooper_used = bool(overlap_matrix(pizzas, scoopers, iou_thresh=0.1).any())
 
-    # Track which hands belong to which worker
-    person_hands = {}
-    
     # Process persons first to establish consistent IDs
-    for person in persons:
-        if hasattr(person, 'id') and person.id is not None:
-            track_id = int(person.id.item())
-            px1, py1, px2, py2 = person.xyxy[0].cpu().numpy()
-            pcx = (px1 + px2) / 2
-            pcy = (py1 + py2) / 2
-            # Get consistent worker ID
-            _, worker_id_map, worker_positions, next_worker_id = get_consistent_worker_id(
-                track_id, (pcx, pcy), worker_id_map, worker_positions, next_worker_id)
-    
-    # Assign hands to persons
-    for hand in hands:
-        worker_id, worker_id_map, worker_positions, next_worker_id = assign_hand_to_person(
-            hand, persons, worker_id_map, worker_positions, next_worker_id)
+    person_workers = [state.consistent_worker_id(track_id, (pcx, pcy), frame_id)
+                      for track_id, (pcx, pcy) in zip(person_ids.tolist(), person_centers.tolist())]
+
+    # Assign hands to persons (hand index lists per worker)
+    person_hands = {}
+    hand_workers = assign_hands_to_persons(hands, persons, person_ids, state.worker_id_map, xform=xform)
+    for hand_idx, worker_id in enumerate(hand_workers):
         if worker_id is None:
             continue
-            
-        if worker_id not in person_hands:
-            person_hands[worker_id] = []
-        person_hands[worker_id].append(hand)
+        person_hands.setdefault(worker_id, []).append(hand_idx)
     
     # Track ROI entry/exit and record events on exit
     current_frame_in_roi = set()
     for worker_id, worker_hands in person_hands.items():
-        worker_in_roi_this_frame = False
-        for hand in worker_hands:
-            for cid, roi in SCOOPER_CONTAINERS:
-                if is_inside(hand, roi):
-                    worker_in_roi_this_frame = True
-                    current_frame_in_roi.add(worker_id)
-                    # Start tracking if not already
-                    if worker_id not in worker_in_roi:
-                        worker_in_roi[worker_id] = {
-                            "start_frame": frame_id,
-                            "hand": hand,
-                            "roi_id": cid,
-                            "scooper_touched": False,
-                            "pizza_touched": False
-                        }
-                    break
-            if worker_in_roi_this_frame:
-                break
+        for hand_idx in worker_hands:
+            inside = np.flatnonzero(hand_in_roi[hand_idx])
+            if len(inside) == 0:
+                continue
+            current_frame_in_roi.add(worker_id)
+            # Start tracking if not already
+            if worker_id not in worker_in_roi:
+                worker_in_roi[worker_id] = RoiVisit(frame_id, hands[hand_idx].copy(), rois[inside[0]][0])
+            break
     
     # Check for workers who exited ROI and record events
     for worker_id in list(worker_in_roi.keys()):
         if worker_id not in current_frame_in_roi:
             # Worker exited ROI - record the event only if no unprocessed events exist
-            if worker_id not in person_events:
-                person_events[worker_id] = []
-            
-            # Check if there's already an unprocessed event for this worker
-            if not any(not e['processed'] for e in person_events[worker_id]):
-                roi_data = worker_in_roi[worker_id]
-                person_events[worker_id].append({
-                    "start_frame": roi_data["start_frame"],
-                    "end_frame": frame_id,
-                    "hand": roi_data["hand"],
-                    "roi_id": roi_data["roi_id"],
-                    "scooper_touched": roi_data["scooper_touched"],
-                    "pizza_touched": roi_data["pizza_touched"],
-                    "processed": False,
-                    "worker_id": worker_id
-                })
+            state.open_event(worker_id, worker_in_roi[worker_id], frame_id, grace_frames)
             del worker_in_roi[worker_id]
 
     # Update ongoing ROI activities
-    for worker_id in worker_in_roi:
+    for worker_id, visit in worker_in_roi.items():
         if worker_id in person_hands:
-            current_worker_hands = person_hands[worker_id]
-            pizza_touched = any(
-                any(boxes_overlap(current_hand, pizza, iou_thresh=0.1) for pizza in pizzas)
-                for current_hand in current_worker_hands
-            )
-            if pizza_touched:
-                worker_in_roi[worker_id]['pizza_touched'] = True
+            if hand_on_pizza[person_hands[worker_id]].any():
+                visit.pizza_touched = True
         
-        scooper_used = any(
-            any(boxes_overlap(pizza, scooper, iou_thresh=0.1) for scooper in scoopers)
-            for pizza in pizzas
-        )
         if scooper_used:
-            worker_in_roi[worker_id]['scooper_touched'] = True
-    
-    # Process completed events (when worker exited ROI)
-    for pid, events in person_events.items():
-        for event in events:
-            if event['processed']:
-                continue
-            
-            age_since_exit = frame_id - event['end_frame']
-            if age_since_exit <= int(3 * fps):
-                # Continue checking for scooper usage during grace period
-                scooper_used = any(
-                    any(boxes_overlap(pizza, scooper, iou_thresh=0.1) for scooper in scoopers)
-                    for pizza in pizzas
-                )
-                if scooper_used:
-                    event['scooper_touched'] = True
-                continue
-                
-            video_time = event["end_frame"] / fps
-            minutes = int(video_time // 60)
-            seconds = int(video_time % 60)
-            worker_id = event['worker_id']
-            
-            # Initialize worker stats if not exists
-            if worker_id not in worker_stats:
-                worker_stats[worker_id] = {
-                    "violations": 0,
-                    "safe_pickups": 0
-                }
-            
-            # Only consider it a violation if worker touched pizza but didn't use a scooper
-            if event['pizza_touched'] and not event['scooper_touched']:
-                violation_count += 1
-                worker_stats[worker_id]["violations"] += 1
-                msg = f"[{minutes:02d}:{seconds:02d}] Violation detected for Worker #{worker_id}!"
-                print(msg)
-                messages.append(msg)
-                hand_box = event['hand']
-                cv2.putText(frame, f"❌ Violation! W#{worker_id}", (int(hand_box[0]), int(hand_box[1]) - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-                cv2.rectangle(frame, (int(hand_box[0]), int(hand_box[1])),
-                            (int(hand_box[2]), int(hand_box[3])), (0, 0, 255), 3)
-                is_violation = True
-            elif event['pizza_touched'] and event['scooper_touched']:
-                worker_stats[worker_id]["safe_pickups"] += 1
-                msg = f"[{minutes:02d}:{seconds:02d}] Safe pickup by Worker #{worker_id}"
-                print(msg)
-                messages.append(msg)
-                last_safe_frame[worker_id] = frame_id
-                is_safe_pickup = True
-            event['processed'] = True
+            visit.scooper_touched = True
+    
+    # Decide the events whose grace period is over (heap by deadline: only due events are touched)
+    for event in state.due_events(frame_id):
+        video_time = event.end_frame / fps
+        minutes = int(video_time // 60)
+        seconds = int(video_time % 60)
+        worker_id = event.worker_id
+        stats = state.stats_for(worker_id)
+        
+        # Only consider it a violation if worker touched pizza but didn't use a scooper
+        if event.pizza_touched and not event.scooper_touched:
+            state.violation_count += 1
+            stats.violations += 1
+            msg = f"[{minutes:02d}:{seconds:02d}] Violation detected for Worker #{worker_id}!"
+            print(msg)
+            state.messages.append(msg)
+            violation_marks.append((worker_id, event.hand))
+            decided.append((event, True))
+            is_violation = True
+        elif event.pizza_touched and event.scooper_touched:
+            stats.safe_pickups += 1
+            msg = f"[{minutes:02d}:{seconds:02d}] Safe pickup by Worker #{worker_id}"
+            print(msg)
+            state.messages.append(msg)
+            state.last_safe_frame[worker_id] = frame_id
+            decided.append((event, False))
+            is_safe_pickup = True
+        event.processed = True
+    
+    # Continue checking for scooper usage during the grace period of the events still open
+    if scooper_used:
+        for event in state.open_events.values():
+            event.scooper_touched = True
+    
+    # Forget tracks that left the scene long ago (bounded state on long runs)
+    state.maybe_evict(frame_id, fps)
 
     # Prepare data for database
     timestamp = time.time()
-    labels_in_frame = []
-    boxes_in_frame = []
-    
-    # Collect all detected objects
-    for box in hands:
-        labels_in_frame.append("hand")
-        boxes_in_frame.append(box.tolist())
-    for box in pizzas:
-        labels_in_frame.append("pizza")
-        boxes_in_frame.append(box.tolist())
-    for box in scoopers:
-        labels_in_frame.append("scooper")
-        boxes_in_frame.append(box.tolist())
-    
-    # Check if we have a violation or safe pickup to record
-    if is_violation or is_safe_pickup:
-        # Create a unique event ID for this frame to prevent duplicate database entries
-        event_id = f"frame_{frame_id}"
-        
-        # Only save if we haven't already saved this exact frame event
-        if event_id not in processed_violations:
-            save_violation(timestamp, "", labels_in_frame, boxes_in_frame, 
-                        is_violation, is_safe_pickup, DB_PATH)
-            processed_violations.add(event_id)  # Mark this frame as processed
-    
-    # Draw bounding boxes on the frame
-    # Draw ROI containers
-    for cid, roi in SCOOPER_CONTAINERS:
-        cv2.rectangle(frame, roi[:2], roi[2:], (255, 255, 0), 2)
-        cv2.putText(frame, f"C{cid}", (roi[0], roi[1] - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-
-    # Draw hands
-    for box in hands:
-        cv2.rectangle(frame, (int(box[0]), int(box[1])), (int(box[2]), int(box[3])), (0, 255, 0), 2)
-        cv2.putText(frame, "Hand", (int(box[0]), int(box[1]) - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-    # Draw pizzas
-    for box in pizzas:
-        cv2.rectangle(frame, (int(box[0]), int(box[1])), (int(box[2]), int(box[3])), (0, 165, 255), 2)
-        cv2.putText(frame, "Pizza", (int(box[0]), int(box[1]) - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 165, 255), 2)
-
-    # Draw scoopers
-    for box in scoopers:
-        cv2.rectangle(frame, (int(box[0]), int(box[1])), (int(box[2]), int(box[3])), (255, 0, 255), 2)
-        cv2.putText(frame, "Scooper", (int(box[0]), int(box[1]) - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 255), 2)
-
-    # Draw persons
-    for person in persons:
-        if hasattr(person, 'id') and person.id is not None:
-            track_id = int(person.id.item())
-            coords = person.xyxy[0].cpu().numpy()
-            pcx = (coords[0] + coords[2]) / 2
-            pcy = (coords[1] + coords[3]) / 2
-            
-            # Get consistent worker ID
-            worker_id = worker_id_map.get(track_id, 0)
-            
-            cv2.rectangle(frame, (int(coords[0]), int(coords[1])), (int(coords[2]), int(coords[3])), (255, 255, 255), 2)
-            cv2.putText(frame, f"Worker #{worker_id}", (int(coords[0]), int(coords[1]) - 5), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-    # Display overall violation count
-    cv2.putText(frame, f"Total Violations: {violation_count}", (10, 30),
-                cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 255), 2)
-    
-    # Display per-worker statistics
-    y_offset = 60
-    for worker_id, stats in worker_stats.items():
-        cv2.putText(frame, f"Worker #{worker_id}: {stats['violations']} violations, {stats['safe_pickups']} safe", 
-                (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        y_offset += 25
-
-    # Display recent messages
-    for i, msg in enumerate(messages[-1:]):
-        cv2.putText(frame, msg, (10, y_offset + i * 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-    
-    # Add violation indicators
-    if is_violation:
-        cv2.rectangle(frame, (10, 10), (frame.shape[1]-10, frame.shape[0]-10), (0, 0, 255), 5)
     
-    # Update state
-    updated_state = {
-        'worker_id_map': worker_id_map,
-        'worker_positions': worker_positions,
-        'next_worker_id': next_worker_id,
-        'person_events': person_events,
-        'last_safe_frame': last_safe_frame,
-        'worker_stats': worker_stats,
-        'processed_violations': processed_violations,
-        'violation_count': violation_count,
-        'messages': messages,
-        'worker_in_roi': worker_in_roi
-    }
+    # Collect all detected objects (recorded in original frame coordinates)
+    labels_in_frame = ["hand"] * len(hands) + ["pizza"] * len(pizzas) + ["scooper"] * len(scoopers)
+    boxes_in_frame = boxes_to_original(np.concatenate((hands, pizzas, scoopers)), xform).tolist()
+    
+    # Record every violation / safe pickup decided on this frame (one row per event)
+    if decided:
+        # Only save if we haven't already saved the events of this exact frame
+        if frame_id != state.last_saved_frame:
+            for event, violation in decided:
+                record = dict(timestamp=timestamp, camera_id=state.camera_id, worker_id=event.worker_id,
+                              frame_id=frame_id, roi_id=event.roi_id, path="", labels=labels_in_frame,
+                              boxes=boxes_in_frame, is_violation=violation, is_safe_pickup=not violation)
+                # Evidence: this frame, cropped to the worker if visible, else to the pickup hand
+                worker_box = persons[person_workers.index(event.worker_id)] \
+                    if event.worker_id in person_workers else event.hand
+                snapshot_store.save_event(frame, worker_box, record)
+            state.last_saved_frame = frame_id  # Mark this frame as processed
+    
+    # Everything the overlay needs as plain ints/strings, so it can be published with the
+    # frame and drawn after later frames changed the state
+    if overlay:
+        overlay = make_overlay(
+            rois, {visit.roi_id for visit in worker_in_roi.values()}, hands, pizzas, scoopers, persons,
+            person_workers, violation_marks,
+            state.violation_count,
+            {worker_id: (stats.violations, stats.safe_pickups) for worker_id, stats in state.worker_stats.items()},
+            state.messages[-1] if state.messages else "", is_violation)
+        if annotate:
+            draw_overlay(frame, overlay)
+    else:
+        overlay = None
     
     # Return result
     return {
@@ -413,5 +228,6 @@ def process_frame(frame, frame_id, state=None):
         "labels": labels_in_frame,
         "boxes": boxes_in_frame,
         "annotated_frame": frame,
+        "overlay": overlay,
         "processing_time": time.time() - start_time
-    }, updated_state
\ No newline at end of file
+    }, state
\ No newline at end of file
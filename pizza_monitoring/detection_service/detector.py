@@ -3,108 +3,231 @@ import os
 # Add root directory to sys.path (pizza_monitoring)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pika
-import json
-import base64
 import cv2
 import time
 import sqlite3
-from concurrent.futures import ThreadPoolExecutor
+import threading
 
-from detection_logic import process_frame
-from utils import decode_base64_frame
-from shared.config import RABBITMQ_HOST, RABBITMQ_QUEUE, PROCESSED_QUEUE, DB_PATH
+from detection_logic import process_frame, detector, close_recorders
+from inference import BatchInferenceEngine
+from pipeline import Pipeline, Stage
+from state import StateRegistry
+from utils import decode_frame_payload
+from shared.config import (RABBITMQ_HOST, RABBITMQ_QUEUE, PROCESSED_QUEUE, DB_PATH, PUBLISH_CONFIRM,
+                           SHM_SLOTS, SHM_SLOT_BYTES, INFERENCE_MAX_BATCH,
+                           INFERENCE_MAX_WAIT_MS, MODEL_WARMUP_RUNS, DEFAULT_FPS, DETECTOR_PREFETCH,
+                           DETECTOR_DECODE_WORKERS, DETECTOR_PACKAGE_WORKERS, DETECTOR_STAGE_QUEUE,
+                           DETECTOR_DRAIN_SECONDS)
 from database import init_db
+from shared.frame_protocol import pack_frame, unpack_frame, CODEC_SHM, CODEC_RAW, CODEC_JPEG
+from shared.shm_ring import SharedFrameRing
+from shared.rabbit_publisher import RabbitPublisher
+from shared.queues import declare_queue, SequenceGapTracker
+from shared.viewer_presence import ViewerPresence
 
-# Use a single worker for detection_logic to avoid race conditions with global variables
-# But use a separate thread pool for encoding/publishing to maintain throughput
-executor = ThreadPoolExecutor(max_workers=1)  # Single worker for detection logic
-publish_executor = ThreadPoolExecutor(max_workers=3)  # Multiple workers for publishing
+# Batched forward pass over all cameras, with one ByteTrack instance per camera
+# (the model itself is only loaded by prepare_detector())
+inference_engine = BatchInferenceEngine(detector)
 
-# Shared state dictionary that will be passed to process_frame
-detection_state = None
-current_frame_id = 0
+# One long-lived publisher (own I/O thread + persistent channel) for result frames
+publisher = RabbitPublisher(PROCESSED_QUEUE, confirm=PUBLISH_CONFIRM, name="Detector Publisher")
+
+# Viewer count from the streamer: frames are only packaged and published while someone watches
+viewer_presence = ViewerPresence(RABBITMQ_HOST)
+
+# Per-camera detection state (CameraState by camera id), and per-camera frame counters
+detection_states = StateRegistry()
+frame_counters = {}
+
+# Frames lost on video_frames (broker drop-head / TTL), from sequence gaps
+drop_tracker = SequenceGapTracker()
+
+# Per-camera sequence of the result frames actually published (meta["out_seq"]). The streamer counts
+# gaps on this one: source frames skipped while nobody watches, or already lost before the detector,
+# are not frames lost on processed_frames
+output_seqs = {}
+
+# Output rings for frames that arrived through shared memory (camera id -> ring)
+output_rings = {}
+output_rings_lock = threading.Lock()
 
 def encode_frame(frame):
     try:
         _, buffer = cv2.imencode('.jpg', frame)
-        return base64.b64encode(buffer).decode('utf-8')
+        return buffer.tobytes()
     except Exception as e:
         print(f"[Detector] ❌ Error encoding frame: {e}")
-        return ""
+        return b""
 
-def publish_result(frame_b64):
-    """Handle publishing results to RabbitMQ (runs in separate thread pool)"""
-    message = {"frame": frame_b64}
+def build_result_message(task):
+    """
+    Envelope for the original frame plus its detection overlay metadata in
+    meta["det"] (see shared/overlay.py). The frame goes out as it came in:
+    JPEG and raw payloads are forwarded untouched, shared-memory frames are
+    copied into the detector's own ring (the reader's slot will be reused).
+    """
+    header, frame = task.header, task.frame
+    meta = {"det": task.result["overlay"], "out_seq": task.out_seq}
+    if header.codec == CODEC_SHM:
+        with output_rings_lock:
+            ring = output_rings.get(header.camera_id)
+            if ring is None:
+                ring = SharedFrameRing(f"pizza_processed_cam{header.camera_id}", SHM_SLOTS, SHM_SLOT_BYTES, create=True)
+                output_rings[header.camera_id] = ring
+        if ring.fits(frame):
+            meta.update(ring.write(header.seq, frame))
+            return pack_frame(b"", camera_id=header.camera_id, seq=header.seq, timestamp=header.timestamp,
+                              shape=frame.shape, codec=CODEC_SHM, meta=meta)
+        payload, codec = encode_frame(frame), CODEC_JPEG
+    elif header.codec == CODEC_RAW:
+        payload, codec = task.payload, CODEC_RAW
+    else:
+        payload, codec = task.payload, CODEC_JPEG  # JPEG bytes (also for legacy base64 messages)
+    return pack_frame(payload, camera_id=header.camera_id, seq=header.seq, timestamp=header.timestamp,
+                      shape=frame.shape, codec=codec, meta=meta)
 
-    try:
-        connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST))
-        channel = connection.channel()
-        channel.queue_declare(queue=PROCESSED_QUEUE, durable=False)
-        channel.confirm_delivery()
+class FrameTask:
+    """One message on its way through the detector pipeline"""
+    __slots__ = ("body", "ack", "header", "payload", "frame", "camera_id", "frame_id", "fps",
+                 "results", "result", "message", "out_seq")
 
-        message_body = json.dumps(message).encode('utf-8')
-        channel.basic_publish(
-            exchange='',
-            routing_key=PROCESSED_QUEUE,
-            body=message_body
-        )
+    def __init__(self, body, ack=None):
+        self.body = body
+        self.ack = ack  # acknowledges the broker delivery once the frame leaves the pipeline
+        self.header = self.payload = self.frame = self.results = self.result = self.message = None
+        self.camera_id = self.frame_id = self.out_seq = 0
+        self.fps = DEFAULT_FPS
 
+# ─────────────────────────────
+# Pipeline stages
+#
+#   decode (pool) -> inference + tracking (1 thread, batched) -> logic (1 thread)
+#   -> package (pool) -> publish (in order)
+#
+# Nothing is drawn or re-encoded here: the streamer renders the overlay
+# metadata only on the frames it actually sends to a viewer.
+# ─────────────────────────────
+def decode_stage(task):
+    # Keep the encoded payload (a view into the body): it is forwarded as is
+    task.header, task.payload = unpack_frame(task.body)
+    task.frame = decode_frame_payload(task.header, task.payload)
+    task.body = None
+    if task.frame is None:
+        print("[Detector] ❌ Failed to decode frame (or shared-memory slot already reused)")
+        return None
+    return task
 
-        print("[Detector] ✅ Message published to processed_frames")
+def inference_stage(tasks):
+    """Detection + tracking for a batch of frames from any cameras, in arrival order"""
+    for task in tasks:
+        header = task.header
+        task.camera_id = camera_id = header.camera_id
+        missed = drop_tracker.update(camera_id, header.seq)
+        if missed:
+            print(f"[Detector] ⚠️ {missed} frame(s) dropped upstream for camera {camera_id} "
+                  f"(total dropped: {drop_tracker.total_dropped()})")
+        # Use the source frame index when the reader provides it, so skipped frames keep the time base
+        frame_counters[camera_id] = frame_counters.get(camera_id, 0) + 1
+        task.frame_id = header.meta.get("src_idx", frame_counters[camera_id])
+        # Source fps from the reader's metadata (keeps tracker and grace windows on the video time base)
+        task.fps = header.meta.get("fps") or DEFAULT_FPS
 
-    except Exception as e:
-        print(f"[Detector] ❌ Failed to publish message: {e}")
-    finally:
-        if 'connection' in locals() and connection.is_open:
-            connection.close()
+    results = inference_engine.run_batch([(t.camera_id, t.frame, t.fps) for t in tasks])
+    for task, result in zip(tasks, results):
+        task.results = result
+    return tasks
+
+def batch_has_every_camera(tasks):
+    """Stop waiting for a fuller batch once every known camera has a frame in it"""
+    return len({t.header.camera_id for t in tasks}) >= max(1, len(inference_engine.trackers))
+
+def logic_stage(task):
+    """Violation logic with the camera's state; only the compact overlay metadata is built (if watched)"""
+    task.result, _ = process_frame(
+        task.frame, task.frame_id, detection_states.get(task.camera_id),
+        task.header.meta.get("xform"), task.results, task.fps, annotate=False,
+        overlay=viewer_presence.active())
+    task.results = None
+    if task.result["overlay"] is not None:
+        # Numbered here, on the single in-order logic stage, so the numbers follow publish order
+        output_seqs[task.camera_id] = task.out_seq = output_seqs.get(task.camera_id, 0) + 1
+    detection_states.maybe_report()
+    return task
+
+def package_stage(task):
+    if task.result["overlay"] is None:
+        # Nobody is watching: the frame was fully processed, there is just nothing to send
+        viewer_presence.record_skipped()
+    else:
+        # Result message keeps the camera id / sequence / capture time of the source frame
+        start = time.perf_counter()
+        task.message = build_result_message(task)
+        viewer_presence.record_published(len(task.message), time.perf_counter() - start)
+    task.frame = task.payload = task.result = None
+    viewer_presence.maybe_report()
+    return task
+
+def publish_result(task):
+    # Hand off to the publisher's I/O thread (non-blocking)
+    if task.message is not None:
+        publisher.publish(task.message)
+
+def release_task(task):
+    if task.ack is not None:
+        try:
+            task.ack()
+        except Exception as e:
+            # Connection already gone (e.g. while draining on shutdown): the broker redelivers the frame
+            print(f"[Detector] ⚠️ Could not ack frame: {e}")
+
+pipeline = Pipeline([
+    Stage("decode", decode_stage, workers=DETECTOR_DECODE_WORKERS, maxsize=DETECTOR_STAGE_QUEUE),
+    Stage("inference", inference_stage, maxsize=DETECTOR_STAGE_QUEUE, batch_size=INFERENCE_MAX_BATCH,
+          max_wait_ms=INFERENCE_MAX_WAIT_MS, batch_complete=batch_has_every_camera),
+    Stage("logic", logic_stage, maxsize=DETECTOR_STAGE_QUEUE),
+    Stage("package", package_stage, workers=DETECTOR_PACKAGE_WORKERS, maxsize=DETECTOR_STAGE_QUEUE),
+], sink=publish_result, release=release_task, name="Detector Pipeline")
 
 def handle_detection_task(body):
-    """Process frame detection in a single thread to avoid race conditions"""
-    global detection_state, current_frame_id
-    
-    start_time = time.time()
-    print("[Detector] 🟢 Received frame for processing...")
-    
-    # Increment frame ID
-    current_frame_id += 1
-    frame_id = current_frame_id
-    
-    # Decode frame
-    frame = decode_base64_frame(body)
-    if frame is None:
-        print("[Detector] ❌ Failed to decode frame")
-        return
-    
-    # Process frame with stateless function, passing in and getting back state
-    result, updated_state = process_frame(frame, frame_id, detection_state)
-    
-    # Update shared state
-    detection_state = updated_state
-    
-    # Encode annotated frame
-    frame_b64 = encode_frame(result["annotated_frame"])
-    
-    # Submit publishing to a separate thread pool to maintain throughput
-    publish_executor.submit(publish_result, frame_b64)
+    """Queue one message body for processing (blocks while the first stage is full)"""
+    pipeline.submit(FrameTask(body))
 
-# Dispatch to thread pool
+# Hand the message to the pipeline; it is acked from the connection thread once published or dropped
 def callback(ch, method, properties, body):
-    executor.submit(handle_detection_task, body)
+    connection = ch.connection
+    tag = method.delivery_tag
+    ack = lambda: connection.add_callback_threadsafe(lambda: ch.basic_ack(delivery_tag=tag))
+    pipeline.submit(FrameTask(body, ack))
+
+def prepare_detector():
+    """Load the model, warm it up at full batch size and start the inference thread"""
+    detector.load()
+    print(f"[Detector] 🧠 Model loaded in {detector.load_time:.2f}s ({detector.model.backend_name} backend)")
+    detector.warmup(MODEL_WARMUP_RUNS, INFERENCE_MAX_BATCH)
+    print(f"[Detector] 🔥 Warm-up ({MODEL_WARMUP_RUNS} x batch {INFERENCE_MAX_BATCH}) took {detector.warmup_time:.2f}s")
+    pipeline.start()
 
 def run_detector():
     start_time = time.time()
+    # Only consume once the model is ready, so the first frames don't queue behind loading
+    prepare_detector()
+    
     connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST))
     channel = connection.channel()
-    channel.queue_declare(queue=RABBITMQ_QUEUE, durable=False)
+    declare_queue(channel, RABBITMQ_QUEUE)
     
-    # Set prefetch count to 1 to ensure we process one frame at a time
-    # This helps maintain the correct order of frames and avoid overwhelming the detector
-    channel.basic_qos(prefetch_count=1)
+    # Unacked frames are bounded by the prefetch count: the broker holds (and drop-heads)
+    # the rest, so the pipeline never builds up more than DETECTOR_PREFETCH frames
+    channel.basic_qos(prefetch_count=DETECTOR_PREFETCH)
     
-    channel.basic_consume(queue=RABBITMQ_QUEUE, on_message_callback=callback, auto_ack=True)
+    publisher.start()
+    viewer_presence.start()
+    channel.basic_consume(queue=RABBITMQ_QUEUE, on_message_callback=callback, auto_ack=False)
     print("[Detector] 🟢 Started consuming frames...")
     print(f"[Detector] 🕒 Initialization took {time.time() - start_time:.2f} seconds")
-    print(f"[Detector] 💡 Using 1 worker for detection and {publish_executor._max_workers} workers for publishing")
+    print(f"[Detector] 💡 Pipeline: {DETECTOR_DECODE_WORKERS} decode worker(s) -> batched inference "
+          f"(max batch {INFERENCE_MAX_BATCH}, max wait {INFERENCE_MAX_WAIT_MS} ms) -> logic -> "
+          f"{DETECTOR_PACKAGE_WORKERS} package worker(s) -> publisher (confirm={PUBLISH_CONFIRM})")
     channel.start_consuming()
 
 if __name__ == "__main__":
@@ -115,7 +238,15 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"[Detector] ❌ Error: {e}")
     finally:
-        # Shutdown thread pools gracefully
-        executor.shutdown(wait=False)
-        publish_executor.shutdown(wait=False)
-        print("[Detector] ✅ Thread pools and connection closed.")
\ No newline at end of file
+        # Let frames already in the pipeline finish, so decided events still reach the snapshot store
+        # and the database, then stop the stages before anything they write to is closed
+        if not pipeline.drain(DETECTOR_DRAIN_SECONDS):
+            print(f"[Detector] ⚠️ Pipeline not drained after {DETECTOR_DRAIN_SECONDS:.0f}s, stopping anyway")
+        pipeline.stop()
+        viewer_presence.stop()
+        publisher.close()
+        # Store the queued snapshots and flush the violation records to the database
+        close_recorders()
+        for ring in output_rings.values():
+            ring.close()
+        print("[Detector] ✅ Pipeline and connection closed.")
\ No newline at end of file
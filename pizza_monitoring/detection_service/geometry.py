@@ -0,0 +1,102 @@
+# pizza_monitoring/detection_service/geometry.py
+
+import numpy as np
+
+# ────────────────────────────────────────────────
+# Vectorized box geometry for the per-frame logic
+#
+# Boxes are (N, 4) float arrays in xyxy order. Every helper works on whole
+# arrays at once, so hands x persons, hands x pizzas and pizzas x scoopers
+# are single NumPy operations instead of nested Python loops, and the
+# detections leave the GPU in one transfer per frame.
+# ────────────────────────────────────────────────
+
+class FrameDetections:
+    """Host-side copy of one frame's detections, split by class label"""
+    __slots__ = ("xyxy", "cls", "ids", "names")
+
+    def __init__(self, xyxy, cls, ids, names):
+        self.xyxy = xyxy
+        self.cls = cls
+        self.ids = ids  # track ids, -1 for untracked boxes
+        self.names = names  # class id -> label
+
+    @classmethod
+    def from_results(cls, results, names=None):
+        """
+        One device-to-host transfer of results.boxes.data, whose columns are
+        x1, y1, x2, y2, [track id], conf, cls (the id column only exists when tracked).
+        Class names default to the ones carried by the Results object.
+        """
+        data = results.boxes.data
+        if hasattr(data, "cpu"):
+            data = data.cpu().numpy()
+        data = np.asarray(data, dtype=np.float32)
+        xyxy = data[:, :4]
+        cls_ids = data[:, -1].astype(np.int64)
+        if data.shape[1] == 7:
+            ids = data[:, 4].astype(np.int64)
+        else:
+            ids = np.full(len(data), -1, dtype=np.int64)
+        return cls(xyxy, cls_ids, ids, names if names is not None else results.names)
+
+    def mask(self, label):
+        class_ids = [k for k, v in self.names.items() if v == label]
+        return np.isin(self.cls, class_ids)
+
+    def boxes(self, label):
+        return self.xyxy[self.mask(label)]
+
+    def tracked(self, label):
+        """(boxes, track ids) of the tracked boxes with this label"""
+        m = self.mask(label) & (self.ids >= 0)
+        return self.xyxy[m], self.ids[m]
+
+
+def centers(boxes):
+    """(N, 2) box centers"""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return np.stack(((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2), axis=1)
+
+
+def center_distances(a, b):
+    """(N, M) Euclidean distances between the centers of boxes a and b"""
+    diff = centers(a)[:, None, :] - centers(b)[None, :, :]
+    return np.sqrt((diff ** 2).sum(axis=2))
+
+
+def iou_matrix(a, b):
+    """(N, M) IoU between boxes a and b (0 where the union is empty)"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    xi1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    yi1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    xi2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    yi2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(xi2 - xi1, 0, None) * np.clip(yi2 - yi1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def overlap_matrix(a, b, iou_thresh=0.1):
+    """(N, M) bool, same test as boxes_overlap() for every pair"""
+    return iou_matrix(a, b) > iou_thresh
+
+
+def inside_mask(boxes, rois):
+    """(N, R) bool: center of box n lies in roi r (edges included, like is_inside())"""
+    c = centers(boxes)
+    r = np.asarray(rois, dtype=np.float32).reshape(-1, 4)
+    return ((r[None, :, 0] <= c[:, None, 0]) & (c[:, None, 0] <= r[None, :, 2]) &
+            (r[None, :, 1] <= c[:, None, 1]) & (c[:, None, 1] <= r[None, :, 3]))
+
+
+def nearest(distances, max_dist):
+    """Index of the nearest column per row (first on ties), -1 where none is closer than max_dist"""
+    if distances.shape[1] == 0:
+        return np.full(distances.shape[0], -1, dtype=np.int64)
+    best = distances.argmin(axis=1)
+    ok = distances[np.arange(len(best)), best] < max_dist
+    return np.where(ok, best, -1)
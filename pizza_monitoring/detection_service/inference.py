@@ -0,0 +1,84 @@
+# pizza_monitoring/detection_service/inference.py
+
+import time
+
+import torch
+import yaml
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+
+
+def load_tracker_config(tracker="bytetrack.yaml"):
+    with open(check_yaml(tracker), encoding="utf-8") as f:
+        return IterableSimpleNamespace(**yaml.safe_load(f))
+
+
+# ────────────────────────────────────────────────
+# Batched multi-camera inference
+#
+# model.track(persist=True) keeps a single tracker inside the model's
+# predictor, so frames from different cameras would corrupt each other's
+# track ids. Here detection runs as one batched model.predict() over frames
+# from several cameras, and each camera's slice of the results goes through
+# its own BYTETracker. This is the same post-processing ultralytics does in
+# its on_predict_postprocess_end tracking callback.
+#
+# Batches are formed by the detector pipeline's inference stage
+# (INFERENCE_MAX_BATCH / INFERENCE_MAX_WAIT_MS, see detector.py), which also
+# serialises calls, so this class only runs them.
+# ────────────────────────────────────────────────
+class BatchInferenceEngine:
+    def __init__(self, model, tracker="bytetrack.yaml", conf=0.0001, iou=0.3, report_every=10.0):
+        self.model = model
+        self.tracker_cfg = load_tracker_config(tracker)
+        self.predict_args = {"conf": conf, "iou": iou, "verbose": False}
+        self.report_every = report_every
+
+        self.trackers = {}  # camera_id -> BYTETracker
+
+        # Stats (reset every report)
+        self.batches = 0
+        self.frames = 0
+        self.batch_time_total = 0.0
+        self._last_report = time.time()
+
+    def run_batch(self, requests):
+        """
+        Detect + track a list of (camera_id, frame, fps) in one forward pass and
+        return their Results in the same order
+        """
+        start = time.perf_counter()
+        results = self.model.predict([frame for _, frame, _ in requests], **self.predict_args)
+        # Trackers are stateful: apply them in submission order
+        tracked = [self._track(camera_id, fps, result) for (camera_id, _, fps), result in zip(requests, results)]
+        self.batches += 1
+        self.frames += len(requests)
+        self.batch_time_total += time.perf_counter() - start
+        self._maybe_report()
+        return tracked
+
+    def _track(self, camera_id, fps, result):
+        tracker = self.trackers.get(camera_id)
+        if tracker is None:
+            tracker = BYTETracker(args=self.tracker_cfg, frame_rate=int(round(fps or 30)))
+            self.trackers[camera_id] = tracker
+        det = result.boxes.cpu().numpy()
+        tracks = tracker.update(det, result.orig_img)
+        if len(tracks) == 0:
+            return result
+        idx = tracks[:, -1].astype(int)
+        result = result[idx]
+        result.update(boxes=torch.as_tensor(tracks[:, :-1]))
+        return result
+
+    def _maybe_report(self):
+        now = time.time()
+        elapsed = now - self._last_report
+        if not self.report_every or elapsed < self.report_every or not self.batches:
+            return
+        print(f"[Inference] 📊 {self.frames / elapsed:.1f} fps over {len(self.trackers)} camera(s) | "
+              f"avg batch {self.frames / self.batches:.1f} frames, {1e3 * self.batch_time_total / self.batches:.1f} ms")
+        self.batches = self.frames = 0
+        self.batch_time_total = 0.0
+        self._last_report = now
@@ -0,0 +1,209 @@
+# pizza_monitoring/detection_service/pipeline.py
+
+import queue
+import threading
+import time
+
+# ────────────────────────────────────────────────
+# Staged pipeline with ordered reassembly
+#
+# Each Stage has a bounded input queue and `workers` threads. Items get a
+# stage-local sequence number when they are queued, and results are only
+# passed on in that order, so a pool stage can finish out of order while
+# the next stage still sees frames in arrival order. A single-worker stage
+# is therefore strictly ordered end to end (e.g. the stateful tracker).
+#
+# A stage function returns the item to pass on, or None to drop it; the
+# pipeline then releases the item (e.g. acks the message) either way.
+# ────────────────────────────────────────────────
+class Stage:
+    def __init__(self, name, fn, workers=1, maxsize=8, batch_size=1, max_wait_ms=0, batch_complete=None):
+        """
+        batch_size > 1 turns `fn` into a batch function: it gets a list of
+        items and returns a list of results in the same order. The first
+        item waits up to max_wait_ms for more to arrive, or until
+        batch_complete(items) says the batch is worth running.
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batch_complete = batch_complete
+        self.queue = queue.Queue(maxsize)
+
+        self.emit = None     # set by Pipeline: next stage's put() or the sink
+        self.on_drop = None  # set by Pipeline: release of a dropped item
+
+        self._in_seq = 0
+        self._in_lock = threading.Lock()
+        self._out_seq = 0
+        self._finished = {}  # seq -> result (None = dropped), waiting for earlier seqs
+        self._out_lock = threading.Lock()
+        self._threads = []
+
+        # Stats (reset every report)
+        self.items = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+
+    def put(self, item):
+        """Queue an item (blocks while the stage is full)"""
+        with self._in_lock:
+            seq = self._in_seq
+            self._in_seq += 1
+            self.queue.put((seq, time.perf_counter(), item))
+
+    def start(self, stop_event):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, args=(stop_event,),
+                                      name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_batch(self, stop_event):
+        try:
+            first = self.queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        if self.batch_size > 1:
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.batch_size and not stop_event.is_set():
+                if self.batch_complete and self.batch_complete([entry[2] for entry in batch]):
+                    break
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+        return batch
+
+    def _work(self, stop_event):
+        while not stop_event.is_set():
+            batch = self._next_batch(stop_event)
+            if not batch:
+                continue
+            start = time.perf_counter()
+            items = [entry[2] for entry in batch]
+            try:
+                results = self.fn(items) if self.batch_size > 1 else [self.fn(items[0])]
+            except Exception as e:
+                print(f"[Pipeline] ❌ Stage '{self.name}' failed: {e}")
+                results = [None] * len(items)
+            elapsed = time.perf_counter() - start
+
+            with self._out_lock:
+                self.items += len(items)
+                self.busy_time += elapsed
+                self.wait_time += sum(start - entry[1] for entry in batch)
+                for (seq, _, item), result in zip(batch, results):
+                    if result is None:
+                        self.dropped += 1
+                        self.on_drop(item)
+                    self._finished[seq] = result
+                # Pass results on strictly in arrival order
+                while self._out_seq in self._finished:
+                    result = self._finished.pop(self._out_seq)
+                    self._out_seq += 1
+                    if result is not None:
+                        self.emit(result)
+
+    def stats(self, elapsed):
+        with self._out_lock:
+            stats = {
+                "items": self.items,
+                "rate": self.items / elapsed if elapsed > 0 else 0.0,
+                "service_ms": 1e3 * self.busy_time / self.items if self.items else 0.0,
+                "wait_ms": 1e3 * self.wait_time / self.items if self.items else 0.0,
+                "utilization": self.busy_time / (elapsed * self.workers) if elapsed > 0 else 0.0,
+                "depth": self.queue.qsize(),
+                "dropped": self.dropped,
+            }
+            self.items = self.dropped = 0
+            self.busy_time = self.wait_time = 0.0
+        return stats
+
+
+class Pipeline:
+    def __init__(self, stages, sink, release=None, name="Pipeline", report_every=10.0):
+        """
+        stages   Stage list, run in order
+        sink     called in order with every item that made it through all stages
+        release  called exactly once per submitted item after the sink or a drop
+        """
+        self.stages = stages
+        self.sink = sink
+        self.release = release
+        self.name = name
+        self.report_every = report_every
+
+        self._stop = threading.Event()
+        self._inflight = 0
+        self._idle = threading.Condition()
+
+        for stage, nxt in zip(stages, stages[1:]):
+            stage.emit = nxt.put
+        stages[-1].emit = self._deliver
+        for stage in stages:
+            stage.on_drop = self._release
+
+    def start(self):
+        for stage in self.stages:
+            stage.start(self._stop)
+        if self.report_every:
+            threading.Thread(target=self._report_loop, name=f"{self.name}-report", daemon=True).start()
+        return self
+
+    def submit(self, item):
+        with self._idle:
+            self._inflight += 1
+        self.stages[0].put(item)
+
+    def drain(self, timeout=None):
+        """Wait until every submitted item has been released"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._inflight == 0, timeout)
+
+    def stop(self):
+        self._stop.set()
+
+    def _deliver(self, item):
+        try:
+            self.sink(item)
+        except Exception as e:
+            print(f"[{self.name}] ❌ Sink failed: {e}")
+        self._release(item)
+
+    def _release(self, item):
+        if self.release is not None:
+            self.release(item)
+        with self._idle:
+            self._inflight -= 1
+            if self._inflight == 0:
+                self._idle.notify_all()
+
+    # ─────────────────────────────
+    # Per-stage timing
+    # ─────────────────────────────
+    def _report_loop(self):
+        last = time.time()
+        while not self._stop.wait(self.report_every):
+            now = time.time()
+            self.report(now - last)
+            last = now
+
+    def report(self, elapsed):
+        stats = [(stage, stage.stats(elapsed)) for stage in self.stages]
+        if not any(s["items"] for _, s in stats):
+            return
+        parts = []
+        for stage, s in stats:
+            dropped = f", {s['dropped']} dropped" if s["dropped"] else ""
+            parts.append(f"{stage.name} {s['rate']:.1f}/s {s['service_ms']:.1f} ms "
+                         f"(wait {s['wait_ms']:.1f} ms, q {s['depth']}/{stage.maxsize}, "
+                         f"{100 * s['utilization']:.0f}% busy{dropped})")
+        bottleneck = max(stats, key=lambda pair: pair[1]["utilization"])[0]
+        print(f"[{self.name}] 📊 " + " | ".join(parts) + f" | bottleneck: {bottleneck.name}")
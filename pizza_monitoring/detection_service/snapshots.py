@@ -0,0 +1,202 @@
+# pizza_monitoring/detection_service/snapshots.py
+
+import hashlib
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from shared.config import (SNAPSHOT_DIR, SNAPSHOT_ENABLED, SNAPSHOT_FRAME_WIDTH, SNAPSHOT_CROP_MARGIN,
+                           SNAPSHOT_JPEG_QUALITY, SNAPSHOT_QUEUE, SNAPSHOT_MAX_AGE_DAYS, SNAPSHOT_MAX_BYTES,
+                           SNAPSHOT_CLEANUP_INTERVAL)
+
+# ────────────────────────────────────────────────
+# Evidence snapshots
+#
+# For every recorded violation / safe pickup the detection thread only
+# copies the frame and queues it. A background thread crops the worker,
+# downscales the full frame, JPEG-encodes both and stores them under their
+# SHA-256 ("ab/abcdef...jpg" below SNAPSHOT_DIR), so identical images are
+# stored once. It then hands the database record, with both paths filled
+# in, to `sink` (the violation writer). If the queue is full the record is
+# passed on without snapshots rather than waiting.
+#
+# A cleanup pass every SNAPSHOT_CLEANUP_INTERVAL seconds deletes files
+# older than SNAPSHOT_MAX_AGE_DAYS, then the oldest ones until the store
+# fits in SNAPSHOT_MAX_BYTES. Rows keep their paths; the streamer answers
+# 404 for snapshots that were cleaned up.
+# ────────────────────────────────────────────────
+_STOP = object()
+
+
+def crop_box(box, shape, margin):
+    """Integer crop of `box` grown by `margin` (fraction of its size) per side, clipped to the frame"""
+    x1, y1, x2, y2 = (float(v) for v in box[:4])
+    dx, dy = (x2 - x1) * margin, (y2 - y1) * margin
+    h, w = shape[:2]
+    return (max(0, int(x1 - dx)), max(0, int(y1 - dy)), min(w, int(x2 + dx) + 1), min(h, int(y2 + dy) + 1))
+
+
+class SnapshotStore:
+    def __init__(self, root=SNAPSHOT_DIR, sink=None, enabled=SNAPSHOT_ENABLED, frame_width=SNAPSHOT_FRAME_WIDTH,
+                 crop_margin=SNAPSHOT_CROP_MARGIN, quality=SNAPSHOT_JPEG_QUALITY, max_queue=SNAPSHOT_QUEUE,
+                 max_age_days=SNAPSHOT_MAX_AGE_DAYS, max_bytes=SNAPSHOT_MAX_BYTES,
+                 cleanup_interval=SNAPSHOT_CLEANUP_INTERVAL):
+        """
+        sink: called with each record dict (the violation writer's save() keyword
+              arguments) once its snapshots are stored, on the snapshot thread
+        """
+        self.root = root
+        self.sink = sink
+        self.enabled = enabled
+        self.frame_width = frame_width
+        self.crop_margin = crop_margin
+        self.quality = quality
+        self.max_age = max_age_days * 86400
+        self.max_bytes = max_bytes
+        self.cleanup_interval = cleanup_interval
+        self.queue = queue.Queue(max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        # Counters
+        self.stored = 0
+        self.deduplicated = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self.encode_time = 0.0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                os.makedirs(self.root, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+                self._thread.start()
+                if self.cleanup_interval and (self.max_age or self.max_bytes):
+                    threading.Thread(target=self._cleanup_loop, name="snapshot-cleanup", daemon=True).start()
+        return self
+
+    def save_event(self, frame, box, record):
+        """Queue snapshots of `frame` (crop around `box`) for `record`; never blocks"""
+        if not self.enabled or frame is None:
+            self.sink(record)
+            return
+        if self._thread is None:
+            self.start()
+        try:
+            # Private copy: the caller may draw on the frame or reuse its buffer
+            self.queue.put_nowait((frame.copy(), None if box is None else np.asarray(box, dtype=np.float32), record))
+        except queue.Full:
+            self.skipped += 1
+            print(f"[Snapshots] ⚠️ Snapshot queue full, event recorded without snapshots ({self.skipped} total)")
+            self.sink(record)
+
+    def close(self, timeout=10.0):
+        """Store everything queued so far (records are passed on), then stop"""
+        self._stop.set()
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self.queue.put(_STOP)
+        thread.join(timeout)
+
+    # ─────────────────────────────
+    # Snapshot thread
+    # ─────────────────────────────
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            frame, box, record = item
+            try:
+                record["path"], record["crop_path"] = self._snapshot(frame, box)
+            except Exception as e:
+                print(f"[Snapshots] ❌ Failed to store snapshot: {e}")
+            self.sink(record)
+        print(f"[Snapshots] ✅ Closed ({self.stored} image(s) stored, {self.deduplicated} deduplicated, "
+              f"{self.bytes_written / 1e6:.1f} MB, {self.skipped} event(s) without snapshots)")
+
+    def _snapshot(self, frame, box):
+        start = time.perf_counter()
+        crop_key = ""
+        if box is not None:
+            x1, y1, x2, y2 = crop_box(box, frame.shape, self.crop_margin)
+            if x2 > x1 and y2 > y1:
+                crop_key = self._store(self._encode(frame[y1:y2, x1:x2]))
+        h, w = frame.shape[:2]
+        if w > self.frame_width:
+            frame = cv2.resize(frame, (self.frame_width, int(round(h * self.frame_width / w))),
+                               interpolation=cv2.INTER_AREA)
+        frame_key = self._store(self._encode(frame))
+        self.encode_time += time.perf_counter() - start
+        return frame_key, crop_key
+
+    def _encode(self, image):
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        return jpeg.tobytes()
+
+    def _store(self, data):
+        """Write `data` under its content hash; returns its key relative to root"""
+        digest = hashlib.sha256(data).hexdigest()
+        key = f"{digest[:2]}/{digest}.jpg"
+        path = os.path.join(self.root, digest[:2], f"{digest}.jpg")
+        if os.path.exists(path):
+            os.utime(path)  # referenced again: restart its retention clock
+            self.deduplicated += 1
+            return key
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # readers never see a partial file
+        self.stored += 1
+        self.bytes_written += len(data)
+        return key
+
+    # ─────────────────────────────
+    # Retention
+    # ─────────────────────────────
+    def _cleanup_loop(self):
+        while not self._stop.wait(self.cleanup_interval):
+            try:
+                self.cleanup()
+            except Exception as e:
+                print(f"[Snapshots] ❌ Cleanup failed: {e}")
+
+    def cleanup(self, now=None):
+        """Apply the age limit, then the disk quota (oldest first); returns (files, bytes) deleted"""
+        now = time.time() if now is None else now
+        files = []
+        for entry in os.scandir(self.root):
+            if entry.is_dir():
+                for f in os.scandir(entry.path):
+                    if f.name.endswith(".jpg"):
+                        stat = f.stat()
+                        files.append((stat.st_mtime, stat.st_size, f.path))
+        files.sort()
+
+        deleted = freed = 0
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            too_old = self.max_age and now - mtime > self.max_age
+            over_quota = self.max_bytes and total > self.max_bytes
+            if not (too_old or over_quota):
+                break  # sorted by age: everything after this is newer and within quota
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            deleted += 1
+            freed += size
+            total -= size
+        if deleted:
+            print(f"[Snapshots] 🧹 Deleted {deleted} snapshot(s), {freed / 1e6:.1f} MB "
+                  f"({len(files) - deleted} kept, {total / 1e6:.1f} MB)")
+        return deleted, freed
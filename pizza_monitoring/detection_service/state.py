@@ -0,0 +1,264 @@
+# pizza_monitoring/detection_service/state.py
+
+import heapq
+import itertools
+import sys
+import threading
+import time
+from collections import deque
+
+from shared.config import STATE_TRACK_TTL_SECONDS, STATE_EVICT_INTERVAL_FRAMES, STATE_MAX_MESSAGES
+
+# ────────────────────────────────────────────────
+# Per-camera detection state
+#
+# Everything process_frame needs to remember between frames of one camera
+# lives in a CameraState, and the detector keeps one per camera id in a
+# StateRegistry. Records use __slots__ so the thousands of events and
+# workers seen over a day cost a fixed, small amount each.
+#
+# The state stays bounded on a service that runs all day: tracks unseen for
+# STATE_TRACK_TTL_SECONDS (video time) are evicted, decided events are
+# folded into per-worker counters and dropped, and only the last
+# STATE_MAX_MESSAGES log lines are kept.
+#
+# Undecided events sit in a min-heap keyed by their decision deadline (end
+# of the grace window) plus a worker -> open event index, so a frame only
+# touches events that are still open, never the history.
+# ────────────────────────────────────────────────
+class RoiVisit:
+    """A worker's hand currently inside a scooper container ROI"""
+    __slots__ = ("start_frame", "hand", "roi_id", "scooper_touched", "pizza_touched")
+
+    def __init__(self, start_frame, hand, roi_id):
+        self.start_frame = start_frame
+        self.hand = hand
+        self.roi_id = roi_id
+        self.scooper_touched = False
+        self.pizza_touched = False
+
+
+class PickupEvent:
+    """A finished ROI visit waiting for (or past) its violation decision"""
+    __slots__ = ("worker_id", "start_frame", "end_frame", "deadline", "hand", "roi_id",
+                 "scooper_touched", "pizza_touched", "processed")
+
+    def __init__(self, worker_id, visit, end_frame, grace_frames):
+        self.worker_id = worker_id
+        self.start_frame = visit.start_frame
+        self.end_frame = end_frame
+        self.deadline = end_frame + grace_frames  # last frame of the grace window
+        self.hand = visit.hand
+        self.roi_id = visit.roi_id
+        self.scooper_touched = visit.scooper_touched
+        self.pizza_touched = visit.pizza_touched
+        self.processed = False
+
+
+class WorkerStats:
+    __slots__ = ("violations", "safe_pickups")
+
+    def __init__(self):
+        self.violations = 0
+        self.safe_pickups = 0
+
+    def as_dict(self):
+        return {"violations": self.violations, "safe_pickups": self.safe_pickups}
+
+
+class CameraState:
+    __slots__ = ("camera_id", "worker_id_map", "worker_positions", "track_last_seen", "next_worker_id",
+                 "open_events", "pending", "last_safe_frame", "worker_stats", "retired_stats", "last_saved_frame",
+                 "violation_count", "messages", "worker_in_roi", "frames", "evicted_tracks", "_next_evict",
+                 "track_ttl", "evict_interval", "_event_seq", "last_frame_id", "source_restarts")
+
+    def __init__(self, camera_id=0, track_ttl=STATE_TRACK_TTL_SECONDS, evict_interval=STATE_EVICT_INTERVAL_FRAMES,
+                 max_messages=STATE_MAX_MESSAGES):
+        self.camera_id = camera_id
+        self.worker_id_map = {}        # track id -> consistent worker id
+        self.worker_positions = {}     # track id -> last center (x, y)
+        self.track_last_seen = {}      # track id -> last frame id it was seen on
+        self.next_worker_id = 1
+        self.open_events = {}          # worker id -> its undecided PickupEvent
+        self.pending = []              # heap of (deadline, seq, PickupEvent)
+        self._event_seq = itertools.count()
+        self.last_safe_frame = {}      # worker id -> frame id of the last safe pickup
+        self.worker_stats = {}         # worker id -> WorkerStats (workers still around)
+        self.retired_stats = WorkerStats()  # counters of evicted workers
+        self.last_saved_frame = None   # frame id of the last database record
+        self.violation_count = 0
+        self.messages = deque(maxlen=max_messages)
+        self.worker_in_roi = {}        # worker id -> RoiVisit
+        self.frames = 0
+        self.last_frame_id = None      # frame id of the previous frame (detects source restarts)
+        self.source_restarts = 0
+        self.evicted_tracks = 0
+        self._next_evict = 0
+        self.track_ttl = track_ttl
+        self.evict_interval = evict_interval
+
+    def consistent_worker_id(self, track_id, position, frame_id=0):
+        """Map a tracker id to a consistent worker id, remembering its last position"""
+        self.worker_positions[track_id] = position
+        self.track_last_seen[track_id] = frame_id
+        worker_id = self.worker_id_map.get(track_id)
+        if worker_id is None:
+            worker_id = self.worker_id_map[track_id] = self.next_worker_id
+            self.next_worker_id += 1
+        return worker_id
+
+    def note_frame(self, frame_id):
+        """
+        Count a frame; returns True if its id went backwards. Frame ids are the
+        source frame index, so that means the source restarted (reader restart,
+        or a looping file from an older reader): deadlines, visits and open
+        events of the previous run would otherwise wait until the new ids catch
+        up with them, so they are dropped. Worker counters are kept, and stale
+        tracks are evicted on this frame.
+        """
+        self.frames += 1
+        restarted = self.last_frame_id is not None and frame_id < self.last_frame_id
+        self.last_frame_id = frame_id
+        if restarted:
+            self.pending.clear()
+            self.open_events.clear()
+            self.worker_in_roi.clear()
+            self.last_safe_frame.clear()
+            self.last_saved_frame = None
+            self._next_evict = self.frames
+            self.source_restarts += 1
+        return restarted
+
+    def open_event(self, worker_id, visit, frame_id, grace_frames):
+        """Record a finished ROI visit, unless the worker already has an undecided event"""
+        if worker_id in self.open_events:
+            return None
+        event = PickupEvent(worker_id, visit, frame_id, grace_frames)
+        self.open_events[worker_id] = event
+        heapq.heappush(self.pending, (event.deadline, next(self._event_seq), event))
+        return event
+
+    def due_events(self, frame_id):
+        """Pop the events whose grace window ended before frame_id, earliest deadline first"""
+        pending = self.pending
+        while pending and pending[0][0] < frame_id:
+            event = heapq.heappop(pending)[2]
+            # Decided events are dropped; what is left of them lives on in the worker's counters
+            del self.open_events[event.worker_id]
+            yield event
+
+    def maybe_evict(self, frame_id, fps):
+        """Every evict_interval frames, forget tracks unseen for track_ttl seconds of video"""
+        if self.frames < self._next_evict:
+            return 0
+        self._next_evict = self.frames + self.evict_interval
+        horizon = frame_id - self.track_ttl * fps
+        # seen > frame_id: the source restarted (looping file), frame ids start over
+        stale = [t for t, seen in self.track_last_seen.items() if seen < horizon or seen > frame_id]
+        for track_id in stale:
+            del self.track_last_seen[track_id]
+            self.worker_positions.pop(track_id, None)
+            self.worker_id_map.pop(track_id, None)
+        self.evicted_tracks += len(stale)
+
+        # Workers with no live track, visit or undecided event are retired into one counter
+        active = set(self.worker_id_map.values())
+        active.update(self.worker_in_roi, self.open_events)
+        for worker_id in [w for w in self.worker_stats if w not in active]:
+            stats = self.worker_stats.pop(worker_id)
+            self.retired_stats.violations += stats.violations
+            self.retired_stats.safe_pickups += stats.safe_pickups
+        for worker_id in [w for w in self.last_safe_frame if w not in active]:
+            del self.last_safe_frame[worker_id]
+        return len(stale)
+
+    def stats_for(self, worker_id):
+        stats = self.worker_stats.get(worker_id)
+        if stats is None:
+            stats = self.worker_stats[worker_id] = WorkerStats()
+        return stats
+
+    # ─────────────────────────────
+    # Memory accounting
+    # ─────────────────────────────
+    def memory(self):
+        """Approximate bytes held per tracked worker and per stored event"""
+        worker_bytes = (_container_size(self.worker_id_map) + _container_size(self.worker_positions) +
+                        _container_size(self.worker_stats) + _container_size(self.last_safe_frame) +
+                        _container_size(self.worker_in_roi))
+        events = list(self.open_events.values())
+        event_bytes = _container_size(self.open_events) + sys.getsizeof(self.pending) + \
+            sum(sys.getsizeof(entry) + _record_size(entry[2]) for entry in self.pending)
+        workers = len(self.worker_id_map)
+        return {
+            "workers": workers,
+            "tracks_evicted": self.evicted_tracks,
+            "messages": len(self.messages),
+            "events": len(events),
+            "pending_events": sum(1 for e in events if not e.processed),
+            "bytes_per_worker": worker_bytes / workers if workers else 0.0,
+            "bytes_per_event": event_bytes / len(events) if events else 0.0,
+            "total_bytes": worker_bytes + event_bytes + _container_size(self.track_last_seen)
+                           + _container_size(self.messages),
+        }
+
+
+def _record_size(obj):
+    """Size of a __slots__ record including the values it owns"""
+    size = sys.getsizeof(obj)
+    for name in getattr(obj, "__slots__", ()):
+        value = getattr(obj, name, None)
+        if hasattr(value, "nbytes"):
+            size += sys.getsizeof(value)
+        elif hasattr(value, "__slots__"):
+            size += _record_size(value)
+    return size
+
+
+def _container_size(container):
+    size = sys.getsizeof(container)
+    items = container.items() if isinstance(container, dict) else ((None, v) for v in container)
+    for key, value in items:
+        if key is not None:
+            size += sys.getsizeof(key)
+        size += _record_size(value) if hasattr(value, "__slots__") else sys.getsizeof(value)
+    return size
+
+
+class StateRegistry:
+    """CameraState per camera id, created on first use"""
+    def __init__(self, report_every=60.0):
+        self.states = {}
+        self.lock = threading.Lock()
+        self.report_every = report_every
+        self._last_report = time.time()
+
+    def get(self, camera_id):
+        state = self.states.get(camera_id)
+        if state is None:
+            with self.lock:
+                state = self.states.setdefault(camera_id, CameraState(camera_id))
+        return state
+
+    def reset(self, camera_id):
+        with self.lock:
+            self.states.pop(camera_id, None)
+
+    def __len__(self):
+        return len(self.states)
+
+    def __iter__(self):
+        return iter(list(self.states.values()))
+
+    def maybe_report(self):
+        now = time.time()
+        if not self.report_every or now - self._last_report < self.report_every:
+            return
+        self._last_report = now
+        for state in self:
+            m = state.memory()
+            print(f"[State] 🧮 Camera {state.camera_id}: {m['workers']} worker(s), "
+                  f"{m['events']} event(s) ({m['pending_events']} pending), {m['messages']} message(s), "
+                  f"{m['tracks_evicted']} track(s) evicted | "
+                  f"~{m['bytes_per_worker']:.0f} B/worker, ~{m['bytes_per_event']:.0f} B/event, "
+                  f"{m['total_bytes'] / 1024:.1f} KiB total")
@@ -4,7 +4,25 @@ import base64
 import numpy as np
 import cv2
 
+from shared.frame_protocol import unpack_frame, CODEC_RAW, CODEC_SHM
+from shared import shm_ring
+
 def decode_base64_frame(b64_str):
     byte_data = base64.b64decode(b64_str)
     np_array = np.frombuffer(byte_data, dtype=np.uint8)
     return cv2.imdecode(np_array, cv2.IMREAD_COLOR)
+
+def decode_frame_message(body):
+    """Decode a frame message (binary envelope or legacy base64) into (header, frame)"""
+    header, payload = unpack_frame(body)
+    return header, decode_frame_payload(header, payload)
+
+def decode_frame_payload(header, payload):
+    """Pixels of an unpacked frame message (None if a shared-memory slot was already reused)"""
+    if header.codec == CODEC_SHM:
+        # Private copy: the slot will be reused while the frame is still in the pipeline
+        return shm_ring.read_frame(header)
+    np_array = np.frombuffer(payload, dtype=np.uint8)
+    if header.codec == CODEC_RAW:
+        return np_array.reshape(header.shape)
+    return cv2.imdecode(np_array, cv2.IMREAD_COLOR)
@@ -0,0 +1,97 @@
+# pizza_monitoring/frame_reader/motion_gate.py
+
+import time
+
+import cv2
+import numpy as np
+
+
+# ─────────────────────────────────────────────
+# Motion / ROI-activity gate
+# ─────────────────────────────────────────────
+class MotionGate:
+    """
+    Cheap pre-filter that decides whether a frame is worth full YOLO inference.
+
+    Only the neighbourhood of the scooper containers is looked at: it is
+    cropped, converted to gray, downscaled to `work_width` pixels and
+    differenced against the previous frame. While the changed-pixel fraction
+    is above `min_fraction` (and for `hold_seconds` after it drops) every
+    frame passes; otherwise only `heartbeat_fps` frames per second do.
+    """
+    def __init__(self, rois, margin=80, work_width=160, pixel_threshold=25,
+                 min_fraction=0.01, hold_seconds=4.0, heartbeat_fps=1.0):
+        xs1, ys1, xs2, ys2 = zip(*(roi for _, roi in rois))
+        self.region = (min(xs1) - margin, min(ys1) - margin, max(xs2) + margin, max(ys2) + margin)
+        self.work_width = work_width
+        self.pixel_threshold = pixel_threshold
+        self.min_fraction = min_fraction
+        self.hold_seconds = hold_seconds
+        self.heartbeat_interval = 1.0 / heartbeat_fps if heartbeat_fps > 0 else float("inf")
+
+        self.previous = None
+        self.last_motion = None
+        self.last_sent = None
+
+        # Statistics
+        self.active_frames = 0
+        self.heartbeat_frames = 0
+        self.suppressed_frames = 0
+        self.check_time_total = 0.0
+
+    def _signature(self, frame):
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = self.region
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        crop = frame[y1:y2, x1:x2]
+        if crop.size == 0:
+            crop = frame  # ROIs outside this source: fall back to the whole frame
+        scale = self.work_width / crop.shape[1]
+        small = cv2.resize(crop, (self.work_width, max(1, int(crop.shape[0] * scale))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def check(self, frame, t=None):
+        """
+        Returns (send, state) where state is "active", "heartbeat" or "idle".
+        `t` is the frame's source time in seconds (defaults to wall-clock time).
+        """
+        start = time.perf_counter()
+        t = time.time() if t is None else t
+        signature = self._signature(frame)
+
+        motion = False
+        if self.previous is None or self.previous.shape != signature.shape:
+            motion = True  # first frame / resolution change: assume activity
+        else:
+            diff = cv2.absdiff(signature, self.previous)
+            motion = np.count_nonzero(diff > self.pixel_threshold) > self.min_fraction * diff.size
+        self.previous = signature
+        if motion:
+            self.last_motion = t
+        self.check_time_total += time.perf_counter() - start
+
+        if self.last_motion is not None and t - self.last_motion <= self.hold_seconds:
+            state = "active"
+            self.active_frames += 1
+        elif self.last_sent is None or t - self.last_sent >= self.heartbeat_interval:
+            state = "heartbeat"
+            self.heartbeat_frames += 1
+        else:
+            self.suppressed_frames += 1
+            return False, "idle"
+
+        self.last_sent = t
+        return True, state
+
+    def stats(self):
+        checked = self.active_frames + self.heartbeat_frames + self.suppressed_frames
+        return {
+            "active": self.active_frames,
+            "heartbeat": self.heartbeat_frames,
+            "suppressed": self.suppressed_frames,
+            "suppressed_pct": 100.0 * self.suppressed_frames / checked if checked else 0.0,
+            "avg_check_ms": 1e3 * self.check_time_total / checked if checked else 0.0,
+        }
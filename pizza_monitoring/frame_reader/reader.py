@@ -3,50 +3,429 @@ import os
 # Add root directory to sys.path (pizza_monitoring)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from shared.config import RABBITMQ_HOST, RABBITMQ_QUEUE, VIDEO_SOURCE
+from shared.config import (RABBITMQ_QUEUE, CAMERA_SOURCES, READER_TARGET_FPS,
+                           READER_SKIP_EVERY_N, READER_MAX_QUEUE_DEPTH, READER_REPORT_INTERVAL,
+                           READER_CAPTURE_BUFFER, READER_ENCODE_WORKERS, READER_ENCODE_INFLIGHT,
+                           FRAME_TRANSPORT, SHM_SLOTS, SHM_SLOT_BYTES, SCOOPER_CONTAINERS,
+                           READER_MOTION_GATE, MOTION_ROI_MARGIN, MOTION_WORK_WIDTH, MOTION_PIXEL_THRESHOLD,
+                           MOTION_MIN_FRACTION, MOTION_HOLD_SECONDS, MOTION_HEARTBEAT_FPS,
+                           READER_RESIZE, READER_CROP, READER_JPEG_QUALITY, READER_RECORD_PATH)
+from shared.frame_protocol import pack_frame, unpack_frame, CODEC_SHM
+from shared.shm_ring import SharedFrameRing
+from shared.frame_transform import preprocess
+from shared.capture_file import CaptureWriter, shm_to_jpeg
+from motion_gate import MotionGate
+from shared.rabbit_publisher import RabbitPublisher
 
 import cv2
 import pika
-import base64
+import collections
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 
 
-def encode_frame(frame):
-    _, buffer = cv2.imencode('.jpg', frame)
-    return base64.b64encode(buffer).decode('utf-8')
+def encode_frame(frame, quality=READER_JPEG_QUALITY):
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
 
-def connect_rabbitmq():
-    connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST))
-    channel = connection.channel()
-    channel.queue_declare(queue=RABBITMQ_QUEUE, durable=False)
-    return channel
+def is_live_source(source):
+    """Cameras and network streams pace themselves; files decode as fast as we ask"""
+    if isinstance(source, int) or str(source).isdigit():
+        return True
+    return str(source).lower().startswith(("rtsp://", "rtmp://", "http://", "https://"))
+
+# ─────────────────────────────────────────────
+# Pacing + skip policy
+# ─────────────────────────────────────────────
+class FramePacer:
+    """
+    Decides which source frames are emitted and sleeps so files play back in real time.
+
+    Source time is frame_index / source_fps for files and wall-clock time for
+    live sources. A frame is emitted when its source time reaches the next
+    emission slot (1 / target_fps apart), so a target below the native fps
+    evenly thins the stream instead of slowing it down.
+    """
+    def __init__(self, source_fps, target_fps=None, skip_every_n=0, max_queue_depth=0, live=False):
+        self.source_fps = source_fps if source_fps and source_fps > 0 else 30.0
+        self.target_fps = min(target_fps or self.source_fps, self.source_fps)
+        self.skip_every_n = skip_every_n
+        self.max_queue_depth = max_queue_depth
+        self.live = live
+
+        self.start_wall = None
+        self.next_emit = 0.0
+        self.skipped = {"rate": 0, "nth": 0, "lag": 0}
+
+    def source_time(self, frame_index):
+        if self.live:
+            return time.time() - self.start_wall
+        return frame_index / self.source_fps
+
+    def should_emit(self, frame_index, queue_depth=0):
+        """Returns (emit, reason) for the frame at `frame_index` (1-based)"""
+        if self.start_wall is None:
+            self.start_wall = time.time()
+
+        if self.skip_every_n and frame_index % self.skip_every_n == 0:
+            return False, "nth"
+
+        t = self.source_time(frame_index)
+        if t + 1e-6 < self.next_emit:
+            return False, "rate"
+        interval = 1.0 / self.target_fps
+        if t - self.next_emit > interval:
+            self.next_emit = t + interval  # fell behind (stall / gap): don't burst to catch up
+        else:
+            self.next_emit += interval
+
+        # Lagging consumer: shed load rather than let the broker backlog grow
+        if self.max_queue_depth and queue_depth > self.max_queue_depth:
+            return False, "lag"
+        return True, None
+
+    def skip(self, reason):
+        self.skipped[reason] += 1
+
+    def wait(self, frame_index):
+        """Sleep until the frame's presentation time (files only)"""
+        if self.live:
+            return
+        delay = self.start_wall + frame_index / self.source_fps - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+# ─────────────────────────────────────────────
+# Stage buffers: capture -> encode pool -> publisher
+# ─────────────────────────────────────────────
+class LatestFrames:
+    """Bounded capture buffer that keeps only the newest frames (drop-oldest)"""
+    def __init__(self, maxlen):
+        self.frames = collections.deque(maxlen=maxlen)
+        self.cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self.cond:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        with self.cond:
+            if not self.frames:
+                self.cond.wait(timeout)
+            return self.frames.popleft() if self.frames else None
+
+    def __len__(self):
+        return len(self.frames)
+
+class OrderedEncoder(threading.Thread):
+    """
+    Feeds one camera's captured frames to the shared encode pool and publishes
+    the results in sequence order.
+
+    At most `max_inflight` frames are being encoded at once; the dispatcher
+    blocks on that limit while the capture buffer in front of it keeps
+    dropping the oldest frames, so a slow broker never stalls capture.
+
+    With a shared-memory `ring` the raw frame is copied into the ring instead
+    of being JPEG-encoded, and only its descriptor is published. Crop/resize
+    (`preprocess`) runs here too, on the pool, before encoding.
+    """
+    def __init__(self, camera_id, frames, pool, publisher, properties, max_inflight, ring=None,
+                 preprocess_options=None):
+        super().__init__(name=f"encoder-{camera_id}", daemon=True)
+        self.camera_id = camera_id
+        self.frames = frames
+        self.pool = pool
+        self.publisher = publisher
+        self.properties = properties
+        self.max_inflight = max_inflight
+        self.ring = ring
+        self.crop, self.resize, self.jpeg_quality = preprocess_options or (None, None, READER_JPEG_QUALITY)
+
+        self.slots = threading.BoundedSemaphore(max_inflight)
+        self.lock = threading.Lock()
+        self.results = {}
+        self.seq = 0
+        self.next_seq = 1
+        self.closing = threading.Event()
+
+        self.frames_sent = 0
+        self.encode_errors = 0
+        self.encode_time_total = 0.0
+
+    def encode(self, seq, item):
+        capture_ts, frame, meta = item
+        start = time.perf_counter()
+        frame, xform = preprocess(frame, self.crop, self.resize)
+        if xform:
+            meta["xform"] = xform
+        if self.ring is not None and self.ring.fits(frame):
+            meta.update(self.ring.write(seq, frame))
+            body = pack_frame(b"", camera_id=self.camera_id, seq=seq, timestamp=capture_ts,
+                              shape=frame.shape, codec=CODEC_SHM, meta=meta)
+        else:
+            body = pack_frame(encode_frame(frame, self.jpeg_quality), camera_id=self.camera_id, seq=seq,
+                              timestamp=capture_ts, shape=frame.shape, meta=meta)
+        return body, time.perf_counter() - start
+
+    def on_encoded(self, seq, future):
+        try:
+            body, elapsed = future.result()
+        except Exception as e:
+            print(f"[FrameReader] ❌ Camera {self.camera_id}: encode failed: {e}")
+            body, elapsed = None, 0.0
+        with self.lock:
+            self.encode_time_total += elapsed
+            self.results[seq] = body
+            # Release every consecutive frame that is ready, in order
+            while self.next_seq in self.results:
+                ready = self.results.pop(self.next_seq)
+                if ready is not None:
+                    self.publisher.publish(ready, properties=self.properties)
+                    self.frames_sent += 1
+                else:
+                    self.encode_errors += 1
+                self.next_seq += 1
+                self.slots.release()
+
+    def run(self):
+        while True:
+            item = self.frames.get(timeout=0.5)
+            if item is None:
+                if self.closing.is_set() and not len(self.frames):
+                    break
+                continue
+            self.slots.acquire()
+            self.seq += 1
+            seq = self.seq
+            future = self.pool.submit(self.encode, seq, item)
+            future.add_done_callback(lambda f, seq=seq: self.on_encoded(seq, f))
+
+    def finish(self, timeout=5.0):
+        """Encode and publish whatever is still buffered, then stop"""
+        self.closing.set()
+        self.join(timeout)
+        deadline = time.time() + timeout
+        for _ in range(self.max_inflight):
+            if not self.slots.acquire(timeout=max(0.0, deadline - time.time())):
+                break
+
+# ─────────────────────────────────────────────
+# One capture thread per camera
+# ─────────────────────────────────────────────
+class CameraReader(threading.Thread):
+    """
+    Reads one source and publishes its frames through the shared publisher.
+
+    A source that fails to open or stops delivering frames is reopened with
+    exponential backoff; the other cameras keep running. Video files end the
+    thread when they run out, unless "loop" is set for the camera.
+
+    The capture thread only grabs/decodes and hands frames to a LatestFrames
+    buffer; JPEG encoding and publishing happen in the OrderedEncoder stage.
+    """
+    def __init__(self, camera, publisher, encode_pool):
+        super().__init__(name=f"camera-{camera['camera_id']}", daemon=True)
+        self.camera_id = camera["camera_id"]
+        self.source = camera["source"]
+        self.loop = camera.get("loop", False)
+        self.target_fps = camera.get("target_fps", READER_TARGET_FPS)
+        self.publisher = publisher
+        self.live = is_live_source(self.source)
+        self.properties = pika.BasicProperties(headers={"camera_id": self.camera_id})
+
+        self.gate = None
+        if camera.get("motion_gate", READER_MOTION_GATE):
+            self.gate = MotionGate(camera.get("rois", SCOOPER_CONTAINERS), MOTION_ROI_MARGIN, MOTION_WORK_WIDTH,
+                                   MOTION_PIXEL_THRESHOLD, MOTION_MIN_FRACTION, MOTION_HOLD_SECONDS,
+                                   MOTION_HEARTBEAT_FPS)
+
+        self.frames = LatestFrames(READER_CAPTURE_BUFFER)
+        self.ring = None
+        if FRAME_TRANSPORT == "shm":
+            self.ring = SharedFrameRing(f"pizza_cam{self.camera_id}", SHM_SLOTS, SHM_SLOT_BYTES, create=True)
+        preprocess_options = (camera.get("crop", READER_CROP), camera.get("resize", READER_RESIZE),
+                              camera.get("jpeg_quality", READER_JPEG_QUALITY))
+        self.encoder = OrderedEncoder(self.camera_id, self.frames, encode_pool, publisher,
+                                      self.properties, READER_ENCODE_INFLIGHT, self.ring, preprocess_options)
+
+        self.frames_read = 0
+        self.src_idx = 0  # source frame index sent as meta["src_idx"], keeps growing across loops/restarts
+        self.errors = 0
+        self.restarts = 0
+        self.pacer = None
+        self.stop_event = threading.Event()
+
+    def open(self):
+        source = int(self.source) if str(self.source).isdigit() else self.source
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            raise IOError(f"failed to open {self.source}")
+        self.pacer = FramePacer(cap.get(cv2.CAP_PROP_FPS), self.target_fps, READER_SKIP_EVERY_N,
+                                READER_MAX_QUEUE_DEPTH, live=self.live)
+        print(f"[FrameReader] 🎥 Camera {self.camera_id}: {self.source} "
+              f"(source fps {self.pacer.source_fps:.2f}, target fps {self.pacer.target_fps:.2f})")
+        return cap
+
+    def read_loop(self, cap):
+        """Returns True at the end of a file, raises when a source fails"""
+        frame_index = 0
+        while not self.stop_event.is_set():
+            # grab() only demuxes; the (expensive) decode happens in retrieve() for frames we keep
+            if not cap.grab():
+                if self.live:
+                    raise IOError("stream stopped delivering frames")
+                return True
+            frame_index += 1
+            self.src_idx += 1
+            self.frames_read += 1
+
+            emit, reason = self.pacer.should_emit(frame_index, self.publisher.queue_depth)
+            if not emit:
+                self.pacer.skip(reason)
+                self.pacer.wait(frame_index)
+                continue
+
+            ret, frame = cap.retrieve()
+            capture_ts = time.time()
+            if not ret:
+                self.errors += 1
+                continue
+
+            # src_idx keeps the video time base intact for the detector whatever gets skipped or gated;
+            # it does not start over when a looping file (or a failed source) is reopened, so the
+            # detector's grace-window deadlines stay in order
+            meta = {"src_idx": self.src_idx, "fps": self.pacer.source_fps}
+            if self.gate is not None:
+                send, gate_state = self.gate.check(frame, self.pacer.source_time(self.src_idx))
+                if not send:
+                    self.pacer.wait(frame_index)
+                    continue
+                meta["gate"] = gate_state
+
+            self.frames.put((capture_ts, frame, meta))
+            self.pacer.wait(frame_index)
+        return False
+
+    @property
+    def frames_sent(self):
+        return self.encoder.frames_sent
+
+    def start(self):
+        self.encoder.start()
+        super().start()
+
+    def run(self):
+        backoff = 1.0
+        while not self.stop_event.is_set():
+            cap = None
+            try:
+                cap = self.open()
+                backoff = 1.0
+                finished = self.read_loop(cap)
+                if finished and not self.loop:
+                    print(f"[FrameReader] 📺 Camera {self.camera_id}: end of video.")
+                    break
+            except Exception as e:
+                self.errors += 1
+                self.restarts += 1
+                print(f"[FrameReader] ❌ Camera {self.camera_id}: {e}. Restarting in {backoff:.0f}s")
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if cap is not None:
+                    cap.release()
+
+    def stop(self):
+        self.stop_event.set()
+
+def report(cameras, publisher, elapsed, last_counts):
+    for cam in cameras:
+        read, sent = cam.frames_read, cam.frames_sent
+        prev_read, prev_sent = last_counts.get(cam.camera_id, (0, 0))
+        skipped = cam.pacer.skipped if cam.pacer else {"rate": 0, "nth": 0, "lag": 0}
+        print(f"[FrameReader] 📊 Camera {cam.camera_id}: read {(read - prev_read) / elapsed:.1f} fps | "
+              f"sent {(sent - prev_sent) / elapsed:.1f} fps | skipped rate={skipped['rate']} "
+              f"nth={skipped['nth']} lag={skipped['lag']} stale={cam.frames.dropped} | "
+              f"encode {1e3 * cam.encoder.encode_time_total / max(sent, 1):.1f} ms/frame | "
+              f"errors={cam.errors} restarts={cam.restarts}")
+        last_counts[cam.camera_id] = (read, sent)
+        if cam.gate is not None:
+            g = cam.gate.stats()
+            print(f"[FrameReader] 📊 Camera {cam.camera_id} motion gate: active={g['active']} "
+                  f"heartbeat={g['heartbeat']} suppressed={g['suppressed']} ({g['suppressed_pct']:.0f}%) | "
+                  f"check {g['avg_check_ms']:.2f} ms/frame")
+    print(f"[FrameReader] 📊 queue depth {publisher.queue_depth} | publisher dropped {publisher.dropped}")
+
+def make_recorder(path, rings):
+    """
+    Tee everything the reader publishes into an indexed capture file.
+
+    CODEC_SHM frames are read back from their slot (`rings` maps ring name ->
+    the cameras' SharedFrameRing) and recorded as JPEG envelopes.
+    """
+    writer = CaptureWriter(path)
+
+    def tap(body, routing_key):
+        header, _ = unpack_frame(body)
+        if header.codec == CODEC_SHM:
+            meta = header.meta
+            frame = rings[meta["shm"]].read_copy(meta["slot"], header.seq, header.shape)
+            if frame is None:
+                return  # slot already reused: nothing left to record
+            body = shm_to_jpeg(header, frame)
+        writer.append(body, header.timestamp, header.camera_id, header.seq)
+    print(f"[FrameReader] 🔴 Recording published frames to {path}")
+    return writer, tap
 
 def main():
-    print(f"[FrameReader] 🎥 Reading from: {VIDEO_SOURCE}")
-    cap = cv2.VideoCapture(VIDEO_SOURCE)
-    if not cap.isOpened():
-        print("[FrameReader] ❌ Failed to open video source.")
-        return
-
-    channel = connect_rabbitmq()
-    print(f"[FrameReader] 🟢 Connected to RabbitMQ queue '{RABBITMQ_QUEUE}'")
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("[FrameReader] 📺 End of video or error.")
-            break
-
-        frame_data = encode_frame(frame)
-        channel.basic_publish(
-            exchange='',
-            routing_key=RABBITMQ_QUEUE,
-            body=frame_data.encode('utf-8')
-        )
-        print("[FrameReader] 📤 Frame sent.")
-
-    cap.release()
+    rings = {}  # filled once the cameras created their shared-memory rings
+    recorder, tap = make_recorder(READER_RECORD_PATH, rings) if READER_RECORD_PATH else (None, None)
+
+    # One publishing connection shared by every camera thread
+    publisher = RabbitPublisher(RABBITMQ_QUEUE, name="FrameReader Publisher",
+                                report_every=0, depth_poll_interval=0.5, tap=tap).start()
+    print(f"[FrameReader] 🟢 Publishing to RabbitMQ queue '{RABBITMQ_QUEUE}'")
+
+    # JPEG encoding releases the GIL, so a thread pool spreads it over all cores
+    encode_pool = ThreadPoolExecutor(max_workers=READER_ENCODE_WORKERS, thread_name_prefix="encode")
+    cameras = [CameraReader(camera, publisher, encode_pool) for camera in CAMERA_SOURCES]
+    rings.update((cam.ring.name, cam.ring) for cam in cameras if cam.ring is not None)
+    for cam in cameras:
+        cam.start()
+
+    last_counts = {}
+    last_report = time.time()
+    try:
+        while any(cam.is_alive() for cam in cameras):
+            time.sleep(0.5)
+            now = time.time()
+            if now - last_report >= READER_REPORT_INTERVAL:
+                report(cameras, publisher, now - last_report, last_counts)
+                last_report = now
+    except KeyboardInterrupt:
+        print("[FrameReader] ❌ Stopped by user.")
+        for cam in cameras:
+            cam.stop()
+        for cam in cameras:
+            cam.join(timeout=2)
+
+    for cam in cameras:
+        cam.encoder.finish()
+    encode_pool.shutdown(wait=True)
+    publisher.close()
+    for cam in cameras:
+        if cam.ring is not None:
+            cam.ring.close()
+    if recorder is not None:
+        recorder.close()
+        print(f"[FrameReader] 📼 Recorded {len(recorder)} frames to {READER_RECORD_PATH}")
     print("[FrameReader] ✅ Done.")
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+# pizza_monitoring/shared/capture_file.py
+
+import mmap
+import os
+import struct
+import threading
+
+import cv2
+import numpy as np
+
+from shared.config import READER_JPEG_QUALITY
+from shared.frame_protocol import pack_frame
+
+# ────────────────────────────────────────────────
+# Indexed capture file for recorded queue traffic
+#
+#   file header   8s magic b"PZCAP\x00\x00\x01"
+#   records       raw message bodies, back to back
+#   index         INDEX_DTYPE entry per record
+#   footer        Q index offset, Q record count, 8s magic
+#
+# The reader memory-maps the file, so replaying a record is a slice of the
+# mapping, with no read() calls or copies.
+#
+# Shared-memory descriptors (CODEC_SHM) point into a ring that is gone at
+# replay time, so recorders store those frames as JPEG envelopes instead
+# (see shm_to_jpeg).
+# ────────────────────────────────────────────────
+MAGIC = b"PZCAP\x00\x00\x01"
+FOOTER = struct.Struct("<QQ8s")
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("camera_id", "<u2"),
+    ("pad", "<u2"),
+    ("timestamp", "<f8"),
+    ("seq", "<u8"),
+])
+
+_SHM_KEYS = ("shm", "slot", "slots", "slot_bytes", "gen")
+
+
+def shm_to_jpeg(header, frame, quality=READER_JPEG_QUALITY):
+    """JPEG envelope for a CODEC_SHM frame read out of its ring: same header and metadata, minus the descriptor"""
+    _, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    meta = {k: v for k, v in header.meta.items() if k not in _SHM_KEYS}
+    return pack_frame(jpeg.tobytes(), camera_id=header.camera_id, seq=header.seq,
+                      timestamp=header.timestamp, shape=header.shape, meta=meta)
+
+
+class CaptureWriter:
+    """Append-only recorder; the index is written on close()"""
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.offset = len(MAGIC)
+        self.index = []
+        self.lock = threading.Lock()
+
+    def append(self, body, timestamp, camera_id=0, seq=0):
+        with self.lock:
+            self.file.write(body)
+            self.index.append((self.offset, len(body), camera_id, 0, timestamp, seq))
+            self.offset += len(body)
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            index = np.array(self.index, dtype=INDEX_DTYPE)
+            self.file.write(index.tobytes())
+            self.file.write(FOOTER.pack(self.offset, len(self.index), MAGIC))
+            self.file.close()
+            self.file = None
+
+
+class CaptureReader:
+    """Memory-mapped random access to a capture file"""
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < len(MAGIC) + FOOTER.size:
+            raise ValueError(f"{path} is not a capture file (too small)")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a capture file")
+        index_offset, count, magic = FOOTER.unpack_from(self.map, size - FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError(f"{path} has no index (recording was not closed cleanly)")
+        self.index = np.frombuffer(self.map, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+        self.view = memoryview(self.map)
+
+    def __len__(self):
+        return len(self.index)
+
+    def record(self, i):
+        """Returns (body memoryview, timestamp, camera_id, seq) for record i"""
+        entry = self.index[i]
+        start = int(entry["offset"])
+        return (self.view[start:start + int(entry["length"])], float(entry["timestamp"]),
+                int(entry["camera_id"]), int(entry["seq"]))
+
+    def __iter__(self):
+        for i in range(len(self.index)):
+            yield self.record(i)
+
+    def duration(self):
+        if not len(self.index):
+            return 0.0
+        return float(self.index["timestamp"][-1] - self.index["timestamp"][0])
+
+    def close(self):
+        self.index = None
+        try:
+            self.view.release()
+            self.map.close()
+        except BufferError:
+            pass  # records still referenced by the caller; the mapping is freed with them
+        self.file.close()
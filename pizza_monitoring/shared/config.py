@@ -20,4 +20,138 @@ RABBITMQ_QUEUE = "video_frames"
 PROCESSED_QUEUE = "processed_frames"
 DB_PATH = r"D:\PizzaStore_Task\repo\Pizza Store Hygiene Monitoring System\pizza_monitoring\shared\violations.db"
 VIDEO_SOURCE = r"D:\PizzaStore_Task\Sah b3dha ghalt (4).mp4"
-MODEL_PATH = r"D:\PizzaStore_Task\repo\Pizza Store Hygiene Monitoring System\pizza_monitoring\shared\best.pt"
\ No newline at end of file
+MODEL_PATH = r"D:\PizzaStore_Task\repo\Pizza Store Hygiene Monitoring System\pizza_monitoring\shared\best.pt"
+
+# ROI (over all containers): (container id, (x1, y1, x2, y2)) in source frame pixels.
+# Shared by the detection logic and the frame reader's motion gate.
+SCOOPER_CONTAINERS = [
+    (0, (470, 270, 525, 310)),
+    (1, (460, 310, 520, 350)),
+    (2, (450, 355, 500, 390)),
+]
+
+# Camera id stamped into every frame envelope (see shared/frame_protocol.py)
+CAMERA_ID = 0
+
+# Sources handled by the frame reader, one capture thread each. "source" can be
+# a file path, an RTSP/HTTP URL or a device index; "loop" replays files forever,
+# "target_fps" overrides READER_TARGET_FPS, "motion_gate" / "rois" override
+# READER_MOTION_GATE / SCOOPER_CONTAINERS and "crop" / "resize" / "jpeg_quality"
+# override the READER_* preprocessing defaults for that camera.
+CAMERA_SOURCES = [
+    {"camera_id": CAMERA_ID, "source": VIDEO_SOURCE},
+    # {"camera_id": 1, "source": "rtsp://192.168.1.20:554/stream1"},
+    # {"camera_id": 2, "source": 0},
+]
+
+# Publisher confirms: when True each publish batch waits once for the broker's acks and
+# unconfirmed messages are resent after a reconnect (at-least-once: duplicates are possible)
+PUBLISH_CONFIRM = False
+
+# Frame reader pacing / load shedding (see frame_reader/reader.py)
+READER_TARGET_FPS = None         # None = emit at the source's native fps
+READER_SKIP_EVERY_N = 0          # Drop every Nth source frame (0 = disabled)
+READER_MAX_QUEUE_DEPTH = 30      # Drop frames while video_frames holds more than this (0 = disabled)
+READER_REPORT_INTERVAL = 5.0     # Seconds between throughput reports
+
+# Frame reader pipeline stages (capture -> encode pool -> publisher)
+READER_CAPTURE_BUFFER = 4                          # Newest frames kept per camera before encoding
+READER_ENCODE_WORKERS = max(1, os.cpu_count() or 1)  # Shared JPEG encode threads
+READER_ENCODE_INFLIGHT = 8                         # Max frames being encoded per camera
+
+# Broker queue policy for video_frames / processed_frames (see shared/queues.py).
+# Existing queues must be deleted once after changing these values.
+QUEUE_MAX_LENGTH = 30          # Max frames held per queue (0 = unbounded)
+QUEUE_MESSAGE_TTL_MS = 2000    # Frames older than this are discarded (0 = no TTL)
+QUEUE_OVERFLOW = "drop-head"   # Drop the oldest frame when the queue is full
+
+# Frame transport between co-located services: "rabbitmq" sends JPEG bytes in
+# every message, "shm" keeps raw frames in shared-memory rings and only sends a
+# small descriptor through RabbitMQ (see shared/shm_ring.py)
+FRAME_TRANSPORT = "rabbitmq"
+SHM_SLOTS = 64                       # Frames kept per ring before slots are reused
+SHM_SLOT_BYTES = 1920 * 1080 * 3     # Largest raw frame a slot can hold
+
+# Motion / ROI-activity gating in the frame reader (see frame_reader/motion_gate.py).
+# Full frame rate is only sent while something moves near the scooper containers;
+# otherwise the reader drops to a heartbeat rate.
+READER_MOTION_GATE = False
+MOTION_ROI_MARGIN = 80           # Pixels added around the containers' bounding box
+MOTION_WORK_WIDTH = 160          # Width the ROI neighbourhood is downscaled to
+MOTION_PIXEL_THRESHOLD = 25      # Per-pixel gray-level change that counts as motion
+MOTION_MIN_FRACTION = 0.01       # Fraction of changed pixels that makes the ROI "active"
+MOTION_HOLD_SECONDS = 4.0        # Keep full rate this long after the last motion (covers the grace window)
+MOTION_HEARTBEAT_FPS = 1.0       # Frame rate while the ROI is idle
+
+# Reader-side preprocessing defaults; per-camera "resize": (width, height),
+# "crop": (x1, y1, x2, y2) and "jpeg_quality" entries in CAMERA_SOURCES override them.
+# The transform is sent with every frame so boxes can be mapped back to the original.
+READER_RESIZE = None
+READER_CROP = None
+READER_JPEG_QUALITY = 90
+
+# When set, the frame reader also writes every published frame into this
+# capture file (replay it with tools/replay_frames.py)
+READER_RECORD_PATH = None
+
+# Batched multi-camera inference in the detector (see detection_service/inference.py)
+INFERENCE_MAX_BATCH = 8          # Max frames per forward pass
+INFERENCE_MAX_WAIT_MS = 10       # How long the first frame waits for other cameras to join a batch
+
+# Inference backend (see detection_service/backends.py):
+#   "cuda" PyTorch FP16 on GPU, "cpu" PyTorch on CPU,
+#   "onnx" exported ONNX Runtime model, "openvino" exported OpenVINO model.
+# Exported models are cached next to MODEL_PATH on first start.
+INFERENCE_BACKEND = "cuda"
+INFERENCE_THREADS = 0            # CPU threads for torch / ONNX Runtime / OpenVINO (0 = library default)
+INFERENCE_INT8 = False           # INT8 quantization for the onnx / openvino backends
+INFERENCE_INT8_DATA = "coco8.yaml"  # Calibration dataset for OpenVINO INT8 export
+INFERENCE_IMGSZ = 640            # Export input size
+
+# Detector start-up: the model is loaded and warmed up before consuming starts
+MODEL_WARMUP_RUNS = 2            # Dummy forward passes (at INFERENCE_MAX_BATCH) before consuming
+DEFAULT_FPS = 30.0               # Source fps when the frame metadata does not carry one
+
+# Detector pipeline (see detection_service/pipeline.py)
+DETECTOR_PREFETCH = 32           # Unacked frames the broker hands to the detector
+DETECTOR_DECODE_WORKERS = 2      # JPEG decode threads
+DETECTOR_PACKAGE_WORKERS = 2     # Result message threads (overlay metadata + frame forwarding)
+DETECTOR_STAGE_QUEUE = 8         # Bounded queue in front of each stage
+DETECTOR_DRAIN_SECONDS = 10.0    # On shutdown, wait this long for frames already in the pipeline
+
+# Bounded detection state for long runs (see detection_service/state.py)
+STATE_TRACK_TTL_SECONDS = 30.0     # Forget tracks not seen for this long (video time)
+STATE_EVICT_INTERVAL_FRAMES = 30   # How often (in frames) stale tracks are looked for
+STATE_MAX_MESSAGES = 20            # Recent log lines kept per camera
+
+# Viewer presence (see shared/viewer_presence.py): the detector only publishes processed frames while the
+# streamer has viewers; detection and violation recording always run
+VIEWER_PRESENCE = True             # False: always publish processed frames
+VIEWER_CONTROL_QUEUE = "viewer_presence"
+VIEWER_HEARTBEAT_SECONDS = 2.0     # Streamer re-sends its viewer count this often (and on every change)
+VIEWER_TIMEOUT_SECONDS = 6.0       # No heartbeat for this long = no viewers (e.g. streamer down)
+
+# Violation records are written by one background thread (see detection_service/database.py)
+DB_WRITER_QUEUE = 10000            # Records waiting for the writer (dropped and counted beyond this)
+DB_WRITER_BATCH_ROWS = 64          # Flush after this many records...
+DB_WRITER_FLUSH_MS = 200           # ...or this long after the first queued one
+
+# Violation history API (/violations on the streamer)
+DB_READ_POOL_SIZE = 4              # Pooled read-only connections
+VIOLATIONS_PAGE_SIZE = 100         # Default rows per page
+VIOLATIONS_MAX_PAGE_SIZE = 1000    # Upper bound for ?limit=
+
+# Evidence snapshots for violations / safe pickups (see detection_service/snapshots.py)
+# SNAPSHOT_DIR must be the same absolute path for the detector (writes) and the streamer (serves
+# /snapshots): set the SNAPSHOT_DIR environment variable to a shared location (docker-compose uses the
+# shared volume); the default is shared/snapshots in this checkout.
+SNAPSHOT_DIR = os.path.abspath(os.environ.get("SNAPSHOT_DIR") or
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+SNAPSHOT_ENABLED = True
+SNAPSHOT_FRAME_WIDTH = 640           # Downscaled full frame width (px)
+SNAPSHOT_CROP_MARGIN = 0.25          # Crop = worker (or hand) box grown by this fraction per side
+SNAPSHOT_JPEG_QUALITY = 85
+SNAPSHOT_QUEUE = 32                  # Events waiting for the snapshot thread (beyond: recorded without one)
+SNAPSHOT_MAX_AGE_DAYS = 30           # Delete snapshots older than this (0 = keep)
+SNAPSHOT_MAX_BYTES = 2 * 1024 ** 3   # Delete the oldest snapshots beyond this total size (0 = no quota)
+SNAPSHOT_CLEANUP_INTERVAL = 600      # Seconds between retention passes
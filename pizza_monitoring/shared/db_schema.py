@@ -0,0 +1,298 @@
+# pizza_monitoring/shared/db_schema.py
+
+import ast
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+# ────────────────────────────────────────────────
+# violations.db schema (PRAGMA user_version = SCHEMA_VERSION)
+#
+#   violations   one row per decided pickup event
+#     timestamp       REAL, seconds since the epoch
+#     camera_id, worker_id, frame_id, roi_id   INTEGER (NULL when unknown)
+#     frame_path      evidence snapshot (downscaled frame), "" if none
+#     crop_path       evidence crop around the worker, "" if none
+#                     (both relative to SNAPSHOT_DIR, see detection_service/snapshots.py)
+#     is_violation, is_safe_pickup             0 / 1
+#     labels          BLOB, one uint8 label code per detection (LABELS)
+#     boxes           BLOB, float32 x1, y1, x2, y2 per detection
+#
+# Indexes on (camera_id, timestamp), (worker_id, timestamp) and timestamp
+# make time-window and per-worker queries index range scans.
+#
+#   violation_counts   violations / safe pickups per camera, worker and day
+#                      (local date; worker -1 = unknown), kept up to date by
+#                      triggers in the same transaction as every insert/delete,
+#                      for per-worker / per-day breakdowns
+#
+#   violation_totals   the same counts rolled up by the same triggers into
+#                      one row per (day, camera) for the summary: day ALL_DAYS
+#                      holds all-time totals, camera ALL_CAMERAS the sum over
+#                      cameras. (ALL_DAYS, ALL_CAMERAS) is the grand total and
+#                      (day, ALL_CAMERAS) one day's, both point lookups; the
+#                      per-camera totals are the ALL_DAYS range, one row per camera.
+#
+# Older databases are migrated in place by ensure_schema(), keeping every
+# row: version 1 (the original table: TEXT timestamp, str(list)
+# labels/boxes), version 2 (no counters yet, backfilled once),
+# version 3 (no crop_path column) and version 4 (no totals, backfilled once).
+# ────────────────────────────────────────────────
+SCHEMA_VERSION = 5
+
+LABELS = ("hand", "pizza", "scooper", "person")
+UNKNOWN_LABEL = 255
+_LABEL_CODES = {label: code for code, label in enumerate(LABELS)}
+
+CREATE_VIOLATIONS = '''CREATE TABLE IF NOT EXISTS violations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp REAL NOT NULL,
+    camera_id INTEGER NOT NULL DEFAULT 0,
+    worker_id INTEGER,
+    frame_id INTEGER,
+    roi_id INTEGER,
+    frame_path TEXT NOT NULL DEFAULT '',
+    crop_path TEXT NOT NULL DEFAULT '',
+    is_violation INTEGER NOT NULL DEFAULT 0,
+    is_safe_pickup INTEGER NOT NULL DEFAULT 0,
+    labels BLOB,
+    boxes BLOB
+)'''
+
+CREATE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_violations_camera_time ON violations(camera_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_violations_worker_time ON violations(worker_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_violations_time ON violations(timestamp)",
+)
+
+CREATE_COUNTS = '''CREATE TABLE IF NOT EXISTS violation_counts (
+    camera_id INTEGER NOT NULL,
+    worker_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    violations INTEGER NOT NULL DEFAULT 0,
+    safe_pickups INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (camera_id, worker_id, day)
+) WITHOUT ROWID'''
+
+CREATE_TOTALS = '''CREATE TABLE IF NOT EXISTS violation_totals (
+    day TEXT NOT NULL,
+    camera_id INTEGER NOT NULL,
+    violations INTEGER NOT NULL DEFAULT 0,
+    safe_pickups INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, camera_id)
+) WITHOUT ROWID'''
+
+ALL_DAYS = ""
+ALL_CAMERAS = -1
+
+# The local date of a row; TODAY is the same expression for the current time,
+# so readers look up today's totals under exactly the key the triggers wrote.
+_COUNT_DAY = "date({row}.timestamp, 'unixepoch', 'localtime')"
+TODAY = "SELECT date('now', 'localtime')"
+
+CREATE_COUNT_TRIGGERS = (
+    f'''CREATE TRIGGER IF NOT EXISTS violation_counts_insert AFTER INSERT ON violations
+    BEGIN
+        INSERT INTO violation_counts (camera_id, worker_id, day, violations, safe_pickups)
+        VALUES (NEW.camera_id, COALESCE(NEW.worker_id, -1), {_COUNT_DAY.format(row="NEW")},
+                NEW.is_violation, NEW.is_safe_pickup)
+        ON CONFLICT (camera_id, worker_id, day) DO UPDATE SET
+            violations = violations + excluded.violations,
+            safe_pickups = safe_pickups + excluded.safe_pickups;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS violation_counts_delete AFTER DELETE ON violations
+    BEGIN
+        UPDATE violation_counts
+        SET violations = violations - OLD.is_violation, safe_pickups = safe_pickups - OLD.is_safe_pickup
+        WHERE camera_id = OLD.camera_id AND worker_id = COALESCE(OLD.worker_id, -1)
+          AND day = {_COUNT_DAY.format(row="OLD")};
+    END''',
+)
+
+CREATE_TOTAL_TRIGGERS = (
+    f'''CREATE TRIGGER IF NOT EXISTS violation_totals_insert AFTER INSERT ON violations
+    BEGIN
+        INSERT INTO violation_totals (day, camera_id, violations, safe_pickups)
+        VALUES ('{ALL_DAYS}', NEW.camera_id, NEW.is_violation, NEW.is_safe_pickup),
+               ('{ALL_DAYS}', {ALL_CAMERAS}, NEW.is_violation, NEW.is_safe_pickup),
+               ({_COUNT_DAY.format(row="NEW")}, {ALL_CAMERAS}, NEW.is_violation, NEW.is_safe_pickup)
+        ON CONFLICT (day, camera_id) DO UPDATE SET
+            violations = violations + excluded.violations,
+            safe_pickups = safe_pickups + excluded.safe_pickups;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS violation_totals_delete AFTER DELETE ON violations
+    BEGIN
+        UPDATE violation_totals
+        SET violations = violations - OLD.is_violation, safe_pickups = safe_pickups - OLD.is_safe_pickup
+        WHERE (day, camera_id) IN (VALUES ('{ALL_DAYS}', OLD.camera_id), ('{ALL_DAYS}', {ALL_CAMERAS}),
+                                          ({_COUNT_DAY.format(row="OLD")}, {ALL_CAMERAS}));
+    END''',
+)
+
+INSERT_VIOLATION = '''
+    INSERT INTO violations (timestamp, camera_id, worker_id, frame_id, roi_id, frame_path,
+                            is_violation, is_safe_pickup, labels, boxes, crop_path)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+
+# ─────────────────────────────
+# Detections <-> BLOBs
+# ─────────────────────────────
+def pack_detections(labels, boxes):
+    """(labels BLOB, boxes BLOB) for a list of label names and (N, 4) boxes"""
+    codes = np.fromiter((_LABEL_CODES.get(label, UNKNOWN_LABEL) for label in labels), dtype=np.uint8)
+    return codes.tobytes(), np.asarray(boxes, dtype=np.float32).reshape(-1, 4).tobytes()
+
+
+def unpack_detections(label_blob, box_blob):
+    """([label names], (N, 4) float32 boxes) from the two BLOB columns"""
+    codes = np.frombuffer(label_blob or b"", dtype=np.uint8)
+    labels = [LABELS[c] if c < len(LABELS) else "unknown" for c in codes.tolist()]
+    return labels, np.frombuffer(box_blob or b"", dtype=np.float32).reshape(-1, 4)
+
+
+def violation_row(timestamp, camera_id, worker_id, frame_id, roi_id, frame_path,
+                  labels, boxes, is_violation, is_safe_pickup, crop_path=""):
+    """Parameters for INSERT_VIOLATION"""
+    label_blob, box_blob = pack_detections(labels, boxes)
+    return (float(timestamp), int(camera_id), worker_id, frame_id, roi_id, frame_path or "",
+            int(bool(is_violation)), int(bool(is_safe_pickup)), label_blob, box_blob, crop_path or "")
+
+
+# ─────────────────────────────
+# Schema creation / migration
+# ─────────────────────────────
+def apply_pragmas(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size = 10000")
+    conn.execute("PRAGMA busy_timeout=5000")
+
+
+def ensure_schema(conn):
+    """Create or migrate the schema; returns "created", "migrated" or "current" """
+    if _schema_version(conn) == SCHEMA_VERSION:
+        return "current"
+
+    # Explicit transaction: sqlite3 would otherwise run the DDL statements in autocommit mode.
+    # The version is read again under the write lock in case another service migrated first.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = _schema_version(conn)
+        if version == 0:
+            conn.execute(CREATE_VIOLATIONS)
+        elif version == 1:
+            _migrate_v1(conn)
+        _create_indexes(conn)
+        if version < 3:
+            _create_counts(conn)
+        if 1 < version < 4:
+            conn.execute("ALTER TABLE violations ADD COLUMN crop_path TEXT NOT NULL DEFAULT ''")
+        if version < 5:
+            _create_totals(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if version == SCHEMA_VERSION:
+        return "current"
+    return "created" if version == 0 else "migrated"
+
+
+def _schema_version(conn):
+    """0 without a violations table, 1 for the original table, else PRAGMA user_version"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='violations'").fetchone() is not None
+    if not exists:
+        return 0
+    return max(1, conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def _create_indexes(conn):
+    for statement in CREATE_INDEXES:
+        conn.execute(statement)
+
+
+def _create_counts(conn):
+    """Counters table + triggers, backfilled from the rows already there"""
+    # The is_violation / is_safe_pickup indexes only served COUNT(*) summaries
+    conn.execute("DROP INDEX IF EXISTS idx_violation")
+    conn.execute("DROP INDEX IF EXISTS idx_safe_pickup")
+    conn.execute(CREATE_COUNTS)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_violation_counts_day ON violation_counts(day)")
+    for statement in CREATE_COUNT_TRIGGERS:
+        conn.execute(statement)
+    conn.execute(f'''
+        INSERT OR REPLACE INTO violation_counts (camera_id, worker_id, day, violations, safe_pickups)
+        SELECT camera_id, COALESCE(worker_id, -1), {_COUNT_DAY.format(row="violations")},
+               SUM(is_violation), SUM(is_safe_pickup)
+        FROM violations GROUP BY 1, 2, 3''')
+
+
+def _create_totals(conn):
+    """Summary totals table + triggers, backfilled from the rows already there"""
+    conn.execute(CREATE_TOTALS)
+    for statement in CREATE_TOTAL_TRIGGERS:
+        conn.execute(statement)
+    conn.execute(f'''
+        INSERT OR REPLACE INTO violation_totals (day, camera_id, violations, safe_pickups)
+        SELECT '{ALL_DAYS}', camera_id, SUM(is_violation), SUM(is_safe_pickup) FROM violations GROUP BY camera_id
+        UNION ALL
+        SELECT '{ALL_DAYS}', {ALL_CAMERAS}, SUM(is_violation), SUM(is_safe_pickup) FROM violations HAVING COUNT(*) > 0
+        UNION ALL
+        SELECT {_COUNT_DAY.format(row="violations")}, {ALL_CAMERAS}, SUM(is_violation), SUM(is_safe_pickup)
+        FROM violations GROUP BY 1''')
+
+
+def _parse_timestamp(value):
+    """time.time() floats stored as TEXT, or ISO strings from older sample rows"""
+    if value is None:
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        try:
+            return datetime.fromisoformat(str(value)).timestamp()
+        except ValueError:
+            return 0.0
+
+
+def _parse_list(text):
+    try:
+        return ast.literal_eval(text) if text else []
+    except (ValueError, SyntaxError):
+        return []
+
+
+def _labels_blob(text):
+    return pack_detections(_parse_list(text), [])[0]
+
+
+def _boxes_blob(text):
+    return pack_detections([], _parse_list(text))[1]
+
+
+def _migrate_v1(conn):
+    """Rebuild the version 1 table with typed columns, converting every row (in the caller's transaction)"""
+    conn.create_function("parse_timestamp", 1, _parse_timestamp)
+    conn.create_function("labels_blob", 1, _labels_blob)
+    conn.create_function("boxes_blob", 1, _boxes_blob)
+    conn.execute("ALTER TABLE violations RENAME TO violations_v1")
+    conn.execute(CREATE_VIOLATIONS)
+    conn.execute('''
+        INSERT INTO violations (id, timestamp, camera_id, frame_path, is_violation, is_safe_pickup, labels, boxes)
+        SELECT id, parse_timestamp(timestamp), 0, COALESCE(frame_path, ''), COALESCE(is_violation, 0),
+               COALESCE(is_safe_pickup, 0), labels_blob(labels), boxes_blob(boxes)
+        FROM violations_v1''')
+    conn.execute("DROP TABLE violations_v1")
+
+
+def connect(path, **kwargs):
+    """Connection with the standard PRAGMAs and an up-to-date schema"""
+    conn = sqlite3.connect(path, **kwargs)
+    apply_pragmas(conn)
+    ensure_schema(conn)
+    return conn
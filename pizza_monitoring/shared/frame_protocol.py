@@ -0,0 +1,121 @@
+# pizza_monitoring/shared/frame_protocol.py
+
+import base64
+import json
+import struct
+import time
+
+# ────────────────────────────────────────────────
+# Binary frame envelope (version 1)
+#
+#   magic      4s   b"PZFR"
+#   version    B
+#   codec      B    CODEC_* below
+#   camera_id  H
+#   seq        Q    per-camera sequence number
+#   timestamp  d    capture time (time.time())
+#   height     H
+#   width      H
+#   channels   B
+#   meta_len   I    length of the optional JSON metadata block
+#
+# followed by `meta_len` bytes of UTF-8 JSON metadata and then the payload
+# (the raw JPEG bytes for CODEC_JPEG).
+# ────────────────────────────────────────────────
+MAGIC = b"PZFR"
+VERSION = 1
+HEADER = struct.Struct("!4sBBHQdHHBI")
+
+CODEC_NONE = 0  # no pixel payload (metadata only)
+CODEC_JPEG = 1
+CODEC_RAW = 2   # raw uint8 BGR pixels in (height, width, channels) order
+CODEC_SHM = 3   # no payload; pixels are in a shared-memory ring (descriptor in meta)
+
+# Codec reported for messages in the pre-envelope base64 formats
+CODEC_LEGACY_B64 = 255
+
+
+class FrameHeader:
+    """Decoded envelope header plus its optional metadata dict"""
+    __slots__ = ("version", "codec", "camera_id", "seq", "timestamp",
+                 "height", "width", "channels", "meta")
+
+    def __init__(self, codec=CODEC_JPEG, camera_id=0, seq=0, timestamp=None,
+                 height=0, width=0, channels=3, meta=None, version=VERSION):
+        self.version = version
+        self.codec = codec
+        self.camera_id = camera_id
+        self.seq = seq
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.height = height
+        self.width = width
+        self.channels = channels
+        self.meta = meta if meta is not None else {}
+
+    @property
+    def shape(self):
+        return (self.height, self.width, self.channels)
+
+    @property
+    def is_legacy(self):
+        return self.codec == CODEC_LEGACY_B64
+
+    def __repr__(self):
+        return (f"FrameHeader(camera_id={self.camera_id}, seq={self.seq}, codec={self.codec}, "
+                f"shape={self.shape}, meta={self.meta})")
+
+
+def pack_frame(payload, camera_id=0, seq=0, timestamp=None, shape=(0, 0, 3),
+               codec=CODEC_JPEG, meta=None):
+    """Build a binary envelope around `payload` (bytes-like)"""
+    height, width = shape[0], shape[1]
+    channels = shape[2] if len(shape) > 2 else 1
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8") if meta else b""
+    header = HEADER.pack(
+        MAGIC, VERSION, codec, camera_id, seq,
+        time.time() if timestamp is None else timestamp,
+        height, width, channels, len(meta_bytes)
+    )
+    return b"".join((header, meta_bytes, payload))
+
+
+def pack_header(header, payload):
+    """Re-pack an existing FrameHeader (e.g. when forwarding a frame downstream)"""
+    return pack_frame(payload, header.camera_id, header.seq, header.timestamp,
+                      header.shape, header.codec, header.meta)
+
+
+def is_envelope(body):
+    return len(body) >= HEADER.size and body[:4] == MAGIC
+
+
+def unpack_frame(body):
+    """
+    Split a message body into (FrameHeader, payload).
+
+    Payload is a memoryview into `body` so no copy is made. Messages in the
+    old formats (plain base64 text, or JSON {"frame": <base64>}) are still
+    accepted and come back with codec CODEC_LEGACY_B64 and the decoded JPEG
+    bytes as payload.
+    """
+    if is_envelope(body):
+        (_, version, codec, camera_id, seq, timestamp,
+         height, width, channels, meta_len) = HEADER.unpack_from(body)
+        if version != VERSION:
+            raise ValueError(f"Unsupported frame envelope version {version}")
+        start = HEADER.size
+        meta = json.loads(bytes(body[start:start + meta_len])) if meta_len else {}
+        payload = memoryview(body)[start + meta_len:]
+        header = FrameHeader(codec, camera_id, seq, timestamp,
+                             height, width, channels, meta, version)
+        return header, payload
+
+    return _unpack_legacy(body)
+
+
+def _unpack_legacy(body):
+    if isinstance(body, (bytes, bytearray)) and body[:1] == b"{":
+        b64_str = json.loads(body).get("frame", "")
+    else:
+        b64_str = body
+    return FrameHeader(codec=CODEC_LEGACY_B64, height=0, width=0), base64.b64decode(b64_str)
@@ -0,0 +1,60 @@
+# pizza_monitoring/shared/frame_transform.py
+
+import cv2
+import numpy as np
+
+# ────────────────────────────────────────────────
+# Reader-side crop / resize and the matching coordinate mapping
+#
+# The transform travels in the envelope metadata as
+#   {"crop": [x_offset, y_offset], "scale": [sx, sy], "orig": [height, width]}
+# meaning   frame_x = (orig_x - x_offset) * sx   and   frame_y = (orig_y - y_offset) * sy
+# ────────────────────────────────────────────────
+def preprocess(frame, crop=None, resize=None):
+    """Crop to (x1, y1, x2, y2) then resize to (width, height). Returns (frame, xform or None)."""
+    if not crop and not resize:
+        return frame, None
+    orig_h, orig_w = frame.shape[:2]
+    x_off, y_off = 0, 0
+    if crop:
+        x1, y1, x2, y2 = crop
+        x1, y1 = max(0, int(x1)), max(0, int(y1))
+        x2, y2 = min(orig_w, int(x2)), min(orig_h, int(y2))
+        frame = frame[y1:y2, x1:x2]
+        x_off, y_off = x1, y1
+    sx = sy = 1.0
+    if resize:
+        width, height = resize
+        sx, sy = width / frame.shape[1], height / frame.shape[0]
+        interpolation = cv2.INTER_AREA if sx < 1 and sy < 1 else cv2.INTER_LINEAR
+        frame = cv2.resize(frame, (width, height), interpolation=interpolation)
+    return frame, {"crop": [x_off, y_off], "scale": [sx, sy], "orig": [orig_h, orig_w]}
+
+def box_to_frame(box, xform):
+    """Map an (x1, y1, x2, y2) box from original to transmitted frame coordinates"""
+    if not xform:
+        return box
+    (x_off, y_off), (sx, sy) = xform["crop"], xform["scale"]
+    x1, y1, x2, y2 = box
+    return ((x1 - x_off) * sx, (y1 - y_off) * sy, (x2 - x_off) * sx, (y2 - y_off) * sy)
+
+def box_to_original(box, xform):
+    """Map an (x1, y1, x2, y2) box from transmitted frame back to original coordinates"""
+    if not xform:
+        return box
+    (x_off, y_off), (sx, sy) = xform["crop"], xform["scale"]
+    x1, y1, x2, y2 = box
+    return (x1 / sx + x_off, y1 / sy + y_off, x2 / sx + x_off, y2 / sy + y_off)
+
+def boxes_to_original(boxes, xform):
+    """box_to_original for an (N, 4) array of boxes"""
+    if not xform:
+        return boxes
+    (x_off, y_off), (sx, sy) = xform["crop"], xform["scale"]
+    return boxes / np.array([sx, sy, sx, sy], dtype=boxes.dtype) + np.array([x_off, y_off, x_off, y_off], dtype=boxes.dtype)
+
+def rois_to_frame(rois, xform):
+    """Map [(id, (x1, y1, x2, y2))] ROIs into transmitted frame coordinates (integer pixels)"""
+    if not xform:
+        return rois
+    return [(cid, tuple(int(round(v)) for v in box_to_frame(roi, xform))) for cid, roi in rois]
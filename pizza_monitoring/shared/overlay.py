@@ -0,0 +1,91 @@
+# pizza_monitoring/shared/overlay.py
+
+import cv2
+import numpy as np
+
+# ────────────────────────────────────────────────
+# Detection overlay metadata and its renderer
+#
+# The detector publishes the original frame plus this compact, JSON-ready
+# description of what to draw (in the `det` key of the envelope metadata);
+# consumers render it only on frames they actually show.
+#
+#   rois        [[container id, x1, y1, x2, y2, active], ...]
+#   hands, pizzas, scoopers   [[x1, y1, x2, y2], ...]
+#   persons     [[x1, y1, x2, y2, worker id], ...]
+#   marks       [[worker id, x1, y1, x2, y2], ...]  hands of violations decided on this frame
+#   violations  total violation count
+#   workers     [[worker id, violations, safe pickups], ...]
+#   message     latest log line ("" if none)
+#   violation   a violation was decided on this frame
+#
+# Coordinates are integer pixels of the transmitted (possibly cropped /
+# resized) frame.
+# ────────────────────────────────────────────────
+def _int_boxes(boxes):
+    return np.asarray(boxes, dtype=np.float32).reshape(-1, 4).astype(int).tolist()
+
+
+def make_overlay(rois, active_rois, hands, pizzas, scoopers, persons, worker_ids,
+                 marks, violation_count, worker_stats, message, is_violation):
+    """Build the overlay dict; worker_stats maps worker id -> (violations, safe pickups)"""
+    return {
+        "rois": [[cid, *map(int, roi), cid in active_rois] for cid, roi in rois],
+        "hands": _int_boxes(hands),
+        "pizzas": _int_boxes(pizzas),
+        "scoopers": _int_boxes(scoopers),
+        "persons": [box + [int(w)] for box, w in zip(_int_boxes(persons), worker_ids)],
+        "marks": [[int(w)] + box for (w, _), box in zip(marks, _int_boxes([b for _, b in marks]))],
+        "violations": violation_count,
+        "workers": [[int(w), v, s] for w, (v, s) in worker_stats.items()],
+        "message": message or "",
+        "violation": bool(is_violation),
+    }
+
+
+def draw_overlay(frame, overlay):
+    """Draw an overlay dict (see make_overlay) onto `frame` in place and return it"""
+    # Highlight the hands of violations completed on this frame
+    for worker_id, x1, y1, x2, y2 in overlay.get("marks", ()):
+        cv2.putText(frame, f"❌ Violation! W#{worker_id}", (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
+
+    # Draw ROI containers
+    for cid, x1, y1, x2, y2, _active in overlay.get("rois", ()):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 255, 0), 2)
+        cv2.putText(frame, f"C{cid}", (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+
+    # Draw hands, pizzas and scoopers
+    for key, label, color in (("hands", "Hand", (0, 255, 0)),
+                              ("pizzas", "Pizza", (0, 165, 255)),
+                              ("scoopers", "Scooper", (255, 0, 255))):
+        for x1, y1, x2, y2 in overlay.get(key, ()):
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+    # Draw persons
+    for x1, y1, x2, y2, worker_id in overlay.get("persons", ()):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 255, 255), 2)
+        cv2.putText(frame, f"Worker #{worker_id}", (x1, y1 - 5),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+    # Display overall violation count
+    cv2.putText(frame, f"Total Violations: {overlay.get('violations', 0)}", (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 255), 2)
+
+    # Display per-worker statistics
+    y_offset = 60
+    for worker_id, violations, safe_pickups in overlay.get("workers", ()):
+        cv2.putText(frame, f"Worker #{worker_id}: {violations} violations, {safe_pickups} safe",
+                    (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        y_offset += 25
+
+    # Display recent message
+    if overlay.get("message"):
+        cv2.putText(frame, overlay["message"], (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+    # Add violation indicator
+    if overlay.get("violation"):
+        cv2.rectangle(frame, (10, 10), (frame.shape[1] - 10, frame.shape[0] - 10), (0, 0, 255), 5)
+    return frame
@@ -0,0 +1,53 @@
+# pizza_monitoring/shared/queues.py
+
+from shared.config import QUEUE_MAX_LENGTH, QUEUE_MESSAGE_TTL_MS, QUEUE_OVERFLOW
+
+# ────────────────────────────────────────────────
+# Queue policy
+#
+# Every service declares the frame queues through declare_queue() so the
+# arguments always match (RabbitMQ rejects a redeclare with different
+# arguments). With "drop-head" the broker discards the oldest frame when a
+# queue is full, which keeps end-to-end latency bounded under overload.
+# ────────────────────────────────────────────────
+def queue_arguments():
+    arguments = {}
+    if QUEUE_MAX_LENGTH:
+        arguments["x-max-length"] = QUEUE_MAX_LENGTH
+        arguments["x-overflow"] = QUEUE_OVERFLOW
+    if QUEUE_MESSAGE_TTL_MS:
+        arguments["x-message-ttl"] = QUEUE_MESSAGE_TTL_MS
+    return arguments
+
+def declare_queue(channel, queue_name):
+    return channel.queue_declare(queue=queue_name, durable=False, arguments=queue_arguments())
+
+
+class SequenceGapTracker:
+    """
+    Counts frames lost between producer and consumer from gaps in a
+    per-camera sequence number (broker drop-head, TTL expiry or publisher
+    buffer overflow all show up here). The detector tracks the reader's
+    envelope `seq`; the streamer tracks the detector's meta["out_seq"].
+    """
+    def __init__(self):
+        self.last_seq = {}
+        self.dropped = {}
+        self.received = 0
+
+    def update(self, camera_id, seq):
+        """Record a received frame; returns how many frames were missed just before it"""
+        self.received += 1
+        if not seq:
+            return 0  # legacy messages carry no sequence number
+        last = self.last_seq.get(camera_id)
+        self.last_seq[camera_id] = seq
+        if last is None or seq <= last:
+            return 0  # first frame, or the producer restarted
+        missed = seq - last - 1
+        if missed:
+            self.dropped[camera_id] = self.dropped.get(camera_id, 0) + missed
+        return missed
+
+    def total_dropped(self):
+        return sum(self.dropped.values())
@@ -0,0 +1,285 @@
+# pizza_monitoring/shared/rabbit_publisher.py
+
+import collections
+import threading
+import time
+
+import pika
+
+from shared.config import RABBITMQ_HOST
+from shared.queues import declare_queue
+
+
+# ────────────────────────────────────────────────
+# Long-lived RabbitMQ publisher
+#
+# pika's BlockingConnection is not thread-safe, so a single I/O thread owns
+# the connection and channel. Producers only append to a bounded in-memory
+# queue, which keeps the cost of publish() in the microsecond range. When the
+# queue is full the oldest message is dropped so the stream stays live.
+#
+# With confirm=True the channel is in publisher-confirm mode: a batch is
+# written without waiting and the I/O thread then waits once for the
+# broker's acks of the whole batch. If the connection fails, only the
+# messages that were not confirmed yet (plus the unsent rest of the batch)
+# are published again after reconnecting, and nacked messages are resent.
+# Delivery is therefore at-least-once: a message whose ack was lost with
+# the connection is published twice. Without confirms a message written to
+# the socket just before a failure can be lost (at-most-once).
+# ────────────────────────────────────────────────
+class RabbitPublisher:
+    def __init__(self, queue_name, host=RABBITMQ_HOST, max_pending=256, batch_size=32,
+                 confirm=False, confirm_timeout=10.0, name="Publisher", report_every=10.0,
+                 depth_poll_interval=0, tap=None):
+        """
+        Args:
+            queue_name: Default routing key (queue on the default exchange)
+            host: RabbitMQ host
+            max_pending: Size of the in-memory buffer in front of the I/O thread
+            batch_size: Maximum number of messages published per I/O loop
+            confirm: If True, publisher confirms are enabled and each batch waits
+                     once for the broker's acks (batched confirmation)
+            confirm_timeout: Seconds to wait for a batch's acks before reconnecting
+            name: Prefix for log lines
+            report_every: Seconds between stats log lines (0 disables)
+            depth_poll_interval: Seconds between passive declares of `queue_name`
+                     to refresh `queue_depth` (0 disables)
+            tap: Optional callable(body, routing_key) invoked for every published
+                 message, e.g. to record traffic (see shared/capture_file.py)
+        """
+        self.queue_name = queue_name
+        self.host = host
+        self.batch_size = batch_size
+        self.confirm = confirm
+        self.confirm_timeout = confirm_timeout
+        self.name = name
+        self.report_every = report_every
+        self.depth_poll_interval = depth_poll_interval
+        self.tap = tap
+
+        self._pending = collections.deque()
+        self._max_pending = max_pending
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._connection = None
+        self._channel = None
+        self._declared = set()
+
+        # Publisher confirms: delivery tag -> message, in publish order
+        self._delivery_tag = 0
+        self._unconfirmed = collections.OrderedDict()
+        self._nacked = []
+
+        # Counters
+        self.published = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self.republished = 0
+        self.enqueue_time_total = 0.0
+        self.enqueue_count = 0
+        self.batch_time_total = 0.0
+        self.batch_count = 0
+
+        # Broker-side backlog of `queue_name`, refreshed by the I/O thread
+        self.queue_depth = 0
+
+    # ─────────────────────────────
+    # Producer side (any thread)
+    # ─────────────────────────────
+    def publish(self, body, routing_key=None, properties=None):
+        """Queue a message for the I/O thread. Returns False if an older message had to be dropped."""
+        if self.tap is not None:
+            self.tap(body, routing_key or self.queue_name)
+        start = time.perf_counter()
+        accepted = True
+        with self._cond:
+            if len(self._pending) >= self._max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+                accepted = False
+            self._pending.append((routing_key or self.queue_name, body, properties))
+            self._cond.notify()
+            self.enqueue_time_total += time.perf_counter() - start
+            self.enqueue_count += 1
+        return accepted
+
+    def pending(self):
+        return len(self._pending)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-io", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout=5.0):
+        """Flush what is queued (up to `timeout` seconds) and close the connection"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "dropped": self.dropped,
+            "pending": len(self._pending),
+            "reconnects": self.reconnects,
+            "republished": self.republished,
+            "queue_depth": self.queue_depth,
+            "avg_enqueue_us": 1e6 * self.enqueue_time_total / self.enqueue_count if self.enqueue_count else 0.0,
+            "avg_batch_ms": 1e3 * self.batch_time_total / self.batch_count if self.batch_count else 0.0,
+        }
+
+    # ─────────────────────────────
+    # I/O thread
+    # ─────────────────────────────
+    def _connect(self):
+        params = pika.ConnectionParameters(host=self.host, heartbeat=60, blocked_connection_timeout=30)
+        self._connection = pika.BlockingConnection(params)
+        self._channel = self._connection.channel()
+        self._declared = set()
+        if self.confirm:
+            self._select_confirms()
+        print(f"[{self.name}] 🟢 Connected to RabbitMQ at {self.host}")
+
+    def _select_confirms(self):
+        # BlockingChannel.confirm_delivery() would make every basic_publish wait for its own ack,
+        # so confirms are enabled on the underlying channel and acks are collected in _on_confirm
+        selected = []
+        self._delivery_tag = 0
+        self._channel._impl.confirm_delivery(ack_nack_callback=self._on_confirm, callback=selected.append)
+        deadline = time.monotonic() + self.confirm_timeout
+        while not selected:
+            if time.monotonic() > deadline:
+                raise TimeoutError("no Confirm.SelectOk from the broker")
+            self._connection.process_data_events(time_limit=0.1)
+
+    def _on_confirm(self, frame):
+        method = frame.method
+        if method.multiple:
+            tags = [tag for tag in self._unconfirmed if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag] if method.delivery_tag in self._unconfirmed else []
+        messages = [self._unconfirmed.pop(tag) for tag in tags]
+        if isinstance(method, pika.spec.Basic.Nack):
+            self._nacked.extend(messages)
+        else:
+            self.published += len(messages)
+
+    def _wait_for_confirms(self):
+        deadline = time.monotonic() + self.confirm_timeout
+        while self._unconfirmed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"{len(self._unconfirmed)} message(s) not confirmed "
+                                   f"within {self.confirm_timeout:.0f}s")
+            self._connection.process_data_events(time_limit=min(remaining, 1.0))
+
+    def _take_unconfirmed(self):
+        """Messages published but not acked (or nacked) on the current channel, in publish order"""
+        messages = self._nacked + list(self._unconfirmed.values())
+        self._nacked = []
+        self._unconfirmed.clear()
+        self.republished += len(messages)
+        return messages
+
+    def _disconnect(self):
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+        self._channel = None
+
+    def _ensure_declared(self, routing_key):
+        if routing_key not in self._declared:
+            declare_queue(self._channel, routing_key)
+            self._declared.add(routing_key)
+
+    def _poll_depth(self):
+        self._ensure_declared(self.queue_name)
+        result = self._channel.queue_declare(queue=self.queue_name, passive=True)
+        self.queue_depth = result.method.message_count
+
+    def _next_batch(self):
+        with self._cond:
+            if not self._pending and not self._stop.is_set():
+                self._cond.wait(timeout=1.0)
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.popleft())
+        return batch
+
+    def _publish_batch(self, batch):
+        """
+        Publish `batch`, removing messages from it as they are written. On
+        return it holds only the messages the broker nacked (to be resent); if
+        this raises, it holds the ones not written yet.
+        """
+        start = time.perf_counter()
+        while batch:
+            routing_key, body, properties = message = batch[0]
+            self._ensure_declared(routing_key)
+            self._channel.basic_publish(exchange='', routing_key=routing_key, body=body, properties=properties)
+            del batch[0]
+            if self.confirm:
+                self._delivery_tag += 1
+                self._unconfirmed[self._delivery_tag] = message
+            else:
+                self.published += 1
+        if self.confirm:
+            self._wait_for_confirms()
+            batch.extend(self._take_unconfirmed())
+        self.batch_time_total += time.perf_counter() - start
+        self.batch_count += 1
+
+    def _run(self):
+        backoff = 1.0
+        batch = []
+        last_report = time.time()
+        last_poll = 0.0
+
+        while True:
+            if self._stop.is_set() and not batch and not self._pending:
+                break
+            try:
+                if self._connection is None or not self._connection.is_open:
+                    self._connect()
+                    backoff = 1.0
+
+                if not batch:
+                    batch = self._next_batch()
+                if batch:
+                    self._publish_batch(batch)
+                else:
+                    # Idle: keep heartbeats flowing
+                    self._connection.process_data_events(time_limit=0)
+
+                if self.depth_poll_interval and time.time() - last_poll >= self.depth_poll_interval:
+                    self._poll_depth()
+                    last_poll = time.time()
+
+            except Exception as e:
+                print(f"[{self.name}] ❌ Publish failed ({e}), reconnecting in {backoff:.0f}s")
+                self._disconnect()
+                # Resend what the broker did not confirm, ahead of the unsent rest of the batch
+                batch[:0] = self._take_unconfirmed()
+                self.reconnects += 1
+                if self._stop.is_set():
+                    break
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+            if self.report_every and time.time() - last_report >= self.report_every:
+                s = self.stats()
+                print(f"[{self.name}] 📊 published={s['published']} dropped={s['dropped']} "
+                      f"pending={s['pending']} republished={s['republished']} enqueue={s['avg_enqueue_us']:.1f}µs batch={s['avg_batch_ms']:.2f}ms")
+                last_report = time.time()
+
+        self._disconnect()
+        print(f"[{self.name}] ✅ Publisher closed.")
@@ -0,0 +1,173 @@
+# pizza_monitoring/shared/shm_ring.py
+
+import threading
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+# ────────────────────────────────────────────────
+# Shared-memory ring buffer of raw BGR frames
+#
+# Layout:  [generation: uint64][slot sequence numbers: uint64 x slots][padding to 64 bytes][slot 0][slot 1]...
+#
+# Frame `seq` always goes to slot `seq % slots`. The slot's sequence number
+# works as a seqlock: the writer sets it to 0 before copying pixels and to
+# `seq` afterwards, so a reader that sees the expected sequence number both
+# before and after using the pixels knows the frame was not overwritten
+# (torn) in the meantime. Only a small descriptor (ring name, slot, seq,
+# shape) travels over the broker.
+#
+# The generation is the writer's creation time (ns) and travels in every
+# descriptor. Consumers attach to a ring once and share it between threads.
+# A descriptor with a newer generation than the attached ring means the
+# writer restarted and recreated the segment, so a new mapping is swapped in.
+# An older one belongs to a segment that is gone. A plain sequence-number
+# miss is just a slot reused before a slow consumer got to it.
+# ────────────────────────────────────────────────
+_ALIGN = 64
+
+
+def _data_offset(slots):
+    return ((slots + 1) * 8 + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class SharedFrameRing:
+    def __init__(self, name, slots, slot_bytes, create=False):
+        self.name = name
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = create
+        size = _data_offset(slots) + slots * slot_bytes
+
+        if create:
+            try:
+                # Leftover from a crashed writer: start clean
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Readers must not unlink the segment when they exit (Python < 3.13 tracks attached segments too)
+            try:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+
+        header = np.ndarray((slots + 1,), dtype=np.uint64, buffer=self.shm.buf)
+        if create:
+            header[:] = 0
+            header[0] = time.time_ns()
+        self.generation = int(header[0])
+        self.seqs = header[1:]
+        self.data = np.ndarray((slots, slot_bytes), dtype=np.uint8,
+                               buffer=self.shm.buf, offset=_data_offset(slots))
+
+        self.torn_reads = 0
+
+    @classmethod
+    def attach(cls, name, slots, slot_bytes):
+        return cls(name, slots, slot_bytes, create=False)
+
+    # ─────────────────────────────
+    # Writer
+    # ─────────────────────────────
+    def fits(self, frame):
+        return frame.nbytes <= self.slot_bytes
+
+    def write(self, seq, frame):
+        """Copy `frame` into the slot for `seq` and return its descriptor"""
+        slot = seq % self.slots
+        self.seqs[slot] = 0  # mark as being written
+        self.data[slot, :frame.nbytes] = frame.reshape(-1)
+        self.seqs[slot] = seq
+        return {"shm": self.name, "slot": slot, "slots": self.slots, "slot_bytes": self.slot_bytes,
+                "gen": self.generation}
+
+    # ─────────────────────────────
+    # Reader
+    # ─────────────────────────────
+    def view(self, slot, seq, shape):
+        """Zero-copy NumPy view of frame `seq`, or None if the slot already holds another frame"""
+        if int(self.seqs[slot]) != seq:
+            self.torn_reads += 1
+            return None
+        nbytes = int(np.prod(shape))
+        return self.data[slot, :nbytes].reshape(shape)
+
+    def is_current(self, slot, seq):
+        """True if the slot still holds frame `seq` (check after using a view)"""
+        if int(self.seqs[slot]) != seq:
+            self.torn_reads += 1
+            return False
+        return True
+
+    def read_copy(self, slot, seq, shape):
+        """Copy frame `seq` out of the ring; None if it was overwritten before or during the copy"""
+        frame = self.view(slot, seq, shape)
+        if frame is None:
+            return None
+        frame = frame.copy()
+        return frame if self.is_current(slot, seq) else None
+
+    def close(self):
+        """Unmap (and unlink, for the writer). Only for rings no other thread is still reading."""
+        self._unmap()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _unmap(self):
+        # Views must be released before the buffer can be closed
+        self.seqs = None
+        self.data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a caller still holds a view; the mapping goes away with it
+
+    def __del__(self):
+        # Replaced consumer rings are simply dropped; unmap once the last reader let go
+        if getattr(self, "data", None) is not None:
+            self._unmap()
+
+
+# Rings attached by consumers, keyed by name
+_attached = {}
+_attach_lock = threading.Lock()
+
+
+def get_ring(name, slots, slot_bytes, generation=0):
+    """
+    The ring named in a frame descriptor, attached once and shared by all
+    threads. Re-attaches when `generation` is newer than the attached ring
+    (writer restarted); the old ring is never closed under other readers,
+    only dropped.
+    """
+    with _attach_lock:
+        ring = _attached.get(name)
+        if ring is None or generation > ring.generation:
+            ring = SharedFrameRing.attach(name, slots, slot_bytes)
+            _attached[name] = ring
+        return ring
+
+
+def read_frame(header):
+    """
+    Copy the frame described by a CODEC_SHM envelope header out of its ring.
+
+    Returns None when the slot was already reused (consumer too slow) or the
+    frame belongs to a ring the writer has since recreated.
+    """
+    meta = header.meta
+    generation = meta.get("gen", 0)
+    ring = get_ring(meta["shm"], meta["slots"], meta["slot_bytes"], generation)
+    if generation and generation != ring.generation:
+        ring.torn_reads += 1
+        return None
+    return ring.read_copy(meta["slot"], header.seq, header.shape)
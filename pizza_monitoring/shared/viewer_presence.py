@@ -0,0 +1,163 @@
+# pizza_monitoring/shared/viewer_presence.py
+
+import json
+import threading
+import time
+
+import pika
+
+from shared.config import (RABBITMQ_HOST, VIEWER_PRESENCE, VIEWER_CONTROL_QUEUE,
+                           VIEWER_HEARTBEAT_SECONDS, VIEWER_TIMEOUT_SECONDS)
+from shared.queues import declare_queue
+from shared.rabbit_publisher import RabbitPublisher
+
+# ────────────────────────────────────────────────
+# Viewer presence
+#
+# The streamer counts open /video streams and publishes the count on a
+# small control queue, right away on every change and as a heartbeat every
+# VIEWER_HEARTBEAT_SECONDS. The detector listens and only packages and
+# publishes processed frames while someone is watching; detection and
+# violation recording never stop. A streamer that stops sending heartbeats
+# for VIEWER_TIMEOUT_SECONDS counts as having no viewers.
+# ────────────────────────────────────────────────
+class ViewerCounter:
+    """Streamer side: open stream count, reported on the control queue"""
+    def __init__(self, host=RABBITMQ_HOST, queue_name=VIEWER_CONTROL_QUEUE, interval=VIEWER_HEARTBEAT_SECONDS):
+        self.count = 0
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._publisher = RabbitPublisher(queue_name, host=host, max_pending=4, name="Viewer Presence",
+                                          report_every=0)
+
+    def start(self):
+        self._publisher.start()
+        threading.Thread(target=self._heartbeat, name="viewer-heartbeat", daemon=True).start()
+        return self
+
+    def enter(self):
+        with self._lock:
+            self.count += 1
+            self._send()
+
+    def leave(self):
+        with self._lock:
+            self.count -= 1
+            self._send()
+
+    def watch(self, frames):
+        """Wrap a stream generator so it counts as a viewer while it is open"""
+        self.enter()
+        try:
+            yield from frames
+        finally:
+            self.leave()
+
+    def _send(self):
+        self._publisher.publish(json.dumps({"viewers": self.count, "ts": time.time()}).encode("utf-8"))
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                self._send()
+
+
+class ViewerPresence:
+    """Detector side: latest viewer count from the control queue, plus idle-mode savings"""
+    def __init__(self, host=RABBITMQ_HOST, queue_name=VIEWER_CONTROL_QUEUE, timeout=VIEWER_TIMEOUT_SECONDS,
+                 enabled=VIEWER_PRESENCE, report_every=60.0):
+        self.host = host
+        self.queue_name = queue_name
+        self.timeout = timeout
+        self.enabled = enabled
+        self.report_every = report_every
+        self.viewers = 0
+        self._last_heartbeat = 0.0
+        self._was_active = None
+        self._stop = threading.Event()
+
+        # Idle-mode accounting: what a published frame costs, and how many were skipped
+        self._lock = threading.Lock()
+        self.published = 0
+        self.published_bytes = 0
+        self.package_time = 0.0
+        self.skipped = 0
+        self._skipped_since_report = 0
+        self._last_report = time.time()
+
+    def start(self):
+        if self.enabled:
+            threading.Thread(target=self._run, name="viewer-presence", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def active(self):
+        """True while at least one viewer is watching (always True when presence is disabled)"""
+        if not self.enabled:
+            return True
+        active = self.viewers > 0 and time.monotonic() - self._last_heartbeat < self.timeout
+        if active != self._was_active:
+            self._was_active = active
+            print(f"[Viewer Presence] {'👀 Viewer(s) connected, publishing frames' if active else '💤 No viewers, frames are not published'}")
+        return active
+
+    def record_published(self, nbytes, seconds):
+        with self._lock:
+            self.published += 1
+            self.published_bytes += nbytes
+            self.package_time += seconds
+
+    def record_skipped(self):
+        with self._lock:
+            self.skipped += 1
+            self._skipped_since_report += 1
+
+    def maybe_report(self):
+        now = time.time()
+        if not self.report_every or now - self._last_report < self.report_every:
+            return
+        with self._lock:
+            elapsed, self._last_report = now - self._last_report, now
+            skipped, self._skipped_since_report = self._skipped_since_report, 0
+            if not skipped:
+                return
+            # Estimated from the average cost of the frames that were published
+            avg_bytes = self.published_bytes / self.published if self.published else 0.0
+            avg_time = self.package_time / self.published if self.published else 0.0
+        print(f"[Viewer Presence] 💤 Idle: {skipped} frame(s) not packaged/published in the last {elapsed:.0f}s "
+              f"(~{skipped * avg_bytes / 1e6:.1f} MB to the broker, ~{1e3 * skipped * avg_time:.0f} ms detector CPU, "
+              f"{skipped} streamer decode(s) saved; {self.skipped} total)")
+
+    # ─────────────────────────────
+    # Control queue consumer (own connection and thread)
+    # ─────────────────────────────
+    def _on_message(self, ch, method, properties, body):
+        try:
+            self.viewers = int(json.loads(body).get("viewers", 0))
+            self._last_heartbeat = time.monotonic()
+        except (ValueError, TypeError, AttributeError) as e:
+            print(f"[Viewer Presence] ⚠️ Bad presence message: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = pika.BlockingConnection(pika.ConnectionParameters(host=self.host, heartbeat=60))
+                channel = connection.channel()
+                declare_queue(channel, self.queue_name)
+                channel.basic_consume(queue=self.queue_name, on_message_callback=self._on_message, auto_ack=True)
+                print(f"[Viewer Presence] 🟢 Listening on '{self.queue_name}'")
+                while not self._stop.is_set():
+                    connection.process_data_events(time_limit=1)
+            except Exception as e:
+                print(f"[Viewer Presence] ❌ Control queue error ({e}), retrying in 2s")
+                self._stop.wait(2.0)
+            finally:
+                try:
+                    if connection is not None and connection.is_open:
+                        connection.close()
+                except Exception:
+                    pass
@@ -1,6 +1,11 @@
-import sqlite3
+import sys
 import os
+# Add root directory to sys.path (pizza_monitoring)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlite3
 import time
+from datetime import datetime
+from shared.db_schema import INSERT_VIOLATION, apply_pragmas, ensure_schema, violation_row
 
 def init_db():
     db_path = os.environ.get("DB_PATH", "/app/shared/violations.db")
@@ -11,53 +16,23 @@ def init_db():
     retries = 0
     while retries < max_retries:
         try:
-            # Check if database exists and has the violations table
-            if os.path.exists(db_path):
-                conn = sqlite3.connect(db_path)
-                cursor = conn.cursor()
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='violations'")
-                if cursor.fetchone():
-                    print("Database already initialized.")
-                    conn.close()
-                    return
-                conn.close()
-            
-            # Initialize the database
-            print(f"Initializing database at {db_path}...")
+            # Create the schema, or migrate an existing database in place (shared/db_schema.py)
             conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            
-            # Apply performance PRAGMA settings
-            cursor.execute("PRAGMA journal_mode=WAL")
-            cursor.execute("PRAGMA synchronous=NORMAL")
-            cursor.execute("PRAGMA temp_store=MEMORY")
-            cursor.execute("PRAGMA cache_size = 10000")
-            
-            # Create table if not exists
-            cursor.execute('''CREATE TABLE IF NOT EXISTS violations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                frame_path TEXT,
-                labels TEXT,
-                boxes TEXT,
-                is_violation INTEGER DEFAULT 0,
-                is_safe_pickup INTEGER DEFAULT 0
-            )''')
-            
-            # Optional: create indexes for summary queries
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_violation ON violations(is_violation)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_safe_pickup ON violations(is_safe_pickup)")
-            
-            # Insert some sample data
-            cursor.execute('''
-                INSERT INTO violations (timestamp, frame_path, labels, boxes, is_violation, is_safe_pickup)
-                VALUES (?, ?, ?, ?, ?, ?)''',
-                ("2025-07-23T22:40:00", "", "[]", "[]", 0, 1)
-            )
-            
+            apply_pragmas(conn)
+            outcome = ensure_schema(conn)
+            if outcome == "current":
+                print("Database already initialized.")
+                conn.close()
+                return
+
+            if outcome == "created":
+                # Insert some sample data
+                conn.execute(INSERT_VIOLATION, violation_row(
+                    datetime(2025, 7, 23, 22, 40).timestamp(), 0, None, None, None, "", [], [], 0, 1))
+
             conn.commit()
             conn.close()
-            print("Database initialized successfully!")
+            print(f"Database {outcome} successfully!")
             return
             
         except sqlite3.OperationalError as e:
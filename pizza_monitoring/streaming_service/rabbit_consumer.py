@@ -3,8 +3,6 @@ import os
 # Add root directory to sys.path (pizza_monitoring)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pika
-import json
-import base64
 import cv2
 import numpy as np
 from threading import Thread
@@ -12,25 +10,39 @@ import queue
 import time
 import state
 from shared.config import PROCESSED_QUEUE
+from shared.frame_protocol import unpack_frame, CODEC_RAW, CODEC_SHM
+from shared import shm_ring
+from shared.queues import declare_queue, SequenceGapTracker
 
 # Frame queue
 frame_queue = queue.Queue(maxsize=60)
 
+# Frames lost between detector and streamer (publisher buffer, broker drop-head / TTL), from gaps in
+# the detector's output sequence (frames it skipped while nobody watched are not gaps)
+drop_tracker = SequenceGapTracker()
+
 # ─────────────────────────────────────────────
-# Decode frame from Base64
+# Decode frame message (binary envelope or legacy Base64)
 # ─────────────────────────────────────────────
-def decode_base64_frame(b64_str):
+def decode_frame_message(body):
+    """(frame, detection overlay metadata or None), or (None, None) on failure"""
     try:
         start = time.time()
-        byte_data = base64.b64decode(b64_str)
-        np_array = np.frombuffer(byte_data, dtype=np.uint8)
-        frame = cv2.imdecode(np_array, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+        header, payload = unpack_frame(body)
+        np_array = np.frombuffer(payload, dtype=np.uint8)
+        if header.codec == CODEC_SHM:
+            frame = shm_ring.read_frame(header)
+        elif header.codec == CODEC_RAW:
+            frame = np_array.reshape(header.shape)
+        else:
+            frame = cv2.imdecode(np_array, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
         end = time.time()
         print(f"[Stream Consumer] 🕒 Decoded frame in {end - start:.4f} seconds.")
-        return frame
+        # The detector sends the original frame; what to draw on it travels in meta["det"]
+        return frame, header.meta.get("det")
     except Exception as e:
         print(f"[Stream Consumer] ❌ Decode error: {e}")
-        return None
+        return None, None
 
 # ─────────────────────────────────────────────
 # Frame processor thread
@@ -41,9 +53,10 @@ def process_frame_worker(worker_id=0):
             frame_data = frame_queue.get(timeout=5)
             start = time.time()
 
-            frame = decode_base64_frame(frame_data)
+            frame, overlay = decode_frame_message(frame_data)
             if frame is not None:
-                state.latest_frame = frame
+                # Overlays are drawn by the stream generator, only for frames a viewer gets
+                state.update_frame(frame, overlay)
 
             print(f"[Worker {worker_id}] 🕒 Processed in {time.time() - start:.4f} sec")
             frame_queue.task_done()
@@ -59,12 +72,15 @@ def process_frame_worker(worker_id=0):
 def consume_frames():
     def callback(ch, method, properties, body):
         try:
-            data = json.loads(body)
-            b64_frame = data.get("frame")
-
-            if b64_frame:
+            if body:
+                # Gap accounting happens here, on the single consumer thread, in arrival order
+                header, _ = unpack_frame(body)
+                missed = drop_tracker.update(header.camera_id, header.meta.get("out_seq", header.seq))
+                if missed:
+                    print(f"[Stream Consumer] ⚠️ {missed} processed frame(s) lost for camera {header.camera_id} "
+                          f"(total dropped: {drop_tracker.total_dropped()})")
                 try:
-                    frame_queue.put_nowait(b64_frame)
+                    frame_queue.put_nowait(body)
                 except queue.Full:
                     print("[Stream Consumer] ⚠️ Frame queue full, dropping frame")
 
@@ -84,7 +100,7 @@ def consume_frames():
         connection = pika.BlockingConnection(connection_params)
         channel = connection.channel()
 
-        channel.queue_declare(queue=PROCESSED_QUEUE, durable=False)
+        declare_queue(channel, PROCESSED_QUEUE)
         channel.basic_qos(prefetch_count=1)
         channel.basic_consume(queue=PROCESSED_QUEUE, on_message_callback=callback, auto_ack=False)
 
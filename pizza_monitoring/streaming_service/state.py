@@ -3,15 +3,26 @@
 import cv2
 import threading
 
-# Thread-safe latest frame storage
+# Thread-safe latest frame storage: the original frame, its detection overlay
+# metadata (drawn only when the frame is streamed) and a version number that
+# changes with every new frame
 latest_frame = None
+latest_overlay = None
+frame_version = 0
 frame_lock = threading.Lock()
 
-def update_frame(frame):
+def update_frame(frame, overlay=None):
     """Thread-safe update of the latest frame"""
-    global latest_frame
+    global latest_frame, latest_overlay, frame_version
     with frame_lock:
         latest_frame = frame
+        latest_overlay = overlay
+        frame_version += 1
+
+def get_latest():
+    """(frame, overlay, version) without copying; the frame must not be drawn on"""
+    with frame_lock:
+        return latest_frame, latest_overlay, frame_version
 
 def get_frame():
     """Thread-safe retrieval of the latest frame"""
@@ -2,14 +2,18 @@ import sys
 import os
 # Add root directory to sys.path (pizza_monitoring)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from flask import Flask, Response, jsonify, render_template_string
+from flask import Flask, Response, jsonify, render_template_string, request
 from waitress import serve
+import re
 import time
+import threading
 import cv2
-import sqlite3
-from shared.config import DB_PATH
+from shared.config import DB_PATH, SNAPSHOT_DIR, VIOLATIONS_PAGE_SIZE
+from shared.overlay import draw_overlay
+from shared.viewer_presence import ViewerCounter
 import state
-from rabbit_consumer import start_consumer_thread
+from rabbit_consumer import start_consumer_thread, drop_tracker
+from violations_db import SummaryCache, ReadPool, query_violations
 
 
 app = Flask(__name__)
@@ -19,6 +23,42 @@ app = Flask(__name__)
 # ───────────────────────
 start_consumer_thread()
 
+# Open /video streams, reported to the detector (it stops publishing frames when there are none)
+viewers = ViewerCounter(os.environ.get("RABBITMQ_HOST", "localhost")).start()
+
+# ───────────────────────
+# Overlay rendering + JPEG, once per new frame
+#
+# Frames arrive un-annotated with their detection metadata. Only frames that
+# are actually streamed get drawn on and encoded, and every viewer shares the
+# result of the latest one.
+# ───────────────────────
+render_lock = threading.Lock()
+rendered = {"version": -1, "jpeg": None}
+
+def render_latest_frame():
+    """JPEG of the latest frame with its overlay, or None when there is no frame yet"""
+    frame, overlay, version = state.get_latest()
+    if frame is None:
+        return None
+    with render_lock:
+        if rendered["version"] != version:
+            # Draw on a copy: the stored frame may be a read-only view of the message
+            if overlay:
+                frame = draw_overlay(frame.copy(), overlay)
+
+            # Resize if needed
+            if frame.shape[1] > 640:
+                frame = cv2.resize(frame, (640, 480))
+
+            # Encode frame as JPEG
+            success, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            if not success:
+                return None
+            rendered["version"] = version
+            rendered["jpeg"] = jpeg.tobytes()
+        return rendered["jpeg"]
+
 # ───────────────────────
 # MJPEG Stream Generator
 # ───────────────────────
@@ -30,26 +70,16 @@ def generate_frames():
 
     while True:
         start = time.time()
-        frame = getattr(state, 'latest_frame', None)
+        jpeg = render_latest_frame()
 
-        if frame is None:
+        if jpeg is None:
             # Show last good frame if available (not older than 0.5s)
             if last_encoded and (time.time() - last_frame_time < 0.5):
                 yield last_encoded
             time.sleep(0.01)
             continue
 
-        # Resize if needed
-        if frame.shape[1] > 640:
-            frame = cv2.resize(frame, (640, 480))
-
-        # Encode frame as JPEG
-        success, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
-        if not success:
-            time.sleep(0.005)
-            continue
-
-        encoded = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg.tobytes() + b"\r\n"
+        encoded = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n"
         last_encoded = encoded
         last_frame_time = time.time()
 
@@ -174,30 +204,23 @@ def index():
 
 # ───────────────────────
 # Summary API (Cached)
+#
+# One summary shared by all dashboards, recomputed from the counters table
+# only when the database changed (see violations_db.py)
 # ───────────────────────
-summary_cache = {
-    "violations": 0,
-    "safe_pickups": 0,
-    "last_updated": 0
-}
+summary_cache = SummaryCache(DB_PATH)
 
 @app.route("/summary")
 def get_summary():
     try:
-        now = time.time()
-        if now - summary_cache["last_updated"] > 1:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM violations WHERE is_violation = 1")
-            summary_cache["violations"] = cursor.fetchone()[0]
-            cursor.execute("SELECT COUNT(*) FROM violations WHERE is_safe_pickup = 1")
-            summary_cache["safe_pickups"] = cursor.fetchone()[0]
-            conn.close()
-            summary_cache["last_updated"] = now
-
+        summary = summary_cache.get()
         return jsonify({
-            "total_violations": summary_cache["violations"],
-            "total_safe_pickups": summary_cache["safe_pickups"]
+            "total_violations": summary["violations"],
+            "total_safe_pickups": summary["safe_pickups"],
+            "today": summary["today"],
+            "cameras": summary["cameras"],
+            "dropped_frames": drop_tracker.total_dropped(),
+            "viewers": viewers.count
         })
 
     except Exception as e:
@@ -206,12 +229,81 @@ def get_summary():
         return jsonify({"error": str(e)}), 500
 
 
+# ───────────────────────
+# Violation History API
+#
+#   /violations?since=&until=&camera=&worker=&type=violation|safe_pickup&limit=&cursor=&detections=1
+#
+# since / until are epoch seconds. Pages are newest first; pass the returned
+# "next" value as ?cursor= for the following page (null on the last one).
+# ───────────────────────
+read_pool = ReadPool(DB_PATH)
+
+@app.route("/violations")
+def list_violations():
+    args = request.args
+    try:
+        filters = {
+            "since": args.get("since", type=float),
+            "until": args.get("until", type=float),
+            "camera_id": args.get("camera", type=int),
+            "worker_id": args.get("worker", type=int),
+            "event_type": args.get("type") or None,
+            "cursor": args.get("cursor") or None,
+            "limit": args.get("limit", VIOLATIONS_PAGE_SIZE, type=int),
+            "detections": args.get("detections") in ("1", "true"),
+        }
+        with read_pool.connection() as conn:
+            items, next_cursor = query_violations(conn, **filters)
+    except ValueError as e:
+        return jsonify({"error": f"Bad request: {e}"}), 400
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"items": items, "next": next_cursor})
+
+
+# ───────────────────────
+# Evidence Snapshots
+#
+# Files are named after their SHA-256, so a URL always returns the same
+# bytes: clients and proxies may cache them for good, and the hash doubles
+# as the ETag. Snapshots deleted by retention answer 404.
+# ───────────────────────
+SNAPSHOT_KEY = re.compile(r"^([0-9a-f]{2})/(\1[0-9a-f]{62})\.jpg$")
+
+def read_chunks(path, chunk_size=64 * 1024):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+@app.route("/snapshots/<path:key>")
+def get_snapshot(key):
+    match = SNAPSHOT_KEY.match(key)
+    if not match:
+        return jsonify({"error": "Unknown snapshot"}), 404
+    etag = f'"{match.group(2)}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status=304, headers=headers)
+    path = os.path.join(SNAPSHOT_DIR, match.group(1), f"{match.group(2)}.jpg")
+    try:
+        headers["Content-Length"] = str(os.path.getsize(path))
+    except OSError:
+        return jsonify({"error": "Snapshot not found (expired or never stored)"}), 404
+    return Response(read_chunks(path), mimetype="image/jpeg", headers=headers, direct_passthrough=True)
+
+
 # ───────────────────────
 # Video Streaming Route
 # ───────────────────────
 @app.route("/video")
 def video_feed():
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(viewers.watch(generate_frames()), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
 # ───────────────────────
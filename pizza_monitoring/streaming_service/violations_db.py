@@ -0,0 +1,206 @@
+# pizza_monitoring/streaming_service/violations_db.py
+
+import contextlib
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+
+from shared.config import DB_READ_POOL_SIZE, VIOLATIONS_PAGE_SIZE, VIOLATIONS_MAX_PAGE_SIZE
+from shared.db_schema import ALL_CAMERAS, ALL_DAYS, TODAY, unpack_detections
+
+# ────────────────────────────────────────────────
+# Read side of violations.db for the streaming API
+#
+# Summaries are a few point lookups in the trigger-maintained
+# violation_totals table (see shared/db_schema.py), so they cost the same
+# with ten rows or ten million.
+# One result is shared by every client and recomputed only after another
+# connection committed a write, which SQLite reports through
+# PRAGMA data_version (or when the local day changes).
+#
+# History pages use keyset pagination over (timestamp, id), newest first,
+# on a small pool of read-only connections. In WAL mode readers never block
+# the detector's writer (or each other), and every page is an index range
+# scan that starts where the previous one stopped, so page N costs the same
+# as page 1 however large the table grows.
+# ────────────────────────────────────────────────
+def readonly_uri(path):
+    return pathlib.Path(os.path.abspath(path)).as_uri() + "?mode=ro"
+
+
+def connect_readonly(path):
+    conn = sqlite3.connect(readonly_uri(path), uri=True, check_same_thread=False)
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+class ReadPool:
+    """Up to `size` read-only connections, opened on demand and reused"""
+    def __init__(self, db_path, size=DB_READ_POOL_SIZE):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextlib.contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = connect_readonly(self.db_path)
+            try:
+                yield conn
+            except sqlite3.Error:
+                conn.close()  # don't hand a broken connection to the next request
+                raise
+            except BaseException:
+                self._idle.put(conn)
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+
+class SummaryCache:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._key = None      # (data_version, local day) the cached summary was computed for
+        self._summary = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        """Totals, today's totals and per-camera totals (a dict shared by all callers; don't modify it)"""
+        with self._lock:
+            try:
+                if self._conn is None:
+                    self._conn = connect_readonly(self.db_path)
+                # The day comes from SQLite, like the day the triggers file rows under
+                key = (self._conn.execute("PRAGMA data_version").fetchone()[0],
+                       self._conn.execute(TODAY).fetchone()[0])
+                if key != self._key:
+                    self._summary = self._compute(key[1])
+                    self._key = key
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                return self._summary
+            except sqlite3.Error:
+                # Reopen next time (e.g. the database was created or replaced meanwhile)
+                self.close()
+                raise
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._key = None
+
+    def _compute(self, today):
+        cursor = self._conn.cursor()
+        total_sql = "SELECT violations, safe_pickups FROM violation_totals WHERE day = ? AND camera_id = ?"
+        try:
+            totals = cursor.execute(total_sql, (ALL_DAYS, ALL_CAMERAS)).fetchone() or (0, 0)
+        except sqlite3.OperationalError:
+            # Database not migrated yet (no totals table): count the rows once per write
+            totals = cursor.execute(
+                "SELECT COALESCE(SUM(is_violation), 0), COALESCE(SUM(is_safe_pickup), 0) FROM violations").fetchone()
+            return {"violations": totals[0], "safe_pickups": totals[1], "today": None, "cameras": {}}
+        today_totals = cursor.execute(total_sql, (today, ALL_CAMERAS)).fetchone() or (0, 0)
+        cameras = {
+            str(camera_id): {"violations": v, "safe_pickups": s}
+            for camera_id, v, s in cursor.execute(
+                "SELECT camera_id, violations, safe_pickups FROM violation_totals WHERE day = ? AND camera_id != ?",
+                (ALL_DAYS, ALL_CAMERAS))
+        }
+        return {
+            "violations": totals[0],
+            "safe_pickups": totals[1],
+            "today": {"day": today, "violations": today_totals[0], "safe_pickups": today_totals[1]},
+            "cameras": cameras,
+        }
+
+
+# ────────────────────────────────────────────────
+# Violation history
+# ────────────────────────────────────────────────
+EVENT_TYPES = {"violation": "is_violation = 1", "safe_pickup": "is_safe_pickup = 1"}
+
+
+def snapshot_url(key):
+    return f"/snapshots/{key}" if key else None
+
+
+def encode_cursor(timestamp, row_id):
+    return f"{timestamp!r}:{row_id}"
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, row_id = cursor.split(":")
+        return float(timestamp), int(row_id)
+    except ValueError:
+        raise ValueError(f"invalid cursor {cursor!r}") from None
+
+
+def query_violations(conn, since=None, until=None, camera_id=None, worker_id=None, event_type=None,
+                     cursor=None, limit=VIOLATIONS_PAGE_SIZE, detections=False):
+    """
+    One page of events, newest first. Returns (items, next cursor or None).
+    `cursor` is the value returned for the previous page; raises ValueError
+    for a malformed cursor or unknown event_type.
+    """
+    limit = max(1, min(int(limit), VIOLATIONS_MAX_PAGE_SIZE))
+    where, params = [], []
+    if camera_id is not None:
+        where.append("camera_id = ?")
+        params.append(camera_id)
+    if worker_id is not None:
+        where.append("worker_id = ?")
+        params.append(worker_id)
+    if since is not None:
+        where.append("timestamp >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("timestamp < ?")
+        params.append(until)
+    if event_type is not None:
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"type must be one of {', '.join(EVENT_TYPES)}")
+        where.append(EVENT_TYPES[event_type])
+    if cursor:
+        where.append("(timestamp, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+
+    columns = "id, timestamp, camera_id, worker_id, frame_id, roi_id, is_violation, frame_path, crop_path"
+    if detections:
+        columns += ", labels, boxes"
+    sql = (f"SELECT {columns} FROM violations"
+           + (f" WHERE {' AND '.join(where)}" if where else "")
+           + " ORDER BY timestamp DESC, id DESC LIMIT ?")
+    rows = conn.execute(sql, params + [limit + 1]).fetchall()
+
+    items = []
+    for row in rows[:limit]:
+        item = {
+            "id": row[0],
+            "ts": row[1],
+            "camera": row[2],
+            "worker": row[3],
+            "frame": row[4],
+            "roi": row[5],
+            "type": "violation" if row[6] else "safe_pickup",
+            "snapshot": snapshot_url(row[7]),
+            "crop": snapshot_url(row[8]),
+        }
+        if detections:
+            labels, boxes = unpack_detections(row[9], row[10])
+            item["detections"] = [[label] + box for label, box in zip(labels, boxes.round().astype(int).tolist())]
+        items.append(item)
+    next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+    return items, next_cursor
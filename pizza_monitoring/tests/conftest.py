@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Services import their modules as top-level packages (shared.*, detection_service modules, ...)
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "detection_service"))
@@ -0,0 +1,158 @@
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+
+from shared import db_schema
+from shared.db_schema import (ALL_CAMERAS, ALL_DAYS, SCHEMA_VERSION, INSERT_VIOLATION, ensure_schema,
+                              unpack_detections, violation_row)
+
+# The original table, as detection_service/database.py created it before schema versioning
+V1_TABLE = '''CREATE TABLE violations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    frame_path TEXT,
+    labels TEXT,
+    boxes TEXT,
+    is_violation INTEGER DEFAULT 0,
+    is_safe_pickup INTEGER DEFAULT 0
+)'''
+
+DAY1 = 1700000000.0           # 2023-11-14 in most time zones
+DAY2 = DAY1 + 3 * 86400
+
+
+def local_day(ts):
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+
+@pytest.fixture
+def v1_db(tmp_path):
+    path = str(tmp_path / "violations.db")
+    conn = sqlite3.connect(path)
+    conn.execute(V1_TABLE)
+    conn.execute("CREATE INDEX idx_violation ON violations(is_violation)")
+    conn.execute("CREATE INDEX idx_safe_pickup ON violations(is_safe_pickup)")
+    rows = [
+        (str(DAY1), "a.jpg", "['hand', 'pizza']", "[[1, 2, 3, 4], [5, 6, 7, 8]]", 1, 0),
+        (str(DAY1 + 60), "", "['hand']", "[[10, 20, 30, 40]]", 0, 1),
+        (str(DAY1 + 120), "", "[]", "[]", 1, 0),
+        (str(DAY2), None, "not a list", None, 1, 0),
+        # ISO timestamps from older sample rows
+        (time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(DAY2 + 60)), "b.jpg", "['scooper']", "[[0, 0, 1, 1]]", 0, 1),
+    ]
+    conn.executemany("INSERT INTO violations (timestamp, frame_path, labels, boxes, is_violation, is_safe_pickup) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def counts(conn):
+    return {(camera, worker, day): (v, s) for camera, worker, day, v, s in conn.execute(
+        "SELECT camera_id, worker_id, day, violations, safe_pickups FROM violation_counts")}
+
+
+def totals(conn):
+    return {(day, camera): (v, s) for day, camera, v, s in conn.execute(
+        "SELECT day, camera_id, violations, safe_pickups FROM violation_totals")}
+
+
+def test_migrate_v1_keeps_rows_and_converts_columns(v1_db):
+    assert ensure_schema(v1_db) == "migrated"
+    assert v1_db.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+    rows = v1_db.execute("SELECT id, timestamp, camera_id, worker_id, frame_path, crop_path, is_violation, "
+                         "is_safe_pickup, labels, boxes FROM violations ORDER BY id").fetchall()
+    assert [r[0] for r in rows] == [1, 2, 3, 4, 5]
+    assert [r[1] for r in rows] == pytest.approx([DAY1, DAY1 + 60, DAY1 + 120, DAY2, DAY2 + 60])
+    assert all(r[2] == 0 and r[3] is None and r[5] == "" for r in rows)
+    assert [r[4] for r in rows] == ["a.jpg", "", "", "", "b.jpg"]
+
+    labels, boxes = unpack_detections(rows[0][8], rows[0][9])
+    assert labels == ["hand", "pizza"]
+    np.testing.assert_array_equal(boxes, [[1, 2, 3, 4], [5, 6, 7, 8]])
+    labels, boxes = unpack_detections(rows[3][8], rows[3][9])
+    assert labels == [] and boxes.shape == (0, 4)
+
+    indexes = {name for (name,) in v1_db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_violations_camera_time", "idx_violations_worker_time", "idx_violations_time"} <= indexes
+    assert not {"idx_violation", "idx_safe_pickup"} & indexes
+
+
+def test_migrate_v1_backfills_counts(v1_db):
+    ensure_schema(v1_db)
+    assert counts(v1_db) == {
+        (0, -1, local_day(DAY1)): (2, 1),
+        (0, -1, local_day(DAY2)): (1, 1),
+    }
+    assert totals(v1_db) == {
+        (ALL_DAYS, 0): (3, 2),
+        (ALL_DAYS, ALL_CAMERAS): (3, 2),
+        (local_day(DAY1), ALL_CAMERAS): (2, 1),
+        (local_day(DAY2), ALL_CAMERAS): (1, 1),
+    }
+
+
+def test_count_triggers_follow_inserts_and_deletes(v1_db):
+    ensure_schema(v1_db)
+    v1_db.executemany(INSERT_VIOLATION, [
+        violation_row(DAY1 + 300, 0, None, 10, 1, "", ["hand"], [[0, 0, 1, 1]], True, False),
+        violation_row(DAY2 + 300, 2, 7, 11, 0, "", [], [], False, True, crop_path="ab/cd.jpg"),
+        violation_row(DAY2 + 360, 2, 7, 12, 0, "", [], [], True, False),
+    ])
+    v1_db.commit()
+    assert counts(v1_db) == {
+        (0, -1, local_day(DAY1)): (3, 1),
+        (0, -1, local_day(DAY2)): (1, 1),
+        (2, 7, local_day(DAY2)): (1, 1),
+    }
+
+    v1_db.execute("DELETE FROM violations WHERE id IN (1, 2)")
+    v1_db.execute("DELETE FROM violations WHERE camera_id = 2 AND is_violation = 1")
+    v1_db.commit()
+    assert counts(v1_db) == {
+        (0, -1, local_day(DAY1)): (2, 0),
+        (0, -1, local_day(DAY2)): (1, 1),
+        (2, 7, local_day(DAY2)): (0, 1),
+    }
+    total = v1_db.execute("SELECT SUM(is_violation), SUM(is_safe_pickup) FROM violations").fetchone()
+    assert total == v1_db.execute("SELECT SUM(violations), SUM(safe_pickups) FROM violation_counts").fetchone()
+    assert totals(v1_db) == {
+        (ALL_DAYS, 0): (3, 1),
+        (ALL_DAYS, 2): (0, 1),
+        (ALL_DAYS, ALL_CAMERAS): total,
+        (local_day(DAY1), ALL_CAMERAS): (2, 0),
+        (local_day(DAY2), ALL_CAMERAS): (1, 2),
+    }
+
+
+def test_ensure_schema_is_idempotent(v1_db):
+    ensure_schema(v1_db)
+    before = counts(v1_db), totals(v1_db)
+    assert ensure_schema(v1_db) == "current"
+    assert (counts(v1_db), totals(v1_db)) == before
+
+
+def test_migrate_v4_backfills_totals(v1_db):
+    ensure_schema(v1_db)
+    before = totals(v1_db)
+    v1_db.execute("DROP TABLE violation_totals")
+    v1_db.execute("DROP TRIGGER violation_totals_insert")
+    v1_db.execute("DROP TRIGGER violation_totals_delete")
+    v1_db.execute("PRAGMA user_version = 4")
+    v1_db.commit()
+    assert ensure_schema(v1_db) == "migrated"
+    assert totals(v1_db) == before
+
+
+def test_create_new_database(tmp_path):
+    conn = db_schema.connect(str(tmp_path / "new.db"))
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    conn.execute(INSERT_VIOLATION, violation_row(DAY1, 1, 3, 1, 0, "f.jpg", [], [], True, False, "c.jpg"))
+    conn.commit()
+    assert counts(conn) == {(1, 3, local_day(DAY1)): (1, 0)}
+    assert totals(conn) == {(ALL_DAYS, 1): (1, 0), (ALL_DAYS, ALL_CAMERAS): (1, 0),
+                            (local_day(DAY1), ALL_CAMERAS): (1, 0)}
+    conn.close()
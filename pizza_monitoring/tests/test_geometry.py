@@ -0,0 +1,59 @@
+import numpy as np
+
+from geometry import FrameDetections, center_distances, centers, inside_mask, iou_matrix, nearest, overlap_matrix
+
+
+def test_iou_matrix():
+    a = [[0, 0, 10, 10], [20, 20, 30, 30]]
+    b = [[5, 0, 15, 10], [0, 0, 10, 10], [100, 100, 100, 100]]
+    iou = iou_matrix(a, b)
+    assert iou.shape == (2, 3)
+    np.testing.assert_allclose(iou[0], [50 / 150, 1.0, 0.0])
+    np.testing.assert_allclose(iou[1], [0.0, 0.0, 0.0])
+    assert overlap_matrix(a, b, iou_thresh=0.5).tolist() == [[False, True, False], [False, False, False]]
+
+
+def test_empty_inputs_keep_their_shape():
+    assert iou_matrix(np.zeros((0, 4)), [[0, 0, 1, 1]]).shape == (0, 1)
+    assert inside_mask(np.zeros((0, 4)), [[0, 0, 1, 1]]).shape == (0, 1)
+    assert nearest(center_distances([[0, 0, 1, 1]], np.zeros((0, 4))), 10).tolist() == [-1]
+
+
+def test_inside_mask_uses_centers_and_includes_edges():
+    rois = [[0, 0, 10, 10], [10, 0, 20, 10]]
+    boxes = [[4, 4, 6, 6], [8, 0, 12, 10], [30, 30, 40, 40]]   # centers (5, 5), (10, 5), (35, 35)
+    assert inside_mask(boxes, rois).tolist() == [[True, False], [True, True], [False, False]]
+
+
+def test_nearest_applies_threshold_and_prefers_first_on_ties():
+    np.testing.assert_allclose(centers([[0, 0, 2, 4]]), [[1, 2]])
+    hands = [[0, 0, 2, 2], [100, 100, 102, 102]]
+    persons = [[4, 0, 6, 2], [-4, 0, -2, 2]]   # both 4 px from the first hand
+    assert nearest(center_distances(hands, persons), 50).tolist() == [0, -1]
+    assert nearest(center_distances(hands, persons), 4).tolist() == [-1, -1]  # strictly closer than max_dist
+
+
+class Boxes:
+    def __init__(self, data):
+        self.data = data
+
+
+class Results:
+    names = {0: "hand", 1: "person"}
+
+    def __init__(self, data):
+        self.boxes = Boxes(data)
+
+
+def test_frame_detections_split_by_label_and_track():
+    tracked = np.array([[0, 0, 1, 1, 5, 0.9, 0],
+                        [0, 0, 9, 9, 7, 0.8, 1],
+                        [1, 1, 2, 2, -1, 0.7, 1]], dtype=np.float32)
+    det = FrameDetections.from_results(Results(tracked))
+    assert det.boxes("hand").tolist() == [[0, 0, 1, 1]]
+    boxes, ids = det.tracked("person")
+    assert boxes.tolist() == [[0, 0, 9, 9]] and ids.tolist() == [7]
+
+    untracked = FrameDetections.from_results(Results(tracked[:, [0, 1, 2, 3, 5, 6]]))
+    assert untracked.ids.tolist() == [-1, -1, -1]
+    assert len(untracked.tracked("person")[0]) == 0
@@ -0,0 +1,92 @@
+import random
+import threading
+import time
+
+from pipeline import Pipeline, Stage
+
+
+def run(stages, items, timeout=5.0):
+    delivered, released = [], []
+    lock = threading.Lock()
+
+    def release(item):
+        with lock:
+            released.append(item)
+
+    pipeline = Pipeline(stages, sink=delivered.append, release=release, report_every=0).start()
+    for item in items:
+        pipeline.submit(item)
+    assert pipeline.drain(timeout)
+    pipeline.stop()
+    return delivered, released
+
+
+def jittered(fn):
+    def stage(item):
+        time.sleep(random.uniform(0, 0.003))
+        return fn(item)
+    return stage
+
+
+def test_pool_stages_deliver_in_submission_order():
+    stages = [
+        Stage("a", jittered(lambda x: x * 2), workers=4, maxsize=4),
+        Stage("b", jittered(lambda x: x + 1), workers=3, maxsize=4),
+    ]
+    delivered, released = run(stages, range(100))
+    assert delivered == [x * 2 + 1 for x in range(100)]
+    assert sorted(released) == delivered
+
+
+def test_dropped_items_are_released_once_and_counted():
+    drop_odd = Stage("filter", jittered(lambda x: x if x % 2 == 0 else None), workers=3)
+    def fail_on_tens(x):
+        if x % 10 == 0:
+            raise ValueError(x)
+        return x
+
+    failing = Stage("fail", fail_on_tens, workers=2)
+    delivered, released = run([drop_odd, failing], range(50))
+
+    assert delivered == [x for x in range(50) if x % 2 == 0 and x % 10]
+    assert sorted(released) == list(range(50))
+    assert drop_odd.stats(1.0)["dropped"] == 25
+    assert failing.stats(1.0)["dropped"] == 5
+
+
+def test_batch_stage_keeps_order_and_respects_batch_size():
+    sizes = []
+
+    def batch_fn(items):
+        sizes.append(len(items))
+        return [item * 10 for item in items]
+
+    stage = Stage("batch", batch_fn, maxsize=32, batch_size=4, max_wait_ms=20)
+    delivered, _ = run([stage], range(23))
+    assert delivered == [x * 10 for x in range(23)]
+    assert max(sizes) <= 4 and sum(sizes) == 23
+
+
+def test_batch_complete_stops_waiting():
+    started = []
+
+    def batch_fn(items):
+        started.append(time.perf_counter())
+        return items
+
+    stage = Stage("batch", batch_fn, batch_size=8, max_wait_ms=2000, batch_complete=lambda items: True)
+    begin = time.perf_counter()
+    delivered, _ = run([stage], [1])
+    assert delivered == [1]
+    assert started[0] - begin < 1.0
+
+
+def test_drain_times_out_while_items_are_stuck():
+    gate = threading.Event()
+    stage = Stage("slow", lambda x: gate.wait() and x)
+    pipeline = Pipeline([stage], sink=lambda item: None, report_every=0).start()
+    pipeline.submit(1)
+    assert not pipeline.drain(0.1)
+    gate.set()
+    assert pipeline.drain(2.0)
+    pipeline.stop()
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pytest
+
+from shared import shm_ring
+from shared.frame_protocol import CODEC_SHM, FrameHeader
+from shared.shm_ring import SharedFrameRing, read_frame
+
+SHAPE = (4, 5, 3)
+
+
+@pytest.fixture
+def name():
+    ring_name = f"pizza_test_{os.getpid()}"
+    yield ring_name
+    shm_ring._attached.pop(ring_name, None)
+
+
+def frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+def header(seq, descriptor):
+    return FrameHeader(codec=CODEC_SHM, seq=seq, height=SHAPE[0], width=SHAPE[1], meta=descriptor)
+
+
+def test_overwritten_slot_is_detected(name):
+    ring = SharedFrameRing(name, 2, 64, create=True)
+    try:
+        descriptor = ring.write(1, frame(1))
+        assert ring.read_copy(descriptor["slot"], 1, SHAPE).max() == 1
+        ring.write(3, frame(3))                            # same slot, next lap
+        assert ring.read_copy(descriptor["slot"], 1, SHAPE) is None
+        assert ring.read_copy(descriptor["slot"], 3, SHAPE).max() == 3
+
+        view = ring.view(descriptor["slot"], 3, SHAPE)
+        ring.write(5, frame(5))                            # overwritten while "in use"
+        assert view is not None and not ring.is_current(descriptor["slot"], 3)
+        assert ring.torn_reads == 2
+    finally:
+        ring.close()
+
+
+def test_slot_reuse_does_not_reattach(name):
+    ring = SharedFrameRing(name, 2, 64, create=True)
+    try:
+        descriptor = ring.write(1, frame(1))
+        assert read_frame(header(1, descriptor)).max() == 1
+        attached = shm_ring._attached[name]
+        ring.write(3, frame(3))
+        assert read_frame(header(1, descriptor)) is None
+        assert shm_ring._attached[name] is attached
+    finally:
+        ring.close()
+
+
+def test_writer_restart_swaps_in_the_new_ring(name):
+    old = SharedFrameRing(name, 2, 64, create=True)
+    old_descriptor = old.write(1, frame(1))
+    assert read_frame(header(1, old_descriptor)).max() == 1
+    attached = shm_ring._attached[name]
+    old.close()
+
+    new = SharedFrameRing(name, 2, 64, create=True)
+    try:
+        assert new.generation > old.generation
+        descriptor = new.write(1, frame(2))
+        assert read_frame(header(1, descriptor)).max() == 2
+        assert shm_ring._attached[name] is not attached
+        # The replaced ring was dropped, not closed under its readers
+        assert attached.data is not None
+        # Frames of the old generation are gone, and do not trigger another re-attach
+        current = shm_ring._attached[name]
+        assert read_frame(header(1, old_descriptor)) is None
+        assert shm_ring._attached[name] is current
+    finally:
+        new.close()
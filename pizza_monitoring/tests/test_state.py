@@ -0,0 +1,125 @@
+from state import CameraState, RoiVisit, StateRegistry
+
+
+def visit(start_frame=1, roi_id=0):
+    return RoiVisit(start_frame, [0, 0, 10, 10], roi_id)
+
+
+def test_worker_ids_are_consistent_per_track():
+    state = CameraState()
+    assert state.consistent_worker_id(7, (1, 1), 1) == 1
+    assert state.consistent_worker_id(9, (2, 2), 1) == 2
+    assert state.consistent_worker_id(7, (3, 3), 2) == 1
+    assert state.worker_positions[7] == (3, 3)
+    assert state.track_last_seen == {7: 2, 9: 1}
+
+
+def test_one_open_event_per_worker():
+    state = CameraState()
+    event = state.open_event(1, visit(), 10, 5)
+    assert event.deadline == 15
+    assert state.open_event(1, visit(), 12, 5) is None
+    assert state.open_events == {1: event}
+    assert len(state.pending) == 1
+
+
+def test_due_events_pop_by_deadline_once():
+    state = CameraState()
+    late = state.open_event(1, visit(), 10, 20)   # deadline 30
+    early = state.open_event(2, visit(), 12, 5)   # deadline 17
+    tie = state.open_event(3, visit(), 7, 10)     # deadline 17, opened after `early`
+
+    assert list(state.due_events(17)) == []  # the grace window includes its last frame
+    assert list(state.due_events(18)) == [early, tie]
+    assert set(state.open_events) == {1}
+    assert list(state.due_events(18)) == []
+    assert list(state.due_events(31)) == [late]
+    assert state.open_events == {} and state.pending == []
+
+    # A decided worker can open a new event
+    assert state.open_event(2, visit(), 40, 5) is not None
+
+
+def test_eviction_forgets_stale_tracks_after_ttl():
+    state = CameraState(track_ttl=1.0, evict_interval=0)
+    state.consistent_worker_id(1, (0, 0), frame_id=100)
+    state.consistent_worker_id(2, (0, 0), frame_id=125)
+    # fps 30, ttl 1 s: at frame 131 the horizon is frame 101
+    assert state.maybe_evict(131, fps=30) == 1
+    assert set(state.worker_id_map) == {2}
+    assert set(state.worker_positions) == {2}
+    assert state.evicted_tracks == 1
+
+
+def test_eviction_runs_every_interval_frames():
+    state = CameraState(track_ttl=1.0, evict_interval=10)
+    state.consistent_worker_id(1, (0, 0), frame_id=1)
+    state.frames = 1
+    assert state.maybe_evict(1000, fps=30) == 1   # first check
+    state.consistent_worker_id(2, (0, 0), frame_id=1)
+    state.frames = 5
+    assert state.maybe_evict(1000, fps=30) == 0   # not due yet
+    state.frames = 11
+    assert state.maybe_evict(1000, fps=30) == 1
+
+
+def test_eviction_after_source_restart():
+    state = CameraState(track_ttl=10.0, evict_interval=0)
+    state.consistent_worker_id(1, (0, 0), frame_id=500)
+    # A looping file started over: frame ids are lower than the last sighting
+    assert state.maybe_evict(3, fps=30) == 1
+    assert state.worker_id_map == {}
+
+
+def test_inactive_workers_are_retired_into_one_counter():
+    state = CameraState(track_ttl=1.0, evict_interval=0)
+    busy = state.consistent_worker_id(1, (0, 0), frame_id=0)
+    idle = state.consistent_worker_id(2, (0, 0), frame_id=0)
+    state.stats_for(busy).violations = 2
+    state.stats_for(idle).violations = 1
+    state.stats_for(idle).safe_pickups = 3
+    state.last_safe_frame[idle] = 0
+    state.open_event(busy, visit(), 0, 1000)  # undecided event keeps the worker around
+
+    state.maybe_evict(100, fps=30)
+    assert state.worker_id_map == {}
+    assert set(state.worker_stats) == {busy}
+    assert state.retired_stats.as_dict() == {"violations": 1, "safe_pickups": 3}
+    assert state.last_safe_frame == {}
+
+
+def test_memory_report_counts_records():
+    state = CameraState()
+    state.consistent_worker_id(1, (0, 0), 1)
+    state.open_event(1, visit(), 1, 5)
+    m = state.memory()
+    assert m["workers"] == 1 and m["events"] == 1 and m["pending_events"] == 1
+    assert m["bytes_per_worker"] > 0 and m["bytes_per_event"] > 0
+
+
+def test_registry_creates_and_resets_states():
+    registry = StateRegistry(report_every=0)
+    state = registry.get(3)
+    assert registry.get(3) is state and state.camera_id == 3
+    registry.reset(3)
+    assert registry.get(3) is not state
+    assert len(registry) == 1
+
+
+def test_source_restart_drops_previous_run_events():
+    state = CameraState(track_ttl=60.0)
+    worker = state.consistent_worker_id(1, (0, 0), frame_id=900)
+    state.stats_for(worker).violations = 1
+    for frame_id in (899, 900):
+        assert not state.note_frame(frame_id)
+    state.open_event(worker, visit(), 900, 30)       # deadline 930
+    state.worker_in_roi[2] = visit(895)
+
+    # Frame ids start over: without the reset the event would wait until frame 931 of the new run
+    assert state.note_frame(1)
+    assert state.pending == [] and state.open_events == {} and state.worker_in_roi == {}
+    assert state.stats_for(worker).violations == 1
+    assert state.source_restarts == 1
+    assert state.maybe_evict(1, fps=30) == 1          # the old track is evicted right away
+    assert state.open_event(worker, visit(), 5, 30).deadline == 35
+    assert list(state.due_events(36))[0].end_frame == 5
@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+from shared import db_schema
+from shared.db_schema import INSERT_VIOLATION, violation_row
+from streaming_service.violations_db import ReadPool, SummaryCache, decode_cursor, encode_cursor, query_violations
+
+BASE = 1700000000.0
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "violations.db")
+    conn = db_schema.connect(path)
+    rows = []
+    for i in range(50):
+        # Pairs of rows share a timestamp so paging has to break ties on id
+        ts = BASE + (i // 2) * 0.5
+        rows.append(violation_row(ts, i % 2, i % 5, i, 0, f"{i:02x}/frame.jpg" if i % 3 == 0 else "",
+                                  ["hand"], [[i, i, i + 10, i + 10]], i % 4 != 0, i % 4 == 0))
+    conn.executemany(INSERT_VIOLATION, rows)
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def pool(db_path):
+    return ReadPool(db_path, size=2)
+
+
+def all_pages(conn, **filters):
+    items, cursor, pages = [], None, 0
+    while True:
+        page, cursor = query_violations(conn, cursor=cursor, **filters)
+        items.extend(page)
+        pages += 1
+        if cursor is None:
+            return items, pages
+
+
+def test_pages_cover_every_row_once_newest_first(pool):
+    with pool.connection() as conn:
+        items, pages = all_pages(conn, limit=7)
+    assert pages == 8  # 50 rows / 7 per page
+    ids = [item["id"] for item in items]
+    assert sorted(ids) == list(range(1, 51))
+    keys = [(item["ts"], item["id"]) for item in items]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_page_boundary_inside_a_timestamp_tie(pool):
+    with pool.connection() as conn:
+        first, cursor = query_violations(conn, limit=3)
+        second, _ = query_violations(conn, limit=3, cursor=cursor)
+    # Rows 50 and 49 share a timestamp, then 48 and 47: the cursor splits the second pair
+    assert [item["id"] for item in first] == [50, 49, 48]
+    assert [item["id"] for item in second] == [47, 46, 45]
+
+
+def test_filters_combine_with_paging(pool):
+    with pool.connection() as conn:
+        items, _ = all_pages(conn, camera_id=0, event_type="safe_pickup", since=BASE + 2, limit=2)
+        everything, _ = all_pages(conn, limit=100)
+    expected = [item["id"] for item in everything
+                if item["camera"] == 0 and item["type"] == "safe_pickup" and item["ts"] >= BASE + 2]
+    assert [item["id"] for item in items] == expected
+    assert expected  # the filter is not trivially empty
+
+
+def test_item_fields(pool):
+    with pool.connection() as conn:
+        (item,), _ = query_violations(conn, limit=1, until=BASE + 0.5, detections=True)
+    # Newest row before BASE + 0.5: row index 1 (id 2), camera 1, worker 1
+    assert item["id"] == 2 and item["camera"] == 1 and item["worker"] == 1 and item["frame"] == 1
+    assert item["type"] == "violation"
+    assert item["snapshot"] is None and item["crop"] is None
+    assert item["detections"] == [["hand", 1, 1, 11, 11]]
+
+    with pool.connection() as conn:
+        (oldest,), _ = query_violations(conn, limit=1, until=BASE + 0.5, cursor=encode_cursor(BASE, 2))
+    assert oldest["id"] == 1 and oldest["type"] == "safe_pickup"
+    assert oldest["snapshot"] == "/snapshots/00/frame.jpg" and oldest["crop"] is None
+
+
+def test_cursor_round_trip_and_errors(pool):
+    assert decode_cursor(encode_cursor(BASE + 0.1, 42)) == (BASE + 0.1, 42)
+    with pool.connection() as conn:
+        with pytest.raises(ValueError, match="invalid cursor"):
+            query_violations(conn, cursor="garbage")
+        with pytest.raises(ValueError, match="type must be one of"):
+            query_violations(conn, event_type="nope")
+
+
+def test_limit_is_clamped(pool):
+    with pool.connection() as conn:
+        page, cursor = query_violations(conn, limit=0)
+    assert len(page) == 1 and cursor is not None
+
+
+def test_summary_cache(db_path):
+    cache = SummaryCache(db_path)
+    summary = cache.get()
+    assert (summary["violations"], summary["safe_pickups"]) == (37, 13)
+    assert summary["cameras"] == {"0": {"violations": 12, "safe_pickups": 13},
+                                  "1": {"violations": 25, "safe_pickups": 0}}
+    assert summary["today"] == {"day": time.strftime("%Y-%m-%d"), "violations": 0, "safe_pickups": 0}
+    assert cache.get() is summary and cache.hits == 1
+
+    conn = db_schema.connect(db_path)
+    conn.execute(INSERT_VIOLATION, violation_row(time.time(), 3, 1, 99, 0, "", [], [], True, False))
+    conn.commit()
+    conn.close()
+    summary = cache.get()
+    assert cache.misses == 2
+    assert summary["violations"] == 38 and summary["today"]["violations"] == 1
+    assert summary["cameras"]["3"] == {"violations": 1, "safe_pickups": 0}
+    cache.close()
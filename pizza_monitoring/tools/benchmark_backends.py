@@ -0,0 +1,85 @@
+import sys
+import os
+# Add root directory to sys.path (pizza_monitoring)
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "detection_service"))
+import argparse
+import time
+
+import numpy as np
+
+from backends import BACKENDS, load_model
+from shared.capture_file import CaptureReader
+from utils import decode_frame_message
+
+# ─────────────────────────────────────────────
+# Compare inference backends on the same frames
+#
+#   python tools/benchmark_backends.py --backends cpu onnx --frames 200 --batch 4
+#   python tools/benchmark_backends.py --capture capture.pzcap --int8
+# ─────────────────────────────────────────────
+def load_frames(capture_path, count, shape=(720, 1280, 3)):
+    if not capture_path:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 255, shape, dtype=np.uint8) for _ in range(min(count, 16))]
+    capture = CaptureReader(capture_path)
+    frames = []
+    for body, _, _, _ in capture:
+        _, frame = decode_frame_message(bytes(body))
+        if frame is not None:
+            frames.append(frame)
+        if len(frames) >= count:
+            break
+    capture.close()
+    return frames
+
+def benchmark(backend, frames, total, batch, threads, int8, warmup=3):
+    model = load_model(backend, threads=threads, int8=int8)
+    for i in range(warmup):
+        model.predict(frames[i % len(frames)], verbose=False)
+
+    latencies = []
+    done = 0
+    start = time.perf_counter()
+    while done < total:
+        batch_frames = [frames[(done + j) % len(frames)] for j in range(min(batch, total - done))]
+        t0 = time.perf_counter()
+        model.predict(batch_frames, conf=0.0001, iou=0.3, verbose=False)
+        latencies.append(time.perf_counter() - t0)
+        done += len(batch_frames)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "backend": model.backend_name,
+        "fps": done / elapsed,
+        "batch_ms": 1e3 * sum(latencies) / len(latencies),
+        "p95_ms": 1e3 * latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detector inference backends")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["cpu", "onnx"])
+    parser.add_argument("--capture", help="use frames from a capture file instead of random frames")
+    parser.add_argument("--frames", type=int, default=100, help="frames per backend")
+    parser.add_argument("--batch", type=int, default=1, help="frames per predict() call")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads (0 = library default)")
+    parser.add_argument("--int8", action="store_true", help="INT8 quantization for onnx / openvino")
+    args = parser.parse_args()
+
+    frames = load_frames(args.capture, args.frames)
+    print(f"[Benchmark] 🏁 {args.frames} frames of {frames[0].shape} per backend, batch {args.batch}")
+
+    rows = []
+    for backend in args.backends:
+        try:
+            rows.append(benchmark(backend, frames, args.frames, args.batch, args.threads, args.int8))
+        except Exception as e:
+            print(f"[Benchmark] ❌ {backend}: {e}")
+
+    print(f"\n{'backend':<10} {'fps':>8} {'ms/batch':>10} {'p95 ms':>8}")
+    for row in rows:
+        print(f"{row['backend']:<10} {row['fps']:>8.1f} {row['batch_ms']:>10.1f} {row['p95_ms']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import sys
+import os
+# Add root directory to sys.path (pizza_monitoring)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import time
+
+import pika
+
+from shared.config import RABBITMQ_HOST, RABBITMQ_QUEUE
+from shared.capture_file import CaptureWriter, shm_to_jpeg
+from shared.frame_protocol import unpack_frame, CODEC_SHM
+from shared.queues import declare_queue
+from shared.shm_ring import read_frame
+
+# ─────────────────────────────────────────────
+# Record queue traffic into an indexed capture file
+#
+# Consuming from a queue takes the messages away from its normal consumer,
+# so run this while the detector (or streamer) is stopped. To record in
+# production without stealing frames, set READER_RECORD_PATH instead: the
+# frame reader then tees everything it publishes into the capture file.
+# Shared-memory frames are resolved while recording and stored as JPEG.
+# ─────────────────────────────────────────────
+def record_message(writer, body):
+    try:
+        header, _ = unpack_frame(body)
+        if header.codec == CODEC_SHM:
+            frame = read_frame(header)
+            if frame is None:
+                return  # slot already reused: nothing left to record
+            body = shm_to_jpeg(header, frame)
+        writer.append(body, header.timestamp, header.camera_id, header.seq)
+    except Exception:
+        # Unparseable / legacy message: keep it with its arrival time
+        writer.append(body, time.time())
+
+def main():
+    parser = argparse.ArgumentParser(description="Record RabbitMQ frame traffic to a capture file")
+    parser.add_argument("output", help="capture file to write (.pzcap)")
+    parser.add_argument("--queue", default=RABBITMQ_QUEUE, help="queue to record (default: %(default)s)")
+    parser.add_argument("--max-frames", type=int, default=0, help="stop after this many messages (0 = until Ctrl+C)")
+    args = parser.parse_args()
+
+    writer = CaptureWriter(args.output)
+    connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST))
+    channel = connection.channel()
+    declare_queue(channel, args.queue)
+    print(f"[Recorder] 🔴 Recording '{args.queue}' to {args.output} ...")
+
+    start = time.time()
+    try:
+        for method, properties, body in channel.consume(args.queue, auto_ack=True, inactivity_timeout=1.0):
+            if body is not None:
+                record_message(writer, body)
+                if len(writer) % 100 == 0:
+                    print(f"[Recorder] 📼 {len(writer)} messages recorded")
+            if args.max_frames and len(writer) >= args.max_frames:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        if connection.is_open:
+            connection.close()
+    print(f"[Recorder] ✅ Recorded {len(writer)} messages in {time.time() - start:.1f}s to {args.output}")
+
+if __name__ == "__main__":
+    main()
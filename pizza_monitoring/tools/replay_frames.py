@@ -0,0 +1,130 @@
+import sys
+import os
+# Add root directory to sys.path (pizza_monitoring)
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+import argparse
+import time
+
+from shared.capture_file import CaptureReader
+
+# ─────────────────────────────────────────────
+# Replay a capture file for repeatable benchmarks
+#
+#   --target rabbitmq   publish to a queue (default video_frames) for a full-system run
+#   --target detector   feed the detector pipeline in-process, no broker needed
+#                       (as if someone were watching; --idle for the no-viewer mode)
+#   --target streamer   run the streamer's decode + MJPEG encode path in-process
+#
+# --speed 1 replays in real time, N replays N times faster, 0 as fast as possible.
+# ─────────────────────────────────────────────
+class Pacer:
+    def __init__(self, speed):
+        self.speed = speed
+        self.first_ts = None
+        self.start = None
+
+    def wait(self, timestamp):
+        if self.speed <= 0:
+            return
+        if self.first_ts is None:
+            self.first_ts, self.start = timestamp, time.perf_counter()
+            return
+        delay = self.start + (timestamp - self.first_ts) / self.speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+def rabbitmq_target(queue_name):
+    from shared.rabbit_publisher import RabbitPublisher
+    publisher = RabbitPublisher(queue_name, name="Replay Publisher", max_pending=4096).start()
+
+    def handle(body):
+        publisher.publish(bytes(body))
+    return handle, publisher.close
+
+def detector_target(idle=False):
+    sys.path.append(os.path.join(ROOT, "detection_service"))
+    import detector
+    # No presence listener here: either always package/publish, or never (no heartbeat = no viewers)
+    detector.viewer_presence.enabled = idle
+    detector.prepare_detector()
+
+    def handle(body):
+        detector.handle_detection_task(bytes(body))
+
+    def finish():
+        detector.pipeline.drain()
+        detector.pipeline.stop()
+    return handle, finish
+
+def streamer_target():
+    sys.path.append(os.path.join(ROOT, "streaming_service"))
+    import cv2
+    import rabbit_consumer
+    from shared.overlay import draw_overlay
+
+    def handle(body):
+        frame, overlay = rabbit_consumer.decode_frame_message(bytes(body))
+        if frame is None:
+            return
+        # Same work generate_frames() does per streamed frame
+        if overlay:
+            frame = draw_overlay(frame.copy(), overlay)
+        if frame.shape[1] > 640:
+            frame = cv2.resize(frame, (640, 480))
+        cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return handle, lambda: None
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a capture file into RabbitMQ, the detector or the streamer")
+    parser.add_argument("capture", help="capture file written by record_frames.py or READER_RECORD_PATH")
+    parser.add_argument("--target", choices=("rabbitmq", "detector", "streamer"), default="detector")
+    parser.add_argument("--idle", action="store_true", help="--target detector with no viewers (nothing published)")
+    parser.add_argument("--queue", default=None, help="queue for --target rabbitmq (default: video_frames)")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = real time, N = N times faster, 0 = max speed")
+    parser.add_argument("--limit", type=int, default=0, help="replay at most this many messages")
+    parser.add_argument("--loops", type=int, default=1, help="replay the file this many times")
+    args = parser.parse_args()
+
+    capture = CaptureReader(args.capture)
+    print(f"[Replay] ▶️ {len(capture)} messages, {capture.duration():.1f}s recorded -> {args.target} "
+          f"(speed {'max' if args.speed <= 0 else f'{args.speed}x'})")
+
+    if args.target == "rabbitmq":
+        from shared.config import RABBITMQ_QUEUE
+        handle, finish = rabbitmq_target(args.queue or RABBITMQ_QUEUE)
+    elif args.target == "detector":
+        handle, finish = detector_target(args.idle)
+    else:
+        handle, finish = streamer_target()
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(args.loops):
+        pacer = Pacer(args.speed)
+        for i, (body, timestamp, camera_id, seq) in enumerate(capture):
+            if args.limit and i >= args.limit:
+                break
+            pacer.wait(timestamp)
+            t0 = time.perf_counter()
+            handle(body)
+            latencies.append(time.perf_counter() - t0)
+    # Throughput includes draining whatever the target still has in flight
+    finish()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    count = len(latencies)
+    print(f"[Replay] ✅ {count} messages in {elapsed:.2f}s -> {count / elapsed if elapsed else 0:.1f} msg/s")
+    print(f"[Replay] 🕒 per message: mean {1e3 * sum(latencies) / max(count, 1):.2f} ms | "
+          f"p50 {1e3 * percentile(latencies, 50):.2f} ms | p95 {1e3 * percentile(latencies, 95):.2f} ms | "
+          f"p99 {1e3 * percentile(latencies, 99):.2f} ms")
+    capture.close()
+
+if __name__ == "__main__":
+    main()